@@ -3,12 +3,49 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import contextlib
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import timeit
 import unittest
+from unittest import mock
 
 import isolation
 import game_agent
+import mcts
+import move_ordering
+import parallel_search
+import results_store
+import sample_players
+import search_stats
+import time_manager
+import tournament
+import transposition
 
 from importlib import reload
+from math import isinf
+
+
+def _random_opening(game, num_moves, seed=None):
+    """Apply up to `num_moves` random legal moves to `game` (fewer if the
+    player to move is stuck) and return them. The random generator is seeded
+    with `seed` first if it is given."""
+    if seed is not None:
+        random.seed(seed)
+    opening = []
+    for _ in range(num_moves):
+        moves = game.get_legal_moves()
+        if not moves:
+            break
+        opening.append(random.choice(moves))
+        game.apply_move(opening[-1])
+    return opening
 
 
 class IsolationTest(unittest.TestCase):
@@ -21,5 +58,1219 @@ class IsolationTest(unittest.TestCase):
         self.game = isolation.Board(self.player1, self.player2)
 
 
+class BoardUndoTest(unittest.TestCase):
+    """Check that `undo_move()` restores the state before `apply_move()`"""
+
+    def test_undo_restores_state(self):
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls("Player1", "Player2", width=5, height=5)
+            history = []
+            while game.get_legal_moves():
+                before = (game.to_string(), game.active_player,
+                          game.move_count, game.hash())
+                undo = game.apply_move(random.choice(game.get_legal_moves()))
+                history.append((before, undo))
+            for before, undo in reversed(history):
+                game.undo_move(undo)
+                self.assertEqual(before, (game.to_string(), game.active_player,
+                                          game.move_count, game.hash()))
+
+
+class ZobristTest(unittest.TestCase):
+    """Check the incremental Zobrist key of both board engines"""
+
+    def test_incremental_key_matches_full_computation(self):
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls("Player1", "Player2", width=6, height=5)
+            while game.get_legal_moves():
+                self.assertEqual(game.zobrist_key, game._compute_zobrist_key())
+                game.apply_move(random.choice(game.get_legal_moves()))
+            self.assertEqual(game.zobrist_key, game._compute_zobrist_key())
+
+    def test_transpositions_share_key(self):
+        first = isolation.Board("Player1", "Player2")
+        second = isolation.BitBoard("Player1", "Player2")
+        for move in [(0, 0), (6, 6), (1, 2), (4, 5), (3, 3)]:
+            first.apply_move(move)
+        for move in [(3, 3), (6, 6), (1, 2), (4, 5), (0, 0)]:
+            second.apply_move(move)
+        self.assertNotEqual(first.to_string(), second.to_string())
+        self.assertNotEqual(first.hash(), second.hash())
+        third = isolation.Board("Player1", "Player2")
+        for move in [(1, 2), (6, 6), (0, 0), (4, 5), (3, 3)]:
+            third.apply_move(move)
+        self.assertEqual(first.to_string(), third.to_string())
+        self.assertEqual(first.hash(), third.hash())
+
+
+class AlphaBetaMakeUnmakeTest(unittest.TestCase):
+    """Check that make/unmake search matches the forecast_move search"""
+
+    def test_same_move_as_forecast_search(self):
+        for seed in range(5):
+            game = isolation.Board("Player1", "Player2")
+            opening = _random_opening(game, 4, seed)
+
+            moves = []
+            for make_unmake in (False, True):
+                player = game_agent.AlphaBetaPlayer(make_unmake=make_unmake)
+                player.time_left = lambda: float("inf")
+                board = isolation.Board(player, "Player2")
+                for move in opening:
+                    board.apply_move(move)
+                random.seed(seed)
+                moves.append(player.alphabeta(board, 3))
+                self.assertEqual(game.to_string(), board.to_string())
+            self.assertEqual(moves[0], moves[1])
+
+
+class TranspositionTableTest(unittest.TestCase):
+    """Unit tests for the transposition table and its use in the search"""
+
+    def test_replacement_policy(self):
+        table = transposition.TranspositionTable(max_bytes=1)
+        self.assertEqual(table.num_buckets, 1)
+        table.store(1, 5, 1., transposition.EXACT, (0, 0))
+        table.store(2, 3, 2., transposition.EXACT, (0, 1))
+        table.store(3, 2, 3., transposition.EXACT, (0, 2))
+        self.assertEqual(table.probe(1).depth, 5)
+        self.assertIsNone(table.probe(2))
+        self.assertEqual(table.probe(3).score, 3.)
+        table.store(4, 6, 4., transposition.LOWER, (0, 3))
+        self.assertIsNone(table.probe(1))
+        self.assertEqual(table.probe(4).flag, transposition.LOWER)
+
+    def test_same_score_as_plain_search(self):
+        for seed in range(3):
+            opening = _random_opening(
+                isolation.Board("Player1", "Player2"), 6, seed)
+
+            scores = []
+            for tt in (None, transposition.TranspositionTable()):
+                player = game_agent.AlphaBetaPlayer(tt=tt)
+                player.time_left = lambda: float("inf")
+                board = isolation.Board(player, "Player2")
+                for move in opening:
+                    board.apply_move(move)
+                scores.append(player.max_value(board, 4, float("-inf"),
+                                               float("inf"))[0])
+            self.assertEqual(scores[0], scores[1])
+
+
+class MoveOrderingTest(unittest.TestCase):
+    """Unit tests for the principal variation/killer/history move ordering"""
+
+    def test_order_priorities(self):
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        ordering = move_ordering.MoveOrdering()
+        ordering.new_search()
+        ordering.enter(0)
+        ordering.update_pv(0, (5, 4))
+        ordering.end_iteration(game)
+        ordering.cutoff((1, 2), 0, 1)
+        ordering.cutoff((2, 1), 1, 1)
+        ordering.cutoff((4, 1), 2, 5)
+        ordering.cutoff((2, 5), 1, 9)
+
+        moves = ordering.order(game, game.get_legal_moves(shuffle=False), 0,
+                               hash_move=(4, 5))
+        self.assertEqual(moves[:4], [(5, 4), (4, 5), (1, 2), (4, 1)])
+        self.assertEqual(ordering.pv, [(5, 4)])
+
+    def test_pv_survives_transposition_table_hits(self):
+        random.seed(0)
+        player = game_agent.AlphaBetaPlayer(
+            tt=transposition.TranspositionTable(),
+            ordering=move_ordering.MoveOrdering())
+        player.time_left = lambda: float("inf")
+        game = isolation.Board(player, "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        for depth in range(1, 5):
+            player.alphabeta(game, depth)
+        # The last iteration is answered by the entry of the root stored
+        # by a search to the same depth
+        player.alphabeta(game, 4)
+        self.assertGreater(len(player.ordering.pv), 0)
+        player.alphabeta(game, 5)
+        self.assertGreater(len(player.ordering.pv), 1)
+
+    def test_same_score_as_plain_search(self):
+        opening = _random_opening(isolation.Board("Player1", "Player2"), 6, 0)
+
+        scores = []
+        for ordering in (None, move_ordering.MoveOrdering()):
+            player = game_agent.AlphaBetaPlayer(ordering=ordering)
+            player.time_left = lambda: float("inf")
+            board = isolation.Board(player, "Player2")
+            for move in opening:
+                board.apply_move(move)
+            for depth in range(1, 5):
+                player.alphabeta(board, depth)
+            scores.append(player.max_value(board, 4, float("-inf"),
+                                           float("inf"))[0])
+        self.assertEqual(scores[0], scores[1])
+
+
+class PrincipalVariationSearchTest(unittest.TestCase):
+    """Check PVS and aspiration windows against plain alpha-beta search"""
+
+    def test_same_score_as_plain_search(self):
+        for seed in range(3):
+            opening = _random_opening(
+                isolation.Board("Player1", "Player2"), 6, seed)
+
+            scores = []
+            for kwargs in ({}, {"pvs": True},
+                           {"pvs": True, "aspiration_window": 1.,
+                            "ordering": move_ordering.MoveOrdering()}):
+                player = game_agent.AlphaBetaPlayer(**kwargs)
+                player.time_left = lambda: float("inf")
+                board = isolation.Board(player, "Player2")
+                for move in opening:
+                    board.apply_move(move)
+                score = None
+                for depth in range(1, 5):
+                    score, _ = player._aspiration_search(board, depth, score)
+                scores.append(score)
+            self.assertEqual(len(set(scores)), 1)
+
+
+def _store_in_child(table):
+    table.store(424242, 5, 1.5, transposition.UPPER, (2, 6))
+
+
+class _IdleMainLazySMPPlayer(parallel_search.LazySMPPlayer):
+    """Lazy SMP agent whose own search never completes an iteration"""
+
+    def _iterative_deepening(self, game):
+        while self.time_left() > self.TIMER_THRESHOLD:
+            time.sleep(0.001)
+        return 0, None, (-1, -1)
+
+
+class LazySMPTest(unittest.TestCase):
+    """Unit tests for the shared transposition table and Lazy SMP agent"""
+
+    def setUp(self):
+        self.game = isolation.Board("Player1", "Player2")
+        self.game.apply_move((3, 3))
+        self.game.apply_move((0, 0))
+
+    def _get_move(self, player):
+        game = isolation.Board(player, "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        start = timeit.default_timer()
+        time_left = lambda: 60. - 1000 * (timeit.default_timer() - start)
+        move = player.get_move(game, time_left)
+        self.assertGreater(time_left(), 0)
+        return move
+
+    def test_shared_table_roundtrip(self):
+        table = parallel_search.SharedTranspositionTable(max_bytes=1024)
+        self.assertIsNone(table.probe(12345))
+        table.store(12345, 7, -2.5, transposition.LOWER, (3, 4))
+        table.store(67890, 2, float("inf"), transposition.EXACT, (-1, -1))
+        self.assertEqual(table.probe(12345),
+                         (12345, 7, -2.5, transposition.LOWER, (3, 4)))
+        self.assertEqual(table.probe(67890),
+                         (67890, 2, float("inf"), transposition.EXACT,
+                          (-1, -1)))
+
+    def test_shared_table_caps_depth(self):
+        table = parallel_search.SharedTranspositionTable(max_bytes=1024)
+        table.store(12345, 600, 1., transposition.LOWER, (5, 6))
+        self.assertEqual(table.probe(12345),
+                         (12345, 255, 1., transposition.LOWER, (5, 6)))
+
+    def test_search_stops_when_solved(self):
+        player = game_agent.AlphaBetaPlayer()
+        game = isolation.Board(player, "Player2", width=4, height=4)
+        game.apply_move((0, 0))
+        game.apply_move((3, 3))
+        player.time_left = lambda: 10000.
+        depth, score, _ = player._iterative_deepening(game)
+        self.assertLessEqual(depth, len(game.get_blank_spaces()))
+        self.assertTrue(isinf(score))
+
+    def test_shared_table_across_processes(self):
+        table = parallel_search.SharedTranspositionTable(max_bytes=1024)
+        child = multiprocessing.Process(target=_store_in_child, args=(table,))
+        child.start()
+        child.join()
+        self.assertEqual(table.probe(424242),
+                         (424242, 5, 1.5, transposition.UPPER, (2, 6)))
+
+    def test_returns_legal_move(self):
+        with parallel_search.LazySMPPlayer(num_workers=1) as player:
+            move = self._get_move(player)
+        self.assertIn(move, self.game.get_legal_moves())
+        self.assertEqual(player._workers, [])
+
+    def test_returns_worker_result(self):
+        with _IdleMainLazySMPPlayer(num_workers=1) as player:
+            move = self._get_move(player)
+        self.assertIn(move, self.game.get_legal_moves())
+
+
+class RootSplitTest(unittest.TestCase):
+    """Check the root-split agents against the serial search"""
+
+    def setUp(self):
+        self.opening = _random_opening(
+            isolation.Board("Player1", "Player2"), 5, 0)
+
+    def _board(self, player):
+        # Player 2 is to move after the odd-length opening
+        board = isolation.Board("Player1", player)
+        for move in self.opening:
+            board.apply_move(move)
+        start = timeit.default_timer()
+        player.time_left = lambda: 10000. - 1000 * (timeit.default_timer() - start)
+        return board
+
+    def test_alphabeta_same_score_as_serial_search(self):
+        scores = []
+        for root_workers in (None, 2):
+            player = game_agent.AlphaBetaPlayer(root_workers=root_workers)
+            scores.append(player._search_root(self._board(player), 3)[0])
+            if player.root_pool is not None:
+                player.root_pool.close()
+        self.assertEqual(scores[0], scores[1])
+
+    def test_minimax_same_move_as_serial_search(self):
+        moves = []
+        for root_workers in (None, 2):
+            player = game_agent.MinimaxPlayer(root_workers=root_workers)
+            moves.append(player.minimax(self._board(player), 3))
+            if player.root_pool is not None:
+                player.root_pool.close()
+        self.assertEqual(moves[0], moves[1])
+
+
+class EndgameSolverTest(unittest.TestCase):
+    """Check the partitioned endgame solver against exhaustive search"""
+
+    def test_same_score_as_exhaustive_search(self):
+        random.seed(1)
+        solver = isolation.EndgameSolver()
+        solved = 0
+        while solved < 20:
+            player = game_agent.AlphaBetaPlayer()
+            player.time_left = lambda: float("inf")
+            game = isolation.Board(player, "Player2", width=5, height=5)
+            while (game.get_legal_moves() and
+                   isolation.endgame.partition(game) is None):
+                game.apply_move(random.choice(game.get_legal_moves()))
+            result = solver.solve(game, player)
+            if not game.get_legal_moves() or result is None:
+                continue
+            solved += 1
+            if game.active_player == player:
+                score, _ = player.max_value(game, 25, float("-inf"),
+                                            float("inf"))
+            else:
+                score, _ = player.min_value(game, 25, float("-inf"),
+                                            float("inf"))
+            self.assertEqual(result[0], score)
+            self.assertIn(result[1], game.get_legal_moves())
+
+    def test_check_clock_aborts_search(self):
+        random.seed(1)
+        game = isolation.Board("Player1", "Player2", width=5, height=5)
+        while isolation.endgame.partition(game) is None:
+            game.apply_move(random.choice(game.get_legal_moves()))
+        solver = isolation.EndgameSolver()
+        solver.CHECK_INTERVAL = 1
+
+        def check_clock():
+            raise game_agent.SearchTimeout()
+
+        with self.assertRaises(game_agent.SearchTimeout):
+            solver.solve(game, "Player1", check_clock)
+        self.assertIsNotNone(solver.solve(game, "Player1"))
+
+
+def _reference_custom_score(game, player, a=3, b=2, c=1, d=1):
+    """The original `game_agent.custom_score()` built on `forecast_move()`"""
+    opp = game.get_opponent(player)
+    own_moves = game.get_legal_moves(player)
+    opp_moves = game.get_legal_moves(opp)
+    if game.is_loser(player) or len(own_moves) == 0:
+        return float('-inf')
+    if game.is_winner(player) or len(opp_moves) == 0:
+        return float('inf')
+    own_controlled = set()
+    for move in own_moves:
+        own_controlled.update(game.forecast_move(move).get_legal_moves())
+    opp_controlled = set()
+    for move in opp_moves:
+        opp_controlled.update(game.forecast_move(move).get_legal_moves(opp))
+    own_score = len(own_moves) * a + len(own_controlled) * c
+    opp_score = len(opp_moves) * b + len(opp_controlled) * d
+    return float(own_score - opp_score)
+
+
+def _reference_custom_score_2(game, player, a=7, b=1, c=2):
+    """The original `game_agent.custom_score_2()` built on `forecast_move()`"""
+    opp = game.get_opponent(player)
+    own_moves = game.get_legal_moves(player)
+    opp_moves = game.get_legal_moves(opp)
+    if game.is_loser(player) or len(own_moves) == 0:
+        return float('-inf')
+    if game.is_winner(player) or len(opp_moves) == 0:
+        return float('inf')
+    num_next_own = sum(
+        len(game.forecast_move(m).get_legal_moves()) for m in own_moves)
+    num_next_opp = sum(
+        len(game.forecast_move(m).get_legal_moves(opp)) for m in opp_moves)
+    return float(num_next_own * b + len(own_moves) * a - num_next_opp * c)
+
+
+class _StockBoard(isolation.Board):
+    """A board with only the API of the `Board` class of the project"""
+    encode = None
+
+
+class CustomScoreTest(unittest.TestCase):
+    """Check the fast custom scores against the original implementations"""
+
+    def test_same_scores_as_forecast_implementation(self):
+        random.seed(0)
+        for board_cls in (isolation.Board, isolation.BitBoard, _StockBoard):
+            for _ in range(30):
+                game = board_cls("Player1", "Player2")
+                while True:
+                    params = [random.randint(-3, 7) for _ in range(4)]
+                    for player in ("Player1", "Player2"):
+                        game_agent._score_cache.clear()
+                        self.assertEqual(
+                            game_agent.custom_score(game, player, *params),
+                            _reference_custom_score(game, player, *params))
+                        self.assertEqual(
+                            game_agent.custom_score_2(game, player,
+                                                      *params[:3]),
+                            _reference_custom_score_2(game, player,
+                                                      *params[:3]))
+                        # Cached scores
+                        self.assertEqual(
+                            game_agent.custom_score(game, player, *params),
+                            _reference_custom_score(game, player, *params))
+                    moves = game.get_legal_moves()
+                    if not moves:
+                        break
+                    game.apply_move(random.choice(moves))
+
+    def test_cache_tells_board_sizes_apart(self):
+        game_agent._score_cache.clear()
+        for size in (7, 5):
+            game = isolation.Board("Player1", "Player2", width=size,
+                                   height=size)
+            self.assertEqual(game_agent.custom_score(game, "Player1"),
+                             _reference_custom_score(game, "Player1"))
+
+    def test_cache_is_bounded(self):
+        cache = game_agent.ScoreCache(max_entries=2)
+        cache.put(1, 1.)
+        cache.put(2, 2.)
+        self.assertEqual(cache.get(1), 1.)
+        cache.put(3, 3.)
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), 1.)
+        self.assertEqual(len(cache), 2)
+
+
+class BatchScoringTest(unittest.TestCase):
+    """Check the NumPy batch scores against the score functions"""
+
+    def test_same_scores_as_score_functions(self):
+        import batch_scoring
+        random.seed(0)
+        score_fns = [sample_players.improved_score, sample_players.center_score,
+                     game_agent.custom_score_3,
+                     functools.partial(game_agent.custom_score_3, a=5, b=1)]
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            for _ in range(10):
+                game = board_cls("Player1", "Player2")
+                moves = game.get_legal_moves()
+                while moves:
+                    for player in ("Player1", "Player2"):
+                        states = batch_scoring.stack_children(game, moves,
+                                                              player)
+                        for score_fn in score_fns:
+                            if (score_fn is sample_players.center_score and
+                                    game.move_count == 0):
+                                continue  # The player has no location
+                            expected = []
+                            for move in moves:
+                                child = game.forecast_move(move)
+                                expected.append(child.utility(player) or
+                                                score_fn(child, player))
+                            batch_fn = batch_scoring.batch_score_fn(score_fn)
+                            self.assertEqual(batch_fn(states).tolist(),
+                                             expected)
+                    game.apply_move(random.choice(moves))
+                    moves = game.get_legal_moves()
+
+
+class ParallelTournamentTest(unittest.TestCase):
+    """Check the parallel tournament runner"""
+
+    def test_prints_all_rows(self):
+        test_agents = [tournament.Agent(sample_players.RandomPlayer(), name)
+                       for name in ("A", "B", "C", "D")]
+        cpu_agents = [tournament.Agent(sample_players.RandomPlayer(), name)
+                      for name in ("X", "Y")]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            tournament.play_matches_parallel(cpu_agents, test_agents, 2,
+                                             board_cls=isolation.BitBoard)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[:2] for line in lines[3:5]],
+                         [["1", "X"], ["2", "Y"]])
+        for line in lines[3:5]:
+            counts = [int(n) for n in line.replace("|", " ").split()[2:]]
+            self.assertEqual([won + lost for won, lost
+                              in zip(counts[::2], counts[1::2])], [4] * 4)
+        self.assertIn("Win Rate:", out.getvalue())
+
+
+class SPRTTest(unittest.TestCase):
+    """Check the SPRT of the tournament script"""
+
+    def test_llr_sign(self):
+        self.assertGreater(tournament.sprt_llr([0, 2, 30], 0., 20.), 2.95)
+        self.assertLess(tournament.sprt_llr([30, 2, 0], 0., 20.), -2.95)
+        # A score halfway between the hypotheses favors neither
+        self.assertAlmostEqual(tournament.sprt_llr([10, 0, 10], -20., 20.), 0.)
+        # One pair is not enough to decide
+        self.assertLess(tournament.sprt_llr([0, 0, 1], 0., 20.), 2.95)
+
+    def test_stops_at_max_pairs(self):
+        agents = [tournament.Agent(sample_players.RandomPlayer(), name)
+                  for name in ("A", "B")]
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = tournament.play_sprt(agents[0], agents[1], elo0=-10.,
+                                          elo1=10., max_pairs=3,
+                                          board_cls=isolation.BitBoard)
+        self.assertEqual(result.pairs, 3)
+        self.assertEqual(result.wins + result.losses, 6)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = tournament.play_sprt(agents[0], agents[1], max_pairs=0)
+        self.assertEqual(result, (None, 0., 0, 0, 0))
+
+
+def _fake_evaluate_points(score_fn, names, points, cpu_agents, num_matches,
+                          n_jobs=-1, store=None, stage=""):
+    """Deterministic stand-in for `grid_search._evaluate_points()` with the
+    best win rate at a = 7, b = 3"""
+    games = 2 * num_matches * len(cpu_agents)
+    return [int(round((0.9 - 0.02 * ((a - 7) ** 2 + (b - 3) ** 2)) * games))
+            for a, b in points]
+
+
+class AdaptiveSearchTest(unittest.TestCase):
+    """Check the adaptive parameter searches of `grid_search`"""
+
+    def setUp(self):
+        import grid_search
+        self.grid_search = grid_search
+        self.points = list(itertools.product(range(1, 10), range(1, 10)))
+        patcher = mock.patch.object(grid_search, "_evaluate_points",
+                                    side_effect=_fake_evaluate_points)
+        self.evaluate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _matches_played(self):
+        return sum(len(call[0][2]) * call[0][4]
+                   for call in self.evaluate.call_args_list)
+
+    def test_successive_halving(self):
+        results = self.grid_search.successive_halving(
+            None, ("a", "b"), self.points, min_matches=1, max_matches=27,
+            cpu_agents=[None] * 7)
+        self.assertEqual(results[0][0], (7, 3))
+        self.assertLess(self._matches_played(), len(self.points) * 27 / 5)
+
+    def test_hyperband(self):
+        results = self.grid_search.hyperband(
+            None, ("a", "b"), self.points, max_matches=27,
+            cpu_agents=[None] * 7, seed=0)
+        self.assertLess(self._matches_played(), len(self.points) * 27 / 5)
+        self.assertGreater(results[0][1] / float(results[0][2]), 0.85)
+
+    def test_bayesian_search(self):
+        results = self.grid_search.bayesian_search(
+            None, ("a", "b"), [(1, 9), (1, 9)], num_matches=10, n_calls=20,
+            cpu_agents=[None] * 7, seed=0)
+        self.assertEqual(len(results), 20)
+        best_a, best_b = results[0][0]
+        self.assertLess((best_a - 7) ** 2 + (best_b - 3) ** 2, 1.)
+
+    def test_resumed_searches_sample_same_points(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "results.jsonl")
+        sampled = []
+        for _ in range(2):
+            self.evaluate.reset_mock()
+            store = results_store.ResultsStore(path)
+            self.grid_search.hyperband(
+                game_agent.custom_score_3, ("a", "b"), self.points,
+                max_matches=9, cpu_agents=[None] * 7, store=store)
+            self.grid_search.bayesian_search(
+                game_agent.custom_score_3, ("a", "b"), [(1, 9), (1, 9)],
+                n_calls=12, cpu_agents=[None] * 7, store=store)
+            sampled.append([call[0][2]
+                            for call in self.evaluate.call_args_list])
+        self.assertEqual(sampled[0], sampled[1])
+
+
+class ResultsStoreTest(unittest.TestCase):
+    """Check the resumable results store of `grid_search`"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_resume_skips_stored_points(self):
+        import grid_search
+        path = os.path.join(self.dir, "results.jsonl")
+        cpu_agents = [tournament.Agent(None, "X"), tournament.Agent(None, "Y")]
+        points = [(1, 2), (3, 4), (5, 6)]
+        with mock.patch.object(grid_search, "_eval_with_params",
+                               side_effect=lambda *args, **kw: kw["a"]) as ev:
+            wins = grid_search._evaluate_points(
+                game_agent.custom_score_3, ("a", "b"), points[:2],
+                cpu_agents, 3, n_jobs=1,
+                store=results_store.ResultsStore(path))
+            self.assertEqual(wins, [1, 3])
+            # A crash in the middle of writing a record
+            with open(path, "a") as fp:
+                fp.write('{"score_fn": "custom')
+            ev.reset_mock()
+            wins = grid_search._evaluate_points(
+                game_agent.custom_score_3, ("a", "b"), points, cpu_agents, 3,
+                n_jobs=1, store=results_store.ResultsStore(path))
+            self.assertEqual(wins, [1, 3, 5])
+            self.assertEqual(ev.call_count, 1)
+        self.assertEqual(len(results_store.ResultsStore(path)), 3)
+
+    def test_merge(self):
+        paths = [os.path.join(self.dir, name) for name in "abc"]
+        first = results_store.ResultsStore(paths[0])
+        first.add("custom_score", {"a": 1}, ["X"], 5, 7)
+        first.add("custom_score", {"a": 2}, ["X"], 5, 8)
+        second = results_store.ResultsStore(paths[1])
+        second.add("custom_score", {"a": 2}, ["X"], 5, 8)
+        second.add("custom_score", {"a": 2}, ["X"], 10, 15)
+        self.assertEqual(results_store.merge_stores(paths[2], paths[:2]), 3)
+        merged = results_store.ResultsStore(paths[2])
+        self.assertEqual(merged.get("custom_score", {"a": 2}, ["X"], 10), 15)
+        self.assertIsNone(merged.get("custom_score", {"a": 2}, ["Y"], 10))
+
+
+def _fake_play_cpu_agents(cpu_agents, test_agent, num_matches):
+    """Stand-in for `grid_search._play_cpu_agents()` that wins `a` times"""
+    return test_agent.player.score.keywords["a"] * num_matches
+
+
+class EvaluationPoolTest(unittest.TestCase):
+    """Check the persistent evaluation pool of `grid_search`"""
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                         "the workers must inherit the patched module")
+    def test_pool_is_reused(self):
+        import grid_search
+        self.addCleanup(grid_search._close_pools)
+        cpu_agents = [tournament.Agent(sample_players.RandomPlayer(), "X")]
+        with mock.patch.object(grid_search, "_play_cpu_agents",
+                               _fake_play_cpu_agents), \
+                contextlib.redirect_stdout(io.StringIO()):
+            wins = grid_search._evaluate_points(
+                game_agent.custom_score_3, ("a", "b"),
+                [(a, 1) for a in range(1, 10)], cpu_agents, 2, n_jobs=2)
+            self.assertEqual(wins, [2 * a for a in range(1, 10)])
+            pools = list(grid_search._pools.values())
+            wins = grid_search._evaluate_points(
+                game_agent.custom_score_3, ("a", "b"), [(5, 5)], cpu_agents,
+                3, n_jobs=2)
+            self.assertEqual(wins, [15])
+            self.assertEqual(list(grid_search._pools.values()), pools)
+
+
+class PerftTest(unittest.TestCase):
+    """Check the move generation against the stored perft counts"""
+
+    def test_perft_counts(self):
+        import perft
+        for board_cls, make_unmake in itertools.product(
+                (isolation.Board, isolation.BitBoard), (True, False)):
+            self.assertEqual(perft.verify(board_cls, 3, make_unmake), [])
+
+    def test_benchmark_reports_every_method(self):
+        import perft
+        rates = perft.benchmark(isolation.BitBoard, depth=1, repeat=1)
+        self.assertEqual(sorted(rates), sorted(perft.BENCHMARKS))
+        self.assertTrue(all(rate > 0 for rate in rates.values()))
+
+
+class SearchStatsTest(unittest.TestCase):
+    """Check the search statistics of the alpha-beta agent"""
+
+    def test_counts_every_node(self):
+        stats = search_stats.SearchStats()
+        player = game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score, make_unmake=True,
+            tt=transposition.TranspositionTable(), stats=stats)
+        game = isolation.Board(player, "Player2")
+        for move in [(2, 3), (4, 4), (0, 2), (5, 2)]:
+            game.apply_move(move)
+        visits = [0]
+
+        def counted(search_fn):
+            def wrapper(*args):
+                visits[0] += 1
+                return search_fn(*args)
+            return wrapper
+
+        # Time out in the middle of an iteration
+        clock = itertools.chain([1e9] * 200, itertools.repeat(-1.))
+        player.time_left = lambda: next(clock)
+        with mock.patch.object(player, "max_value",
+                               counted(player.max_value)), \
+                mock.patch.object(player, "min_value",
+                                  counted(player.min_value)):
+            depth, _, _ = player._iterative_deepening(game)
+
+        self.assertEqual(len(stats), 1)
+        move_stats = stats.moves[0]
+        self.assertGreater(depth, 0)
+        self.assertEqual(move_stats.depth, depth)
+        self.assertEqual(len(move_stats.depth_times), depth)
+        # The call that timed out didn't search its node
+        self.assertEqual(move_stats.nodes, visits[0] - 1)
+        self.assertGreaterEqual(move_stats.nodes, sum(move_stats.depth_nodes))
+        self.assertLessEqual(move_stats.leaves, move_stats.nodes)
+        self.assertGreater(move_stats.cutoffs, 0)
+        self.assertGreater(move_stats.tt_probes, 0)
+
+    def test_merges_tournament_worker_stats(self):
+        test_agents = [tournament.Agent(game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score,
+            stats=search_stats.SearchStats()), "A")]
+        cpu_agents = [tournament.Agent(sample_players.RandomPlayer(), "X")]
+        with mock.patch.object(tournament, "_worker_agents",
+                               (cpu_agents, test_agents, isolation.BitBoard)):
+            opening = tournament.random_opening(isolation.BitBoard)
+            _, _, _, (cpu_stats, test_stats) = tournament._play_pair(
+                (0, 0, opening))
+        self.assertIsNone(cpu_stats)
+        self.assertGreater(len(test_stats), 0)
+        # The worker agent starts over for the next task
+        self.assertEqual(len(test_agents[0].player.stats), 0)
+        total = search_stats.SearchStats().merge(test_stats).merge(test_stats)
+        summary = total.summary()
+        self.assertEqual(summary["moves"], 2 * len(test_stats))
+        self.assertGreater(summary["max_depth"], 0)
+        self.assertEqual(len(summary["depth_times"]), summary["max_depth"])
+        self.assertIn("moves, depth", total.format("A"))
+
+
+class TimeManagerTest(unittest.TestCase):
+    """Check the time management of iterative deepening"""
+
+    def test_skips_iterations_that_cannot_finish(self):
+        manager = time_manager.TimeManager()
+        manager.new_search(100.)
+        # Iterations completed after 1, 3, 9 and 27 ms: the time triples
+        for remaining in (99., 97., 91., 73.):
+            self.assertTrue(manager.next_iteration((0, 0), 1., remaining))
+        self.assertEqual(manager.predict(), 54.)
+        self.assertFalse(manager.next_iteration((0, 0), 1., 19.))
+        self.assertEqual(manager.skipped, 1)
+
+    def test_extends_critical_positions(self):
+        # The fourth iteration is predicted to take 54 ms of the 33 ms left,
+        # the search of its first root move 27 ms
+        for last_move, extended in (((0, 0), False), ((1, 2), True)):
+            manager = time_manager.TimeManager()
+            manager.new_search(60.)
+            for remaining in (59., 57.):
+                manager.next_iteration((0, 0), 1., remaining)
+            self.assertEqual(manager.next_iteration((0, 0), 1., 51.), True)
+            self.assertEqual(manager.next_iteration(last_move, 1., 33.),
+                             extended)
+            self.assertEqual((manager.extended, manager.skipped),
+                             (int(extended), int(not extended)))
+
+    def test_stops_on_proven_score(self):
+        manager = time_manager.TimeManager()
+        manager.new_search(100.)
+        self.assertFalse(manager.next_iteration((0, 0), float("inf"), 99.))
+
+    def test_keeps_partial_iteration(self):
+        game = isolation.Board("Player1", "Player2")
+        for move in [(2, 3), (4, 4)]:
+            game.apply_move(move)
+        moves = game.get_legal_moves()
+        for manager, expected in ((None, moves[0]),
+                                  (time_manager.TimeManager(), moves[1])):
+            player = game_agent.AlphaBetaPlayer(time_manager=manager)
+            player.time_left = lambda: 1e9
+
+            def search(game, depth, guess):
+                if depth == 1:
+                    return 0., moves[0]
+                self.assertEqual(player._root_move,
+                                 None if manager is None else moves[0])
+                player._root_best = 1., moves[1]
+                raise game_agent.SearchTimeout()
+
+            with mock.patch.object(player, "_aspiration_search", search):
+                depth, _, move = player._iterative_deepening(game)
+            self.assertEqual((depth, move), (1, expected))
+
+    def test_searches_previous_best_move_first(self):
+        player = game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score)
+        player.time_left = lambda: 1e9
+        game = isolation.Board(player, "Player2")
+        for move in [(2, 3), (4, 4)]:
+            game.apply_move(move)
+        player._root_move = game.get_legal_moves(shuffle=False)[-1]
+        searched = []
+        search_child = player._search_child
+
+        def record(game, move, search_fn, depth, alpha, beta, ply):
+            if ply == 1:
+                searched.append(move)
+            return search_child(game, move, search_fn, depth, alpha, beta,
+                                ply)
+
+        with mock.patch.object(player, "_search_child", record):
+            score, move = player.max_value(game, 3, float("-inf"),
+                                           float("inf"))
+        self.assertEqual(searched[0], player._root_move)
+        self.assertEqual(player._root_best, (score, move))
+
+
+class ClockCheckTest(unittest.TestCase):
+    """Check the periodic clock reads of the search agents"""
+
+    def test_get_move_meets_deadline(self):
+        for player in (game_agent.AlphaBetaPlayer(
+                           score_fn=sample_players.improved_score),
+                       game_agent.MinimaxPlayer(
+                           search_depth=6,
+                           score_fn=sample_players.improved_score)):
+            game = isolation.BitBoard(player, "Player2")
+            for move in [(2, 3), (4, 4)]:
+                game.apply_move(move)
+            start = timeit.default_timer()
+
+            def time_left():
+                return 100 - 1000 * (timeit.default_timer() - start)
+
+            self.assertIn(player.get_move(game, time_left),
+                          game.get_legal_moves())
+            self.assertGreater(time_left(), 0)
+            self.assertGreater(player._check_interval, 1)
+            self.assertIsNone(player._deadline)
+
+    def test_direct_search_reads_clock_at_every_node(self):
+        player = game_agent.AlphaBetaPlayer()
+        game = isolation.Board(player, "Player2")
+        calls = itertools.count()
+        player.time_left = lambda: 100 - next(calls)
+        with self.assertRaises(game_agent.SearchTimeout):
+            player.max_value(game, 3, float("-inf"), float("inf"))
+        # One read per node until it fell below the threshold at the 92nd
+        self.assertEqual(next(calls), 92)
+
+
+class SymmetryTest(unittest.TestCase):
+    """Check the canonical keys of symmetric positions"""
+
+    def test_symmetric_positions_share_key(self):
+        from isolation.tables import symmetry_tables
+        random.seed(0)
+        for width, height in ((7, 7), (6, 5)):
+            tables = symmetry_tables(width, height)
+            self.assertEqual(len(tables.permutations),
+                             8 if width == height else 4)
+            for _ in range(10):
+                game = isolation.BitBoard("Player1", "Player2", width, height)
+                _random_opening(game, random.randrange(8))
+                key, symmetry = game.canonical_key()
+                _, _, move_count, blocked, p1_loc, p2_loc = game.encode()
+                for t, perm in enumerate(tables.permutations):
+                    encoding = (width, height, move_count,
+                                tables.transform_mask(blocked, t),
+                                None if p1_loc is None else perm[p1_loc],
+                                None if p2_loc is None else perm[p2_loc])
+                    board = isolation.Board.decode("Player1", "Player2",
+                                                   encoding)
+                    self.assertEqual(board.canonical_key()[0], key)
+                    self.assertEqual(
+                        sorted(board.get_legal_moves()),
+                        sorted(tables.transform_move(move, t)
+                               for move in game.get_legal_moves()))
+                    if t == symmetry:
+                        self.assertEqual(board.hash(), key)
+
+    def test_moves_map_back(self):
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((0, 1))
+        key, symmetry = game.canonical_key()
+        self.assertLessEqual(key, game.hash())
+        for move in game.get_legal_moves():
+            canonical = game.to_canonical(move, symmetry)
+            self.assertEqual(game.from_canonical(canonical, symmetry), move)
+
+
+class OpeningBookTest(unittest.TestCase):
+    """Check the opening book builder and lookups"""
+
+    @classmethod
+    def setUpClass(cls):
+        import opening_book
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp.name, "book.bin")
+        with contextlib.redirect_stdout(io.StringIO()):
+            opening_book.build_book(cls.path, 5, 5, plies=1, time_limit=5.,
+                                    num_workers=1)
+        cls.book = opening_book.OpeningBook(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.book.close()
+        cls.tmp.cleanup()
+
+    def test_symmetric_positions_get_symmetric_moves(self):
+        from isolation.tables import symmetry_tables
+        tables = symmetry_tables(5, 5)
+        # The empty board and the 6 canonical first moves
+        self.assertEqual(len(self.book), 7)
+        for first in isolation.Board("Player1", "Player2", 5, 5) \
+                .get_legal_moves():
+            game = isolation.Board("Player1", "Player2", 5, 5)
+            game.apply_move(first)
+            move = self.book.lookup(game)
+            self.assertIn(move, game.get_legal_moves())
+            after = game.forecast_move(move).canonical_key()[0]
+            for t in range(len(tables.permutations)):
+                other = isolation.BitBoard("Player1", "Player2", 5, 5)
+                other.apply_move(tables.transform_move(first, t))
+                # The same move up to the symmetries of the position
+                self.assertEqual(other.forecast_move(self.book.lookup(other))
+                                 .canonical_key()[0], after)
+        game.apply_move(self.book.lookup(game))
+        self.assertIsNone(self.book.lookup(game))
+        self.assertIsNone(self.book.lookup(isolation.Board("Player1",
+                                                           "Player2")))
+
+    def test_collisions_never_give_illegal_moves(self):
+        game = isolation.Board("Player1", "Player2", 5, 5)
+        game.apply_move((2, 2))
+        game.apply_move((0, 0))
+        moves = []
+        # Entries of colliding keys, with any move
+        for square in range(25):
+            with mock.patch.object(self.book, "probe",
+                                   return_value=(square, 1)):
+                moves.append(self.book.lookup(game))
+        self.assertEqual(set(moves) - {None},
+                         set(game.get_legal_moves()))
+
+    def test_player_plays_book_moves_without_searching(self):
+        player = game_agent.AlphaBetaPlayer(opening_book=self.book)
+        game = isolation.Board(player, "Player2", 5, 5)
+
+        def time_left():
+            raise AssertionError("searched a book position")
+
+        self.assertEqual(player.get_move(game, time_left),
+                         self.book.lookup(game))
+
+
+def _negamax(game):
+    """Return (the player to move wins, distance in plies) of `game` by
+    exhaustive search."""
+    best = None
+    for move in game.get_legal_moves():
+        child_wins, child_distance = _negamax(game.forecast_move(move))
+        result = (not child_wins, child_distance + 1)
+        rank = (result[0], -result[1] if result[0] else result[1])
+        if best is None or rank > best[0]:
+            best = (rank, result)
+    return (False, 0) if best is None else best[1]
+
+
+class TablebaseTest(unittest.TestCase):
+    """Check the retrograde tablebase against exhaustive search"""
+
+    def setUp(self):
+        from isolation.tablebase import Tablebase, build_tablebase
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "tb.bin")
+        self.assertEqual(build_tablebase(path, 4, 4), 15563)
+        self.tablebase = Tablebase(path)
+        self.addCleanup(self.tablebase.close)
+
+    def test_matches_exhaustive_search(self):
+        random.seed(1)
+        for _ in range(40):
+            game = isolation.BitBoard("Player1", "Player2", 4, 4)
+            _random_opening(game, random.randrange(2, 10))
+            wins, distance, move = self.tablebase.probe(game)
+            self.assertEqual((wins, distance), _negamax(game))
+            if distance:
+                child = self.tablebase.probe(game.forecast_move(move))
+                self.assertEqual(child[:2], (not wins, distance - 1))
+
+    def test_solves_search_nodes(self):
+        player = game_agent.AlphaBetaPlayer(endgame_solver=self.tablebase)
+        player.time_left = lambda: 1e9
+        game = isolation.Board(player, "Player2", 4, 4)
+        game.apply_move((0, 0))
+        game.apply_move((3, 3))
+        score, move = player.max_value(game, 3, float("-inf"), float("inf"))
+        wins, _, best = self.tablebase.probe(game)
+        self.assertEqual((score, move), (float("inf") if wins else
+                                         float("-inf"), best))
+        self.assertIsNone(self.tablebase.probe(
+            isolation.Board("Player1", "Player2")))
+
+
+class MCTSTest(unittest.TestCase):
+    """Check the Monte Carlo tree search agent"""
+
+    def test_rollout_plays_until_a_player_is_stuck(self):
+        from isolation.tables import knight_tables
+        tables = knight_tables(3, 3)
+        # The center of a 3x3 board has no knight moves
+        center = 4
+        self.assertEqual(mcts.rollout(tables, 1 << center | 1, center, 0), 0)
+        # The player in (0, 0) moves to (1, 2) or (2, 1), then the center is
+        # stuck
+        self.assertEqual(mcts.rollout(tables, 1 << center | 1, 0, center), 1)
+        for _ in range(20):
+            plies = mcts.rollout(tables, 0, None, None)
+            self.assertTrue(1 <= plies <= 9)
+
+    def test_finds_winning_move(self):
+        player = game_agent.AlphaBetaPlayer()
+        mcts_player = mcts.MCTSPlayer()
+        game = isolation.Board(mcts_player, player, 3, 3)
+        for move in [(0, 0), (1, 1)]:
+            game.apply_move(move)
+        # Player 2 is stuck in the center, any move wins
+        self.assertIn(mcts_player.get_move(game, lambda: 50.),
+                      game.get_legal_moves())
+        game = isolation.Board(mcts_player, player, 5, 5)
+        for move in [(2, 0), (2, 2), (0, 1), (1, 4), (1, 3), (0, 2),
+                     (2, 1), (2, 3), (3, 3), (0, 4)]:
+            game.apply_move(move)
+        # (1, 2) leaves player 2 in (0, 4) without moves, (4, 1) loses
+        self.assertEqual(sorted(game.get_legal_moves()), [(1, 2), (4, 1)])
+        deadline = timeit.default_timer() + 0.05
+        move = mcts_player.get_move(
+            game, lambda: 1000 * (deadline - timeit.default_timer()))
+        self.assertEqual(move, (1, 2))
+
+    def test_reuses_subtree_of_reply(self):
+        stats = search_stats.MCTSStats()
+        mcts_player = mcts.MCTSPlayer(stats=stats)
+        game = isolation.BitBoard(mcts_player, "Player2", 5, 5)
+        for move in [(2, 2), (0, 0)]:
+            game.apply_move(move)
+        game.apply_move(mcts_player.get_move(game, lambda: 40.))
+        tree = mcts_player.tree
+        # The root is the position after the move, with the opponent to move
+        reply = max(tree.children(tree.root), key=tree.visits.__getitem__)
+        visits = tree.visits[reply]
+        self.assertGreater(visits, 0)
+        game.apply_move(tree.tables.coords[tree.moves[reply]])
+        mcts_player.get_move(game, lambda: 40.)
+        self.assertIs(mcts_player.tree, tree)
+        self.assertEqual(stats.moves[1][2], visits)
+        self.assertEqual(tree.visits[reply], visits + stats.moves[1][0])
+        # A position outside of the tree starts a new one
+        game = isolation.BitBoard(mcts_player, "Player2", 5, 5)
+        mcts_player.get_move(game, lambda: 20.)
+        self.assertIsNot(mcts_player.tree, tree)
+        self.assertEqual(stats.moves[2][2], 0)
+        self.assertIn("playouts/s", stats.format("MCTS"))
+
+    def test_tournament_reports_playouts(self):
+        test_agents = [tournament.Agent(sample_players.RandomPlayer(), name)
+                       for name in ("A", "B", "C", "D")]
+        test_agents.append(tournament.Agent(
+            mcts.MCTSPlayer(stats=search_stats.MCTSStats()), "MCTS"))
+        cpu_agents = [tournament.Agent(sample_players.RandomPlayer(), "X")]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), \
+                mock.patch.object(tournament, "TIME_LIMIT", 30):
+            tournament.play_matches_parallel(cpu_agents, test_agents, 1,
+                                             board_cls=isolation.BitBoard)
+            tournament.print_search_stats(test_agents)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1].split()[-1], "MCTS")
+        counts = [int(n) for n in lines[3].replace("|", " ").split()[2:]]
+        self.assertEqual(len(counts), 10)
+        self.assertGreater(len(test_agents[-1].player.stats), 0)
+        self.assertIn("MCTS: ", out.getvalue())
+
+
+def _playouts_in_child(tree, width, height, state, num_playouts):
+    from isolation.tables import knight_tables
+    tree.tables, tree.state = knight_tables(width, height), state
+    for _ in range(num_playouts):
+        tree.playout(1.)
+
+
+class ParallelMCTSTest(unittest.TestCase):
+    """Check the root parallel and tree parallel MCTS agents"""
+
+    def _get_move(self, player, game, millis=60.):
+        start = timeit.default_timer()
+        time_left = lambda: millis - 1000 * (timeit.default_timer() - start)
+        move = player.get_move(game, time_left)
+        self.assertIn(move, game.get_legal_moves())
+        return move
+
+    def _new_game(self, player):
+        game = isolation.BitBoard(player, "Player2", 5, 5)
+        for move in [(2, 2), (0, 0)]:
+            game.apply_move(move)
+        return game
+
+    def test_shared_tree_across_processes(self):
+        from isolation.tables import knight_tables
+        tree = parallel_search.SharedSearchTree(capacity=2 ** 16)
+        # Players in (2, 2) and (0, 0) of a 5x5 board
+        state = (1 << 12 | 1, 12, 0)
+        tree.reset(knight_tables(5, 5), state)
+        child = multiprocessing.Process(target=_playouts_in_child,
+                                        args=(tree, 5, 5, state, 300))
+        child.start()
+        _playouts_in_child(tree, 5, 5, state, 300)
+        child.join()
+        self.assertEqual(child.exitcode, 0)
+        # Concurrent updates of the statistics may be lost
+        self.assertTrue(500 < tree.visits[0] <= 600)
+        # The children of every node were added exactly once
+        nodes = set()
+        for node in range(len(tree)):
+            children = set(tree.children(node))
+            self.assertTrue(nodes.isdisjoint(children))
+            nodes.update(children)
+        self.assertEqual(nodes, set(range(1, len(tree))))
+
+    def test_full_shared_tree_keeps_searching(self):
+        from isolation.tables import knight_tables
+        tree = parallel_search.SharedSearchTree(capacity=20)
+        tree.reset(knight_tables(5, 5), (1 << 12 | 1, 12, 0))
+        for _ in range(200):
+            tree.playout(1.)
+        self.assertLessEqual(len(tree), 20)
+        self.assertEqual(tree.visits[0], 200)
+
+    def test_visits_slot_roundtrip(self):
+        results = multiprocessing.RawArray(
+            "l", 2 * parallel_search._VISITS_FIELDS)
+        parallel_search._write_visits(results, 1, 7, 100, {3: 60, 9: 40})
+        self.assertEqual(parallel_search._read_visits(results, 1, 7, [3, 9]),
+                         (100, {3: 60, 9: 40}))
+        self.assertIsNone(parallel_search._read_visits(results, 1, 8, [3]))
+        # A slot read in the middle of an update
+        results[parallel_search._VISITS_FIELDS] = 0
+        self.assertIsNone(parallel_search._read_visits(results, 1, 7, [3]))
+        # A worker that stopped before its first playout
+        parallel_search._write_visits(results, 1, 8, 0, {})
+        self.assertIsNone(parallel_search._read_visits(results, 1, 8, [3]))
+
+    def test_root_parallel_adds_worker_playouts(self):
+        stats = search_stats.MCTSStats()
+        with parallel_search.ParallelMCTSPlayer(num_workers=1,
+                                                stats=stats) as player:
+            self._get_move(player, self._new_game(player), millis=100.)
+        # The tree of the main process has moved to the child of its move
+        own_playouts = player.tree.visits[0]
+        self.assertGreater(stats.moves[0][0], own_playouts)
+        self.assertEqual(player._workers, [])
+
+    def test_shared_tree_is_reused(self):
+        stats = search_stats.MCTSStats()
+        with parallel_search.ParallelMCTSPlayer(
+                num_workers=1, shared_tree=True, stats=stats) as player:
+            game = self._new_game(player)
+            game.apply_move(self._get_move(player, game))
+            tree = player.tree
+            reply = max(tree.children(tree.root), key=lambda node:
+                        tree.visits[node])
+            visits = tree.visits[reply]
+            game.apply_move(tree.tables.coords[tree.moves[reply]])
+            self._get_move(player, game)
+        self.assertIs(player.tree, tree)
+        self.assertIn(tree.root, tree.children(reply))
+        self.assertEqual(stats.moves[1][2], visits)
+        self.assertGreaterEqual(tree.visits[reply],
+                                visits + stats.moves[1][0])
+
+    def test_dead_worker_does_not_block_shared_tree(self):
+        with parallel_search.ParallelMCTSPlayer(
+                num_workers=1, shared_tree=True) as player:
+            game = self._new_game(player)
+            game.apply_move(self._get_move(player, game))
+            game.apply_move(game.get_legal_moves()[0])
+            worker = player._workers[0]
+            worker.terminate()
+            worker.join()
+            # Pretend the worker died in the middle of a search
+            player._idle[1] = 0
+            start = timeit.default_timer()
+            time_left = lambda: 60. - 1000 * (timeit.default_timer() - start)
+            self.assertIn(player.get_move(game, time_left),
+                          game.get_legal_moves())
+            self.assertGreater(time_left(), 0)
+
+
+class BitBoardTest(unittest.TestCase):
+    """Check `isolation.BitBoard` against the reference `isolation.Board`"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def test_random_games_match_board(self):
+        for width, height in [(7, 7), (5, 4), (3, 6)]:
+            for _ in range(20):
+                board = isolation.Board(self.player1, self.player2,
+                                        width=width, height=height)
+                bitboard = isolation.BitBoard(self.player1, self.player2,
+                                              width=width, height=height)
+                while True:
+                    moves = sorted(board.get_legal_moves())
+                    self.assertEqual(moves, sorted(bitboard.get_legal_moves()))
+                    self.assertEqual(board.to_string(), bitboard.to_string())
+                    for player in (self.player1, self.player2):
+                        self.assertEqual(board.get_player_location(player),
+                                         bitboard.get_player_location(player))
+                        self.assertEqual(board.utility(player),
+                                         bitboard.utility(player))
+                    if not moves:
+                        break
+                    move = random.choice(moves)
+                    board.apply_move(move)
+                    bitboard = bitboard.forecast_move(move)
+
+
 if __name__ == '__main__':
     unittest.main()
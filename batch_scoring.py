@@ -0,0 +1,142 @@
+#!coding=utf-8
+"""
+Vectorized evaluation of the children of a frontier node with NumPy.
+
+At the nodes one ply above the search horizon `AlphaBetaPlayer` evaluates
+every child position with its score function. With `batch_scoring=True`
+the children are instead stacked into one `ChildStates` array and scored by
+the batch version of the score function in a single call, which saves the
+per-child Python overhead of move generation.
+
+Batch versions exist for `sample_players.improved_score`,
+`sample_players.center_score` and `game_agent.custom_score_3` (also as a
+`functools.partial` with keyword parameters), and return the same scores.
+NumPy is only imported by this module, so it remains an optional dependency
+of the agents.
+"""
+from collections import namedtuple
+from functools import partial
+
+import numpy as np
+
+from game_agent import custom_score_3
+from isolation.tables import knight_tables
+from sample_players import center_score, improved_score
+
+# Stacked child positions of a node, from the point of view of the scoring
+# player. `open` has one row per child and one column per square plus an
+# always-blocked sentinel column; locations are square indices, or -1 for a
+# player that has not moved yet.
+ChildStates = namedtuple("ChildStates", [
+    "width", "height", "open", "own_loc", "opp_loc", "own_to_move"])
+
+_NEIGHBORS = {}
+
+
+def _neighbor_array(width, height):
+    """Return the (size + 1, 8) array of the knight neighbors of every square,
+    padded with the sentinel square `size`, which has no neighbors."""
+    key = (width, height)
+    neighbors = _NEIGHBORS.get(key)
+    if neighbors is None:
+        tables = knight_tables(width, height)
+        size = tables.size
+        neighbors = np.full((size + 1, 8), size, dtype=np.intp)
+        for idx, nbrs in enumerate(tables.neighbors):
+            neighbors[idx, :len(nbrs)] = nbrs
+        neighbors = _NEIGHBORS[key] = neighbors
+    return neighbors
+
+
+def stack_children(game, moves, player):
+    """Return the `ChildStates` of the positions after each of `moves` (legal
+    moves of the active player of `game`) for the scoring `player`.
+    """
+    width, height, _, blocked, p1_loc, p2_loc = game.encode()
+    size = width * height
+    nbytes = (size + 7) // 8
+    bits = np.unpackbits(
+        np.frombuffer(blocked.to_bytes(nbytes, "little"), dtype=np.uint8),
+        bitorder="little")
+    base = np.zeros(size + 1, dtype=bool)
+    base[:size] = bits[:size] == 0
+
+    move_idx = np.array([r + c * height for r, c in moves], dtype=np.intp)
+    rows = np.arange(len(moves))
+    open_ = np.tile(base, (len(moves), 1))
+    open_[rows, move_idx] = False
+
+    moving = player == game.active_player
+    if moving == (game.move_count % 2 == 0):
+        own, opp = p1_loc, p2_loc
+    else:
+        own, opp = p2_loc, p1_loc
+    own = np.full(len(moves), -1 if own is None else own, dtype=np.intp)
+    opp = np.full(len(moves), -1 if opp is None else opp, dtype=np.intp)
+    if moving:
+        own = move_idx
+    else:
+        opp = move_idx
+    return ChildStates(width, height, open_, own, opp, not moving)
+
+
+def _count_moves(states, locs):
+    """Return the number of legal moves of the players at `locs`."""
+    neighbors = _neighbor_array(states.width, states.height)
+    rows = np.arange(len(locs))[:, None]
+    counts = states.open[rows, neighbors[locs]].sum(axis=1)
+    # Players that have not moved can move to any open square
+    return np.where(locs < 0, states.open.sum(axis=1), counts)
+
+
+def _terminal(states, own_moves, opp_moves, scores):
+    """Set the scores of the children where the player to move is stuck to
+    -inf (the scoring player lost) or +inf (it won)."""
+    if states.own_to_move:
+        scores[own_moves == 0] = float("-inf")
+    else:
+        scores[opp_moves == 0] = float("inf")
+    return scores
+
+
+def improved_score_batch(states):
+    """Batch version of `sample_players.improved_score()`."""
+    own_moves = _count_moves(states, states.own_loc)
+    opp_moves = _count_moves(states, states.opp_loc)
+    return _terminal(states, own_moves, opp_moves,
+                     (own_moves - opp_moves).astype(float))
+
+
+def center_score_batch(states):
+    """Batch version of `sample_players.center_score()`."""
+    own_moves = _count_moves(states, states.own_loc)
+    opp_moves = _count_moves(states, states.opp_loc)
+    w, h = states.width / 2., states.height / 2.
+    y = states.own_loc % states.height
+    x = states.own_loc // states.height
+    return _terminal(states, own_moves, opp_moves, (h - y)**2 + (w - x)**2)
+
+
+def custom_score_3_batch(states, a=2, b=3):
+    """Batch version of `game_agent.custom_score_3()`."""
+    own_moves = _count_moves(states, states.own_loc)
+    opp_moves = _count_moves(states, states.opp_loc)
+    return _terminal(states, own_moves, opp_moves,
+                     (own_moves * a - opp_moves * b).astype(float))
+
+
+BATCH_SCORES = {
+    improved_score: improved_score_batch,
+    center_score: center_score_batch,
+    custom_score_3: custom_score_3_batch,
+}
+
+
+def batch_score_fn(score_fn):
+    """Return the batch version of `score_fn`, or None if there is none."""
+    if isinstance(score_fn, partial):
+        batch_fn = BATCH_SCORES.get(score_fn.func)
+        if batch_fn is None or score_fn.args:
+            return None
+        return partial(batch_fn, **score_fn.keywords)
+    return BATCH_SCORES.get(score_fn)
@@ -5,6 +5,33 @@ test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
 import random
+import timeit
+from collections import OrderedDict
+from math import copysign, frexp, isinf, ldexp
+
+try:
+    from math import nextafter
+except ImportError:  # Python < 3.9
+    def nextafter(x, y):
+        """Return the next float after `x` towards `y`. Near powers of two the
+        step may be two units in the last place, which still gives a window
+        that contains no representable score.
+        """
+        if x == y:
+            return y
+        if isinf(x):
+            return copysign(1.7976931348623157e308, x)
+        _, exponent = frexp(x)
+        step = max(ldexp(1., exponent - 53), 5e-324)
+        return x + step if y > x else x - step
+
+# XORed into the transposition table keys of positions searched by an agent
+# playing as player 2 (see `AlphaBetaPlayer._search_root()`)
+PLAYER_2_SALT = 0x9E3779B97F4A7C15
+
+
+def _time_millis():
+    return 1000 * timeit.default_timer()
 
 
 class SearchTimeout(Exception):
@@ -12,6 +39,122 @@ class SearchTimeout(Exception):
     pass
 
 
+class ScoreCache(object):
+    """A bounded cache of heuristic scores that drops the least recently used
+    entry when it is full.
+
+    Parameters
+    ----------
+    max_entries : int (optional)
+        The maximum number of cached scores.
+    """
+
+    def __init__(self, max_entries=2 ** 16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all scores from the cache."""
+        self._entries.clear()
+
+    def get(self, key):
+        """Return the score cached for `key`, or None if there is none."""
+        score = self._entries.get(key)
+        if score is not None:
+            self._entries.move_to_end(key)
+        return score
+
+    def put(self, key, score):
+        """Cache `score` for `key`."""
+        self._entries[key] = score
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# The scores of `custom_score()` and `custom_score_2()`, keyed by the board
+# size, the Zobrist key of the position (which is 0 for the empty board of any
+# size), whether the player is the active one, the function and its
+# parameters.
+_score_cache = ScoreCache()
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+def _iter_bits(mask):
+    """Yield the indices of the set bits of `mask`."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# The knight-move masks of the squares of each board size, {(width, height):
+# (masks, full mask)}. Square (row, column) is bit ``row + column * height``,
+# like in `isolation.tables`, which is not part of the project submission.
+_knight_masks = {}
+
+
+def _board_masks(width, height):
+    """Return the knight-move masks of a board size and the mask of all of
+    its squares."""
+    result = _knight_masks.get((width, height))
+    if result is None:
+        masks = []
+        for col in range(width):
+            for row in range(height):
+                mask = 0
+                for dr, dc in ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                               (1, -2), (1, 2), (2, -1), (2, 1)):
+                    r, c = row + dr, col + dc
+                    if 0 <= r < height and 0 <= c < width:
+                        mask |= 1 << (r + c * height)
+                masks.append(mask)
+        result = _knight_masks[(width, height)] = (
+            masks, (1 << width * height) - 1)
+    return result
+
+
+def _mobility_masks(game, player):
+    """Return the knight-move masks of the squares of `game`, the mask of its
+    open squares, the masks of the legal moves of `player` and of its
+    opponent, and whether `player` is the active player.
+
+    The position is read with `Board.encode()` if the board has it, and with
+    the public `Board` API otherwise.
+    """
+    opponent = game.get_opponent(player)  # Raises for players not in the game
+    height = game.height
+    masks, full_mask = _board_masks(game.width, height)
+    active = player == game.active_player
+    encode = getattr(game, "encode", None)
+    if encode is not None:
+        _, _, move_count, blocked, p1_loc, p2_loc = encode()
+        open_mask = full_mask & ~blocked
+        # Player 1 is the active player after an even number of moves
+        if active == (move_count % 2 == 0):
+            own_loc, opp_loc = p1_loc, p2_loc
+        else:
+            own_loc, opp_loc = p2_loc, p1_loc
+    else:
+        open_mask = 0
+        for row, col in game.get_blank_spaces():
+            open_mask |= 1 << (row + col * height)
+        own_loc = game.get_player_location(player)
+        opp_loc = game.get_player_location(opponent)
+        if own_loc is not None:
+            own_loc = own_loc[0] + own_loc[1] * height
+        if opp_loc is not None:
+            opp_loc = opp_loc[0] + opp_loc[1] * height
+    own = open_mask if own_loc is None else masks[own_loc] & open_mask
+    opp = open_mask if opp_loc is None else masks[opp_loc] & open_mask
+    return masks, open_mask, own, opp, active
+
+
 def custom_score(game, player, a=3, b=2, c=1, d=1):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -44,33 +187,46 @@ def custom_score(game, player, a=3, b=2, c=1, d=1):
         The heuristic value of the current game state to the specified player.
 
     """
-    opp = game.get_opponent(player)
-
-    own_moves = game.get_legal_moves(player)
-    opp_moves = game.get_legal_moves(opp)
-
-    num_own_moves = len(own_moves)
-    num_opp_moves = len(opp_moves)
-
-    if game.is_loser(player) or num_own_moves == 0:
-        return float('-inf')
-    if game.is_winner(player) or num_opp_moves == 0:
-        return float('inf')
-
-    own_controlled = []
-    for move in own_moves:
-        own_controlled.extend(game.forecast_move(move).get_legal_moves())
-    num_own_controlled = len(set(own_controlled))
-
-    opp_controlled = []
-    for move in opp_moves:
-        opp_controlled.extend(game.forecast_move(move).get_legal_moves(opp))
-    num_opp_controlled = len(set(opp_controlled))
+    key = (game.width, game.height, game.hash(),
+           player == game.active_player, 1, a, b, c, d)
+    score = _score_cache.get(key)
+    if score is not None:
+        return score
+
+    masks, open_mask, own, opp, active = _mobility_masks(game, player)
+    num_own_moves = _popcount(own)
+    num_opp_moves = _popcount(opp)
+
+    if num_own_moves == 0:
+        score = float('-inf')
+    elif num_opp_moves == 0:
+        score = float('inf')
+    else:
+        # The squares "controlled" after each move are the legal moves of
+        # the active player of `game.forecast_move(move)`, which is the
+        # player that did not make the move.
+        if active:
+            # Own moves leave the opponent's moves open except for the
+            # move itself, which only matters if there is a single move.
+            num_own_controlled = num_opp_moves
+            if num_own_moves == 1 and own & opp:
+                num_own_controlled -= 1
+            # `player` makes the opponent's moves in the forecasts
+            num_opp_controlled = num_opp_moves if num_opp_moves > 1 else 0
+        else:
+            num_own_controlled = num_own_moves if num_own_moves > 1 else 0
+            # The opponent makes its own moves: two-step reachability
+            reach = 0
+            for idx in _iter_bits(opp):
+                reach |= masks[idx]
+            num_opp_controlled = _popcount(reach & open_mask)
 
-    own_score = num_own_moves * a + num_own_controlled * c
-    opp_score = num_opp_moves * b + num_opp_controlled * d
+        own_score = num_own_moves * a + num_own_controlled * c
+        opp_score = num_opp_moves * b + num_opp_controlled * d
+        score = float(own_score - opp_score)
 
-    return float(own_score - opp_score)
+    _score_cache.put(key, score)
+    return score
 
 
 def custom_score_2(game, player, a=7, b=1, c=2):
@@ -99,27 +255,38 @@ def custom_score_2(game, player, a=7, b=1, c=2):
         The heuristic value of the current game state to the specified player.
 
     """
-    opp = game.get_opponent(player)
-
-    own_moves = game.get_legal_moves(player)
-    opp_moves = game.get_legal_moves(opp)
-
-    num_own_moves = len(own_moves)
-    num_opp_moves = len(opp_moves)
-
-    if game.is_loser(player) or num_own_moves == 0:
-        return float('-inf')
-    if game.is_winner(player) or num_opp_moves == 0:
-        return float('inf')
+    key = (game.width, game.height, game.hash(),
+           player == game.active_player, 2, a, b, c)
+    score = _score_cache.get(key)
+    if score is not None:
+        return score
+
+    masks, open_mask, own, opp, active = _mobility_masks(game, player)
+    num_own_moves = _popcount(own)
+    num_opp_moves = _popcount(opp)
+
+    if num_own_moves == 0:
+        score = float('-inf')
+    elif num_opp_moves == 0:
+        score = float('inf')
+    else:
+        # As in `custom_score()`, every forecast is followed by the legal
+        # moves of the player that did not make the move.
+        if active:
+            num_next_own = num_own_moves * num_opp_moves - _popcount(own & opp)
+            num_next_opp = num_opp_moves * (num_opp_moves - 1)
+        else:
+            num_next_own = num_own_moves * (num_own_moves - 1)
+            num_next_opp = 0
+            for idx in _iter_bits(opp):
+                num_next_opp += _popcount(masks[idx] & open_mask)
 
-    num_next_own = sum(
-        [len(game.forecast_move(m).get_legal_moves()) for m in own_moves])
-    num_next_opp = sum(
-        [len(game.forecast_move(m).get_legal_moves(opp)) for m in opp_moves])
+        player_score = num_next_own * b + num_own_moves * a
+        opp_score = num_next_opp * c
+        score = float(player_score - opp_score)
 
-    player_score = num_next_own * b + num_own_moves * a
-    opp_score = num_next_opp * c
-    return float(player_score - opp_score)
+    _score_cache.put(key, score)
+    return score
 
 
 def custom_score_3(game, player, a=2, b=3):
@@ -194,11 +361,81 @@ class IsolationPlayer:
         self.TIMER_THRESHOLD = timeout
 
 
-class MinimaxPlayer(IsolationPlayer):
+class _ClockedPlayer(IsolationPlayer):
+    """Base class of the search agents that read the clock only every few
+    nodes during `get_move()`.
+
+    The search calls `_check_clock()` whenever `_countdown` reaches zero.
+    Between `_start_clock()` and `_stop_clock()` the clock is then compared
+    to a deadline computed once from `time_left()`, and the number of nodes
+    between two reads is doubled or halved to keep the time between them
+    around a quarter of `TIMER_THRESHOLD`. Otherwise (e.g., when the search
+    methods are called directly) `time_left()` is checked at every node.
+    """
+
+    MAX_CHECK_INTERVAL = 4096
+
+    _deadline = None
+    _countdown = 1
+    _check_interval = 1
+    _last_check = 0.
+
+    def _start_clock(self):
+        """Compute the deadline of the search from `time_left()`."""
+        self._last_check = _time_millis()
+        self._deadline = (self._last_check + self.time_left() -
+                          self.TIMER_THRESHOLD)
+        self._countdown = self._check_interval
+
+    def _stop_clock(self):
+        self._deadline = None
+        self._countdown = 1
+
+    def _check_clock(self):
+        """Raise `SearchTimeout` if the time is up and reset the countdown
+        to the next clock read."""
+        if self._deadline is None:
+            self._countdown = 1
+            if self.time_left() < self.TIMER_THRESHOLD:
+                raise SearchTimeout()
+            return
+        now = _time_millis()
+        if now >= self._deadline:
+            raise SearchTimeout()
+        gap = now - self._last_check
+        target = self.TIMER_THRESHOLD / 4.
+        if gap > target and self._check_interval > 1:
+            self._check_interval //= 2
+        elif (gap < target / 2 and
+              self._check_interval < self.MAX_CHECK_INTERVAL):
+            self._check_interval *= 2
+        self._last_check = now
+        self._countdown = self._check_interval
+
+
+class MinimaxPlayer(_ClockedPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    root_workers : int (optional)
+        If given, the moves of the root position are searched in parallel by
+        a `parallel_search.RootSplitPool` with this many worker processes.
+        The pool is started once, here, and is available as `root_pool`.
     """
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 root_workers=None):
+        super(MinimaxPlayer, self).__init__(
+            search_depth=search_depth, score_fn=score_fn, timeout=timeout)
+        self.root_pool = None
+        if root_workers is not None:
+            from parallel_search import RootSplitPool
+            self.root_pool = RootSplitPool(
+                MinimaxPlayer,
+                dict(search_depth=search_depth, score_fn=score_fn, timeout=0.),
+                root_workers)
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -234,6 +471,7 @@ class MinimaxPlayer(IsolationPlayer):
         # in case the search fails due to timeout
         best_move = (-1, -1)
 
+        self._start_clock()
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
@@ -245,6 +483,8 @@ class MinimaxPlayer(IsolationPlayer):
             legal_moves = game.get_legal_moves(self)
             if len(legal_moves) > 0:
                 best_move = random.choice(legal_moves)
+        finally:
+            self._stop_clock()
 
         # Return the best move from the last completed search iteration
         return best_move
@@ -269,8 +509,9 @@ class MinimaxPlayer(IsolationPlayer):
             The maximum score.
 
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self._check_clock()
         if game.utility(self) != 0:
             return game.utility(self)
         elif depth == 0:
@@ -300,8 +541,9 @@ class MinimaxPlayer(IsolationPlayer):
             The minimum score.
 
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self._check_clock()
         if game.utility(self) != 0:
             return game.utility(self)
         elif depth == 0:
@@ -359,6 +601,13 @@ class MinimaxPlayer(IsolationPlayer):
         if len(legal_moves) == 0:
             return best_move
 
+        if self.root_pool is not None:
+            _, best_move = max(
+                (score, move) for move, score in self.root_pool.search(
+                    game, legal_moves, depth, None, self.time_left,
+                    self.TIMER_THRESHOLD))
+            return best_move
+
         _, best_move = max(
             [(self.min_value(game.forecast_move(move), depth - 1), move)
              for move in legal_moves])
@@ -366,11 +615,113 @@ class MinimaxPlayer(IsolationPlayer):
         return best_move
 
 
-class AlphaBetaPlayer(IsolationPlayer):
+class AlphaBetaPlayer(_ClockedPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    make_unmake : bool (optional)
+        If True, child nodes are searched by applying and undoing moves on the
+        board in place with `Board.apply_move()`/`Board.undo_move()` instead
+        of creating a new board for each of them with `Board.forecast_move()`.
+
+    tt : `transposition.TranspositionTable` (optional)
+        If given, search results are stored in and reused from this table,
+        within one iterative deepening search as well as across moves.
+
+    ordering : `move_ordering.MoveOrdering` (optional)
+        If given, the moves of each node are searched in the order given by
+        this object (principal variation, killer moves and history scores)
+        instead of the random order of `Board.get_legal_moves()`.
+
+    pvs : bool (optional)
+        If True, use principal variation search: all but the first move of a
+        node are searched with a null window first, and only re-searched
+        with the full window if they turn out to be better.
+
+    aspiration_window : float (optional)
+        If given, each iteration of iterative deepening after the first one
+        starts with the window (score - aspiration_window, score +
+        aspiration_window) around the score of the previous iteration.
+
+    endgame_solver : `isolation.endgame.EndgameSolver` (optional)
+        If given, positions where the regions reachable by the two players
+        are disjoint are not searched any further but solved exactly, which
+        gives a proven win or loss score. The solver reads the clock through
+        `_check_clock()`, so a long solve times out like the search. An
+        `isolation.tablebase.Tablebase` can be used the same way to look up
+        the positions of small boards.
+
+    batch_scoring : bool (optional)
+        If True, the children of the nodes one ply above the search horizon
+        are evaluated all at once by the NumPy version of `score_fn` from
+        `batch_scoring` (which requires NumPy and a score function with a
+        batch version).
+
+    root_workers : int (optional)
+        If given, the first move of the root position is searched in this
+        process and the others in parallel by a
+        `parallel_search.RootSplitPool` with this many worker processes, with
+        the score of the first move as alpha. The pool is started once, here,
+        and is available as `root_pool`.
+
+    stats : `search_stats.SearchStats` (optional)
+        If given, the depth, node counts and timing of the search of every
+        move are recorded in this collector. The nodes searched by the
+        workers of `root_pool` are not counted.
+
+    time_manager : `time_manager.TimeManager` (optional)
+        If given, it decides whether each next iteration of iterative
+        deepening is started. The best move of the previous iteration is
+        then searched first, and when an iteration times out its best move
+        is kept if it scored above the lower bound of the window.
+
+    opening_book : `opening_book.OpeningBook` (optional)
+        If given, `get_move()` returns the book move without searching when
+        the position is in the book.
     """
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 make_unmake=False, tt=None, ordering=None, pvs=False,
+                 aspiration_window=None, endgame_solver=None,
+                 batch_scoring=False, root_workers=None, stats=None,
+                 time_manager=None, opening_book=None):
+        super(AlphaBetaPlayer, self).__init__(
+            search_depth=search_depth, score_fn=score_fn, timeout=timeout)
+        self.make_unmake = make_unmake
+        self.tt = tt
+        self.ordering = ordering
+        self.pvs = pvs
+        self.aspiration_window = aspiration_window
+        self.endgame_solver = endgame_solver
+        self.stats = stats
+        self._move_stats = None
+        self.time_manager = time_manager
+        self.opening_book = opening_book
+        # The best move of the previous iteration and the best root move of
+        # the current one, used with the time manager
+        self._root_move = None
+        self._root_best = None
+        self._tt_salt = 0
+        self._batch_score = None
+        if batch_scoring:
+            from batch_scoring import batch_score_fn, stack_children
+            self._stack_children = stack_children
+            self._batch_score = batch_score_fn(score_fn)
+            if self._batch_score is None:
+                raise ValueError(
+                    "No batch version of the score function {}".format(score_fn))
+        self.root_pool = None
+        if root_workers is not None:
+            from parallel_search import RootSplitPool
+            self.root_pool = RootSplitPool(
+                AlphaBetaPlayer,
+                dict(search_depth=search_depth, score_fn=score_fn, timeout=0.,
+                     make_unmake=make_unmake, tt=tt, ordering=ordering,
+                     pvs=pvs, endgame_solver=endgame_solver,
+                     batch_scoring=batch_scoring),
+                root_workers)
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -404,22 +755,82 @@ class AlphaBetaPlayer(IsolationPlayer):
 
         """
         self.time_left = time_left
+        if self.opening_book is not None:
+            move = self.opening_book.lookup(game)
+            if move is not None:
+                return move
+        self._start_clock()
+        try:
+            _, _, move = self._iterative_deepening(game)
+        finally:
+            self._stop_clock()
+        return move
+
+    def _iterative_deepening(self, game):
+        """Search `game` with increasing depth until the search times out.
 
+        Returns
+        -------
+        depth : int
+            The depth of the deepest completed iteration (0 if none).
+        score : float or None
+            The score of the deepest completed iteration (or of the best
+            move of the partial iteration kept with the time manager).
+        move : (int, int)
+            The best move of the deepest completed iteration (or of the
+            partial iteration).
+        """
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         move = (-1, -1)
+        score = None
         depth = 0
-
+        if self.ordering is not None:
+            self.ordering.new_search()
+        move_stats = None
+        if self.stats is not None:
+            move_stats = self._move_stats = self.stats.start_move()
+            start = self.time_left()
+            if self.tt is not None:
+                tt_probes, tt_hits = self.tt.probes, self.tt.hits
+
+        time_manager = self.time_manager
+        if time_manager is not None:
+            time_manager.new_search(self.time_left() - self.TIMER_THRESHOLD)
+
+        # Every move blocks a square, so no game lasts longer than this
+        max_depth = len(game.get_blank_spaces())
         try:
-            while self.time_left() > self.TIMER_THRESHOLD:
+            while (self.time_left() > self.TIMER_THRESHOLD and
+                   depth < max_depth):
+                self._root_best = None
+                score, move = self._aspiration_search(game, depth + 1, score)
                 depth += 1
-                move = self.alphabeta(game, depth)
+                if move_stats is not None:
+                    move_stats.complete_iteration(start - self.time_left())
+                if isinf(score):
+                    # The game is solved, deeper searches can't change it
+                    break
+                if time_manager is not None:
+                    self._root_move = move
+                    if not time_manager.next_iteration(
+                            move, score,
+                            self.time_left() - self.TIMER_THRESHOLD):
+                        break
         except SearchTimeout:
-            pass
-        finally:
-            return move
-
-    def min_value(self, game, depth, alpha, beta):
+            if time_manager is not None and self._root_best is not None:
+                score, move = self._root_best
+        self._root_move = self._root_best = None
+
+        if move_stats is not None:
+            move_stats.time_left = self.time_left()
+            if self.tt is not None:
+                move_stats.tt_probes = self.tt.probes - tt_probes
+                move_stats.tt_hits = self.tt.hits - tt_hits
+            self._move_stats = None
+        return depth, score, move
+
+    def min_value(self, game, depth, alpha, beta, ply=0):
         """
         Minimize the opponent.
 
@@ -439,6 +850,9 @@ class AlphaBetaPlayer(IsolationPlayer):
         beta : float
             Beta limits the upper bound of search on maximizing layers
 
+        ply : int (optional)
+            The distance of this node from the root of the search
+
         Returns
         -------
         score : float
@@ -447,30 +861,79 @@ class AlphaBetaPlayer(IsolationPlayer):
             The move corresponding to the `score`.
 
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self._check_clock()
+        move_stats = self._move_stats
+        if move_stats is not None:
+            move_stats.nodes += 1
+        if self.ordering is not None:
+            self.ordering.enter(ply)
 
         utility = game.utility(self)
         if utility != 0:
             return utility, (-1, -1)
+        solved = None
+        if self.endgame_solver is not None:
+            solved = self.endgame_solver.solve(game, self,
+                                               self._check_clock)
+        if solved is not None:
+            return solved
         elif depth == 0:
+            if move_stats is not None:
+                move_stats.leaves += 1
             return self.score(game, self), (-1, -1)
         else:
-            legal_moves = game.get_legal_moves()
+            key = entry = None
+            if self.tt is not None:
+                key = game.hash() ^ self._tt_salt
+                entry = self.tt.probe(key)
+                if entry is not None and self.tt.usable(entry, depth, alpha, beta):
+                    if self.ordering is not None:
+                        self.ordering.hash_hit(ply, entry.move)
+                    return entry.score, entry.move
+                alpha_orig, beta_orig = alpha, beta
+
+            legal_moves = self._ordered_moves(game, ply, entry)
+            child_scores = self._score_children(game, depth, legal_moves)
             best_score = float('inf')
             best_move = legal_moves[0]
-            for move in legal_moves:
-                score, _ = self.max_value(
-                    game.forecast_move(move), depth - 1, alpha, beta)
+            for i, move in enumerate(legal_moves):
+                if child_scores is not None:
+                    score = child_scores[i]
+                elif self.pvs and i > 0:
+                    # Null window probe: is the move better than the best one
+                    # so far, i.e. does it score below beta?
+                    score, _ = self._search_child(
+                        game, move, self.max_value, depth - 1,
+                        nextafter(beta, float("-inf")), beta, ply + 1)
+                    if alpha < score < beta:
+                        score, _ = self._search_child(
+                            game, move, self.max_value, depth - 1,
+                            alpha, beta, ply + 1)
+                else:
+                    score, _ = self._search_child(
+                        game, move, self.max_value, depth - 1,
+                        alpha, beta, ply + 1)
                 best_score = min(score, best_score)
                 if best_score < beta:
                     beta = best_score
                     best_move = move
+                    if self.ordering is not None:
+                        self.ordering.update_pv(ply, move)
                 if beta <= alpha:
+                    if self.ordering is not None:
+                        self.ordering.cutoff(move, ply, depth)
+                    if move_stats is not None:
+                        move_stats.cutoffs += 1
                     break
+            if key is not None:
+                self.tt.store(key, depth, best_score,
+                              self.tt.bound(best_score, alpha_orig, beta_orig),
+                              best_move)
             return best_score, best_move
 
-    def max_value(self, game, depth, alpha, beta):
+    def max_value(self, game, depth, alpha, beta, ply=0):
         """
         Maximize the player.
 
@@ -486,6 +949,8 @@ class AlphaBetaPlayer(IsolationPlayer):
             Alpha limits the lower bound of search on minimizing layers
         beta : float
             Beta limits the upper bound of search on maximizing layers
+        ply : int (optional)
+            The distance of this node from the root of the search
 
         Returns
         -------
@@ -495,29 +960,123 @@ class AlphaBetaPlayer(IsolationPlayer):
             The move corresponding to the `score`.
 
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self._check_clock()
+        move_stats = self._move_stats
+        if move_stats is not None:
+            move_stats.nodes += 1
+        if self.ordering is not None:
+            self.ordering.enter(ply)
 
         utility = game.utility(self)
         if utility != 0:
             return utility, (-1, -1)
+        solved = None
+        if self.endgame_solver is not None:
+            solved = self.endgame_solver.solve(game, self,
+                                               self._check_clock)
+        if solved is not None:
+            return solved
         elif depth == 0:
+            if move_stats is not None:
+                move_stats.leaves += 1
             return self.score(game, self), (-1, -1)
         else:
-            legal_moves = game.get_legal_moves()
+            key = entry = None
+            if self.tt is not None:
+                key = game.hash() ^ self._tt_salt
+                entry = self.tt.probe(key)
+                if entry is not None and self.tt.usable(entry, depth, alpha, beta):
+                    if self.ordering is not None:
+                        self.ordering.hash_hit(ply, entry.move)
+                    return entry.score, entry.move
+                alpha_orig, beta_orig = alpha, beta
+
+            legal_moves = self._ordered_moves(game, ply, entry)
+            child_scores = self._score_children(game, depth, legal_moves)
             best_score = float('-inf')
             best_move = legal_moves[0]
-            for move in legal_moves:
-                score, _ = self.min_value(
-                    game.forecast_move(move), depth - 1, alpha, beta)
+            for i, move in enumerate(legal_moves):
+                if child_scores is not None:
+                    score = child_scores[i]
+                elif self.pvs and i > 0:
+                    # Null window probe: is the move better than the best one
+                    # so far, i.e. does it score above alpha?
+                    score, _ = self._search_child(
+                        game, move, self.min_value, depth - 1,
+                        alpha, nextafter(alpha, float("inf")), ply + 1)
+                    if alpha < score < beta:
+                        score, _ = self._search_child(
+                            game, move, self.min_value, depth - 1,
+                            alpha, beta, ply + 1)
+                else:
+                    score, _ = self._search_child(
+                        game, move, self.min_value, depth - 1,
+                        alpha, beta, ply + 1)
                 best_score = max(score, best_score)
                 if best_score > alpha:
                     alpha = best_score
                     best_move = move
+                    if ply == 0:
+                        self._root_best = best_score, best_move
+                    if self.ordering is not None:
+                        self.ordering.update_pv(ply, move)
                 if alpha >= beta:
+                    if self.ordering is not None:
+                        self.ordering.cutoff(move, ply, depth)
+                    if move_stats is not None:
+                        move_stats.cutoffs += 1
                     break
+            if key is not None:
+                self.tt.store(key, depth, best_score,
+                              self.tt.bound(best_score, alpha_orig, beta_orig),
+                              best_move)
             return best_score, best_move
 
+    def _ordered_moves(self, game, ply, entry):
+        """Return the legal moves of the active player of `game`, sorted by
+        the move ordering if one is used. `entry` is the transposition table
+        entry of the position, if any.
+        """
+        if self.ordering is None:
+            legal_moves = game.get_legal_moves()
+            if ply == 0 and self._root_move in legal_moves:
+                legal_moves.remove(self._root_move)
+                legal_moves.insert(0, self._root_move)
+            return legal_moves
+        hash_move = entry.move if entry is not None else None
+        return self.ordering.order(
+            game, game.get_legal_moves(shuffle=False), ply, hash_move)
+
+    def _score_children(self, game, depth, legal_moves):
+        """Return the scores of the children of `game` reached with
+        `legal_moves` if they are leaves evaluated by the batch score
+        function, or None if the children have to be searched one by one.
+        """
+        if self._batch_score is None or depth != 1:
+            return None
+        if self._move_stats is not None:
+            self._move_stats.nodes += len(legal_moves)
+            self._move_stats.leaves += len(legal_moves)
+        return self._batch_score(
+            self._stack_children(game, legal_moves, self)).tolist()
+
+    def _search_child(self, game, move, search_fn, *args):
+        """Apply `move` to `game` and return `search_fn(child, *args)`.
+
+        In make/unmake mode the move is applied to `game` itself and taken
+        back afterwards (also when the search times out), so no board copy is
+        created for the child node.
+        """
+        if not self.make_unmake:
+            return search_fn(game.forecast_move(move), *args)
+        undo = game.apply_move(move)
+        try:
+            return search_fn(game, *args)
+        finally:
+            game.undo_move(undo)
+
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
@@ -563,6 +1122,13 @@ class AlphaBetaPlayer(IsolationPlayer):
                 each helper function or else your agent will timeout during
                 testing.
         """
+        _, move = self._search_root(game, depth, alpha, beta)
+        return move
+
+    def _search_root(self, game, depth, alpha=float("-inf"), beta=float("inf")):
+        """Search the root position `game` to `depth` with the window
+        (`alpha`, `beta`) and return the fail-soft score and the best move.
+        """
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
@@ -572,5 +1138,72 @@ class AlphaBetaPlayer(IsolationPlayer):
         if not legal_moves:
             return float('-inf'), move
 
-        _, move = self.max_value(game, depth, alpha, beta)
-        return move
+        # The scores in the table are from the point of view of this agent,
+        # so keep the entries of games played as player 2 apart.
+        self._tt_salt = PLAYER_2_SALT if game.move_count % 2 else 0
+
+        if self.root_pool is not None and depth > 1 and len(legal_moves) > 1:
+            score, move = self._split_root(game, depth, alpha, beta)
+        else:
+            score, move = self.max_value(game, depth, alpha, beta)
+        if self.ordering is not None:
+            self.ordering.end_iteration(game)
+        return score, move
+
+    def _split_root(self, game, depth, alpha, beta):
+        """Search the root position `game` like `max_value()`, but with all
+        moves after the first one searched by the workers of `root_pool`.
+        """
+        if self.ordering is not None:
+            self.ordering.enter(0)
+        entry = None
+        if self.tt is not None:
+            entry = self.tt.probe(game.hash() ^ self._tt_salt)
+        legal_moves = self._ordered_moves(game, 0, entry)
+
+        best_move = legal_moves[0]
+        best_score, _ = self._search_child(
+            game, best_move, self.min_value, depth - 1, alpha, beta, 1)
+        if self.ordering is not None:
+            self.ordering.update_pv(0, best_move)
+        if best_score > alpha:
+            self._root_best = best_score, best_move
+        if best_score >= beta:
+            return best_score, best_move
+
+        window = (max(alpha, best_score), beta)
+        for move, score in self.root_pool.search(
+                game, legal_moves[1:], depth, window, self.time_left,
+                self.TIMER_THRESHOLD):
+            if score > best_score:
+                best_score, best_move = score, move
+                if best_score > alpha:
+                    self._root_best = best_score, best_move
+                if self.ordering is not None:
+                    # The continuation of a move searched by a worker is
+                    # not known here
+                    self.ordering.hash_hit(0, move)
+        return best_score, best_move
+
+    def _aspiration_search(self, game, depth, guess):
+        """Search the root position `game` to `depth` with an aspiration
+        window around `guess`, the score of the previous iteration, and
+        return the score and the best move.
+
+        If the score falls outside of the window, the search is repeated with
+        the window opened to infinity on that side.
+        """
+        if (self.aspiration_window is None or guess is None or
+                isinf(guess)):
+            return self._search_root(game, depth)
+
+        alpha = guess - self.aspiration_window
+        beta = guess + self.aspiration_window
+        while True:
+            score, move = self._search_root(game, depth, alpha, beta)
+            if score <= alpha and alpha != float("-inf"):
+                alpha = float("-inf")
+            elif score >= beta and beta != float("inf"):
+                beta = float("inf")
+            else:
+                return score, move
@@ -4,10 +4,14 @@ Search best parameters for the custom score functions.
 """
 from __future__ import print_function, absolute_import
 
+import atexit
+import multiprocessing as mp
 import numpy as np
+import random
+from math import ceil, erf, log, pi, sqrt
 from os.path import isfile
 from itertools import product
-from joblib import Parallel, delayed
+from results_store import ResultsStore
 from tournament import Agent, play_round
 from sample_players import RandomPlayer
 from sample_players import open_move_score, center_score, improved_score
@@ -83,6 +87,14 @@ def _eval_with_params(cpu_agents, num_matches, score_fn, **kwargs):
     """
     fn = partial(score_fn, **kwargs)
     test_agent = Agent(AlphaBetaPlayer(score_fn=fn), "Eval")
+    return _play_cpu_agents(cpu_agents, test_agent, num_matches)
+
+
+def _play_cpu_agents(cpu_agents, test_agent, num_matches):
+    """
+    Return the number of wins of the test agent in `num_matches` fair
+    matches against each of the cpu agents.
+    """
     total_wins = 0
     for cpu_agent in cpu_agents:
         wins = {test_agent.player: 0,
@@ -92,7 +104,415 @@ def _eval_with_params(cpu_agents, num_matches, score_fn, **kwargs):
     return total_wins
 
 
-def grid_search_custom_fn3_ab(n_jobs=-1, num_matches=20, grid_file=None):
+# The tunable parameters and the default grid of each score function
+SCORE_FNS = {
+    "fn1": (custom_score, ("a", "b", "c", "d"),
+            (range(1, 10), range(1, 10), range(1, 5), range(1, 5))),
+    "fn2": (custom_score_2, ("a", "b", "c"),
+            (range(1, 10), range(1, 10), range(1, 5))),
+    "fn3": (custom_score_3, ("a", "b"),
+            (range(1, 10), range(1, 10))),
+}
+
+
+# The state of an `EvaluationPool` worker process, set by
+# `_init_eval_worker()`
+_eval_state = None
+
+
+def _init_eval_worker(score_fn, names, cpu_agents):
+    global _eval_state
+    # Forked workers inherit the random state of the parent process
+    random.seed()
+    test_agent = Agent(AlphaBetaPlayer(score_fn=score_fn), "Eval")
+    _eval_state = (score_fn, names, cpu_agents, test_agent)
+
+
+def _eval_point(task):
+    point, num_matches = task
+    score_fn, names, cpu_agents, test_agent = _eval_state
+    test_agent.player.score = partial(score_fn, **dict(zip(names, point)))
+    return _play_cpu_agents(cpu_agents, test_agent, num_matches)
+
+
+class EvaluationPool(object):
+    """
+    Persistent worker processes that evaluate parameter points of a score
+    function against a fixed set of opponents.
+
+    The opponents and the test agent are created once per worker, when the
+    pool starts, so each task only sends a parameter tuple and the number of
+    matches and receives the number of wins.
+
+    Parameters
+    ----------
+    score_fn : Callable
+        The score function.
+    names : tuple
+        The names of the parameters of `score_fn`.
+    cpu_agents : List[Agent]
+        The opponents.
+    num_workers : int
+        The number of worker processes.
+
+    """
+
+    def __init__(self, score_fn, names, cpu_agents, num_workers):
+        self.num_workers = num_workers
+        self._pool = mp.Pool(num_workers, initializer=_init_eval_worker,
+                             initargs=(score_fn, tuple(names), cpu_agents))
+
+    def imap(self, points, num_matches):
+        """
+        Evaluate the points and yield their numbers of wins in order, as
+        soon as they are available. The points are sent to the workers in
+        chunks.
+        """
+        tasks = [(tuple(point), num_matches) for point in points]
+        chunksize = max(1, len(tasks) // (4 * self.num_workers))
+        return self._pool.imap(_eval_point, tasks, chunksize)
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+# The evaluation pools started by `_evaluate_points()`, reused by all the
+# evaluations of the same score function against the same opponents.
+_pools = {}
+
+
+def _close_pools():
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
+
+
+atexit.register(_close_pools)
+
+
+def _num_workers(n_jobs):
+    """Return the number of processes meant by `n_jobs` (as in joblib)."""
+    if n_jobs < 0:
+        return max(1, mp.cpu_count() + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+def _evaluate_points(score_fn, names, points, cpu_agents, num_matches,
+                     n_jobs=-1, store=None, stage=""):
+    """
+    Evaluate the parameter points in parallel.
+
+    With more than one job, the points are evaluated by an `EvaluationPool`
+    that is started on the first call and reused by the following calls with
+    the same score function and opponents.
+
+    Parameters
+    ----------
+    store : ResultsStore
+        If given, points already evaluated in the store are not evaluated
+        again, and the other points are added to it as soon as they are
+        evaluated, so that an interrupted search can be resumed.
+    stage : str
+        The stage label of the evaluations in the store.
+
+    Returns
+    -------
+    total_wins : List[int]
+        The total number of wins of each point.
+
+    """
+    opponents = [agent.name for agent in cpu_agents]
+    total_wins = [None] * len(points)
+    if store is not None:
+        for i, point in enumerate(points):
+            total_wins[i] = store.get(score_fn.__name__,
+                                      dict(zip(names, point)), opponents,
+                                      num_matches, stage)
+    todo = [i for i, wins in enumerate(total_wins) if wins is None]
+
+    num_workers = _num_workers(n_jobs)
+    if num_workers == 1:
+        results = (_eval_with_params(cpu_agents, num_matches, score_fn,
+                                     **dict(zip(names, points[i])))
+                   for i in todo)
+    else:
+        key = (score_fn, tuple(names), tuple(opponents), num_workers)
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = EvaluationPool(score_fn, names, cpu_agents,
+                                                num_workers)
+        results = pool.imap([points[i] for i in todo], num_matches)
+
+    for done, (i, wins) in enumerate(zip(todo, results)):
+        total_wins[i] = wins
+        print("[{}/{}] {}, win: {}".format(
+            done + 1, len(todo), ", ".join(
+                "{} = {:g}".format(n, v) for n, v in zip(names, points[i])),
+            wins), flush=True)
+        if store is not None:
+            store.add(score_fn.__name__, dict(zip(names, points[i])),
+                      opponents, num_matches, wins, stage)
+    return total_wins
+
+
+def _win_rate(result):
+    _, wins, games = result
+    return wins / float(games), games
+
+
+def successive_halving(score_fn, names, points, n_jobs=-1, min_matches=1,
+                       max_matches=20, eta=3, cpu_agents=None, store=None,
+                       stage="halving"):
+    """
+    Successive halving search of the best parameters for a score function.
+
+    All points play `min_matches` matches against each opponent, then only
+    the best `1 / eta` of them play `eta` times as many matches in total,
+    and so on until one point is left or the points have played
+    `max_matches` matches.
+
+    Parameters
+    ----------
+    score_fn : Callable
+        The score function to tune.
+    names : tuple
+        The names of the parameters of `score_fn`.
+    points : List[tuple]
+        The parameter points to search.
+    n_jobs : int
+        The maximum number of concurrently running jobs.
+    min_matches : int
+        The number of matches against each opponent of the first round.
+    max_matches : int
+        The maximum number of matches against each opponent of a point.
+    eta : int
+        The inverse of the fraction of points kept after each round.
+    cpu_agents : List[Agent]
+        The opponents. Defaults to `get_cpu_agents()`.
+    store : ResultsStore
+        The results store of the evaluations (see `_evaluate_points()`).
+    stage : str
+        The prefix of the stage labels of the rounds in the store.
+
+    Returns
+    -------
+    results : List[tuple]
+        The (point, wins, games) tuples of the points of the last round,
+        best first.
+
+    """
+    cpu_agents = cpu_agents or get_cpu_agents()
+    points = [tuple(point) for point in points]
+    wins = dict.fromkeys(points, 0)
+    games = dict.fromkeys(points, 0)
+    candidates = list(points)
+    played = 0
+    num_matches = min(min_matches, max_matches)
+    while True:
+        total_wins = _evaluate_points(
+            score_fn, names, candidates, cpu_agents, num_matches - played,
+            n_jobs, store, "{}:{}".format(stage, played))
+        for point, point_wins in zip(candidates, total_wins):
+            wins[point] += point_wins
+            games[point] += 2 * (num_matches - played) * len(cpu_agents)
+        played = num_matches
+        candidates.sort(key=lambda p: wins[p] / float(games[p]), reverse=True)
+        if len(candidates) == 1 or num_matches >= max_matches:
+            break
+        candidates = candidates[:max(1, len(candidates) // eta)]
+        num_matches = min(max_matches, num_matches * eta)
+    return [(point, wins[point], games[point]) for point in candidates]
+
+
+def hyperband(score_fn, names, points, n_jobs=-1, max_matches=27, eta=3,
+              cpu_agents=None, store=None, seed=None):
+    """
+    Hyperband search of the best parameters for a score function.
+
+    Runs `successive_halving` brackets on random samples of `points`, from
+    many points with few matches each to few points with `max_matches`
+    matches each, so that no single trade-off between the number of points
+    and the number of matches has to be chosen up front.
+
+    The samples are drawn with the random `seed`, which defaults to the seed
+    of the search in `store` (see `ResultsStore.seed()`), so that a resumed
+    search samples the points it has already evaluated.
+
+    Returns
+    -------
+    results : List[tuple]
+        The (point, wins, games) tuples of the finalists of all brackets,
+        best first.
+
+    """
+    cpu_agents = cpu_agents or get_cpu_agents()
+    if seed is None and store is not None:
+        seed = store.seed("hyperband:{}".format(score_fn.__name__))
+    rng = random.Random(seed)
+    points = [tuple(point) for point in points]
+    s_max = int(log(max_matches) / log(eta) + 1e-9)
+    results = []
+    for s in range(s_max, -1, -1):
+        num_points = int(ceil((s_max + 1) / (s + 1.) * eta ** s))
+        min_matches = max(1, int(round(max_matches * eta ** -s)))
+        sample = rng.sample(points, min(num_points, len(points)))
+        results.extend(successive_halving(
+            score_fn, names, sample, n_jobs=n_jobs, min_matches=min_matches,
+            max_matches=max_matches, eta=eta, cpu_agents=cpu_agents,
+            store=store, stage="hyperband{}".format(s)))
+    results.sort(key=_win_rate, reverse=True)
+    return results
+
+
+def _gaussian_process(x_train, y_train, x, length_scale=0.2, noise=0.05):
+    """
+    Return the posterior mean and standard deviation at `x` of a Gaussian
+    process with an RBF kernel fitted to the (normalized) training data.
+    """
+    def kernel(u, v):
+        d2 = ((u[:, None, :] - v[None, :, :]) ** 2).sum(axis=-1)
+        return np.exp(-0.5 * d2 / length_scale ** 2)
+
+    k_train = kernel(x_train, x_train) + noise ** 2 * np.eye(len(x_train))
+    k_cross = kernel(x_train, x)
+    weights = np.linalg.solve(k_train, k_cross)
+    mean = weights.T.dot(y_train)
+    var = np.clip(1. - (k_cross * weights).sum(axis=0), 1e-12, None)
+    return mean, np.sqrt(var)
+
+
+def _expected_improvement(mean, std, best):
+    z = (mean - best) / std
+    cdf = 0.5 * (1. + np.array([erf(v / sqrt(2.)) for v in z]))
+    pdf = np.exp(-0.5 * z ** 2) / sqrt(2. * pi)
+    return (mean - best) * cdf + std * pdf
+
+
+def bayesian_search(score_fn, names, bounds, n_jobs=-1, num_matches=10,
+                    n_calls=50, n_initial=10, batch_size=4, cpu_agents=None,
+                    store=None, seed=None):
+    """
+    Bayesian optimization of the parameters of a score function over
+    continuous ranges.
+
+    The win rates of the evaluated points are modeled with a Gaussian
+    process, and each round evaluates the `batch_size` random candidate
+    points with the highest expected improvement.
+
+    Parameters
+    ----------
+    bounds : List[tuple]
+        The (low, high) range of each parameter.
+    num_matches : int
+        The number of matches against each opponent of every point.
+    n_calls : int
+        The total number of points to evaluate.
+    n_initial : int
+        The number of random points evaluated before the model is used.
+    batch_size : int
+        The number of points evaluated in parallel in each round.
+    seed : int
+        The seed of the random points, which defaults to the seed of the
+        search in `store` (see `hyperband()`).
+
+    Returns
+    -------
+    results : List[tuple]
+        The (point, wins, games) tuples of all evaluated points, best first.
+
+    """
+    cpu_agents = cpu_agents or get_cpu_agents()
+    if seed is None and store is not None:
+        seed = store.seed("bayes:{}".format(score_fn.__name__))
+    rng = np.random.RandomState(seed)
+    low = np.array([b[0] for b in bounds], dtype=float)
+    high = np.array([b[1] for b in bounds], dtype=float)
+    games = 2 * num_matches * len(cpu_agents)
+    x_seen, y_seen = [], []
+    while len(x_seen) < n_calls:
+        if len(x_seen) < n_initial:
+            count = min(n_initial, n_calls) - len(x_seen)
+            batch = rng.rand(count, len(bounds))
+        else:
+            x_train = np.array(x_seen)
+            y_train = np.array(y_seen)
+            y_mean, y_std = y_train.mean(), y_train.std() or 1.
+            candidates = rng.rand(2000, len(bounds))
+            mean, std = _gaussian_process(
+                x_train, (y_train - y_mean) / y_std, candidates)
+            improvement = _expected_improvement(
+                mean, std, (y_train.max() - y_mean) / y_std)
+            count = min(batch_size, n_calls - len(x_seen))
+            batch = candidates[np.argsort(-improvement)[:count]]
+        points = [tuple(float(v) for v in low + x * (high - low))
+                  for x in batch]
+        total_wins = _evaluate_points(score_fn, names, points, cpu_agents,
+                                      num_matches, n_jobs, store)
+        x_seen.extend(batch)
+        y_seen.extend(w / float(games) for w in total_wins)
+    results = [(tuple(float(v) for v in low + x * (high - low)),
+                int(round(y * games)), games)
+               for x, y in zip(x_seen, y_seen)]
+    results.sort(key=_win_rate, reverse=True)
+    return results
+
+
+def adaptive_search(fn_key, search, n_jobs=-1, num_matches=20, grid_file=None,
+                    eta=3, min_matches=1, n_calls=50, results_file=None):
+    """
+    Search the best parameters of a score function with successive halving,
+    Hyperband or Bayesian optimization instead of the full grid.
+
+    Parameters
+    ----------
+    fn_key : str
+        "fn1", "fn2" or "fn3".
+    search : str
+        "halving", "hyperband" or "bayes".
+    num_matches : int
+        The maximum number of matches against each opponent of a point (the
+        number of matches of every point for "bayes").
+    results_file : str
+        If given, evaluations are stored in and reused from this
+        `ResultsStore` file.
+
+    """
+    score_fn, names, ranges = SCORE_FNS[fn_key]
+    store = ResultsStore(results_file) if results_file else None
+    if grid_file and isfile(grid_file):
+        points = [tuple(point) for point in load_grids(grid_file).tolist()]
+    else:
+        points = list(product(*ranges))
+    if search == "halving":
+        results = successive_halving(score_fn, names, points, n_jobs=n_jobs,
+                                     min_matches=min_matches,
+                                     max_matches=num_matches, eta=eta,
+                                     store=store)
+    elif search == "hyperband":
+        results = hyperband(score_fn, names, points, n_jobs=n_jobs,
+                            max_matches=num_matches, eta=eta, store=store)
+    else:
+        bounds = [(min(r), max(r)) for r in ranges]
+        results = bayesian_search(score_fn, names, bounds, n_jobs=n_jobs,
+                                  num_matches=num_matches, n_calls=n_calls,
+                                  store=store)
+    for point, wins, games in results[:10]:
+        print("{}, win: {} / {}".format(
+            ", ".join("{} = {:g}".format(n, v) for n, v in zip(names, point)),
+            wins, games))
+    print("-----------------------------------------------")
+    print("The best result: {}".format(", ".join(
+        "{} = {:g}".format(n, v) for n, v in zip(names, results[0][0]))))
+    print("-----------------------------------------------")
+    return results
+
+
+def grid_search_custom_fn3_ab(n_jobs=-1, num_matches=20, grid_file=None,
+                              results_file=None):
     """
     Grid search of the best a,b for `custom_score_3`.
 
@@ -111,6 +531,10 @@ def grid_search_custom_fn3_ab(n_jobs=-1, num_matches=20, grid_file=None):
         The npz file which contains the grids to search. If given, only grid
         points in this file will be tested.
 
+    results_file : str
+        If given, evaluations are stored in and reused from this
+        `ResultsStore` file.
+
     """
     cpu_agents = get_cpu_agents()
     if grid_file and isfile(grid_file):
@@ -118,12 +542,9 @@ def grid_search_custom_fn3_ab(n_jobs=-1, num_matches=20, grid_file=None):
     else:
         ab = list(product(range(1, 10), range(1, 10)))
     total_matches = num_matches * len(cpu_agents) * 2
-    total_wins = Parallel(n_jobs=n_jobs, verbose=10)(
-        delayed(_eval_with_params)(
-            cpu_agents, num_matches, custom_score_3, a=a, b=b
-        )
-        for a, b in ab
-    )
+    store = ResultsStore(results_file) if results_file else None
+    total_wins = _evaluate_points(custom_score_3, ("a", "b"), ab,
+                                  cpu_agents, num_matches, n_jobs, store)
     for i, (a, b) in enumerate(ab):
         print("a = {}, b = {}, win: {} / {}".format(
             a, b, total_wins[i], total_matches))
@@ -133,7 +554,8 @@ def grid_search_custom_fn3_ab(n_jobs=-1, num_matches=20, grid_file=None):
     print("-------------------------------")
 
 
-def grid_search_custom_fn2_abc(n_jobs=-1, num_matches=20, grid_file=None):
+def grid_search_custom_fn2_abc(n_jobs=-1, num_matches=20, grid_file=None,
+                               results_file=None):
     """
     Grid search of the best a,b,c for `custom_score_2`.
 
@@ -152,6 +574,10 @@ def grid_search_custom_fn2_abc(n_jobs=-1, num_matches=20, grid_file=None):
         The npz file which contains the grids to search. If given, only grid
         points in this file will be tested.
 
+    results_file : str
+        If given, evaluations are stored in and reused from this
+        `ResultsStore` file.
+
     """
     cpu_agents = get_cpu_agents()
     if grid_file and isfile(grid_file):
@@ -159,12 +585,9 @@ def grid_search_custom_fn2_abc(n_jobs=-1, num_matches=20, grid_file=None):
     else:
         abc = list(product(range(1, 10), range(1, 10), range(1, 5)))
     total_matches = num_matches * len(cpu_agents) * 2
-    total_wins = Parallel(n_jobs=n_jobs, verbose=10)(
-        delayed(_eval_with_params)(
-            cpu_agents, num_matches, custom_score_2, a=a, b=b, c=c
-        )
-        for a, b, c in abc
-    )
+    store = ResultsStore(results_file) if results_file else None
+    total_wins = _evaluate_points(custom_score_2, ("a", "b", "c"), abc,
+                                  cpu_agents, num_matches, n_jobs, store)
     for i, (a, b, c) in enumerate(abc):
         print("a = {}, b = {}, c = {}, win: {} / {}".format(
             a, b, c, total_wins[i], total_matches))
@@ -174,7 +597,8 @@ def grid_search_custom_fn2_abc(n_jobs=-1, num_matches=20, grid_file=None):
     print("---------------------------------------")
 
 
-def grid_search_custom_fn1_abcd(n_jobs=-1, num_matches=20, grid_file=None):
+def grid_search_custom_fn1_abcd(n_jobs=-1, num_matches=20, grid_file=None,
+                                results_file=None):
     """
     Grid search of the best a,b,c,d for `custom_score`.
 
@@ -193,6 +617,10 @@ def grid_search_custom_fn1_abcd(n_jobs=-1, num_matches=20, grid_file=None):
         The npz file which contains the grids to search. If given, only grid
         points in this file will be tested.
 
+    results_file : str
+        If given, evaluations are stored in and reused from this
+        `ResultsStore` file.
+
     """
     cpu_agents = get_cpu_agents()
     if grid_file and isfile(grid_file):
@@ -201,12 +629,9 @@ def grid_search_custom_fn1_abcd(n_jobs=-1, num_matches=20, grid_file=None):
         abcd = list(product(range(1, 10), range(1, 10),
                             range(1, 5), range(1, 5)))
     total_matches = num_matches * len(cpu_agents) * 2
-    total_wins = Parallel(n_jobs=n_jobs, verbose=10)(
-        delayed(_eval_with_params)(
-            cpu_agents, num_matches, custom_score, a=a, b=b, c=c, d=d
-        )
-        for a, b, c, d in abcd
-    )
+    store = ResultsStore(results_file) if results_file else None
+    total_wins = _evaluate_points(custom_score, ("a", "b", "c", "d"), abcd,
+                                  cpu_agents, num_matches, n_jobs, store)
     for i, (a, b, c, d) in enumerate(abcd):
         print("a = {}, b = {}, c = {}, d = {}, win: {} / {}".format(
             a, b, c, d, total_wins[i], total_matches))
@@ -279,13 +704,58 @@ if __name__ == "__main__":
         help="The npz file which contains the grids to search. If given, only "
              "grid points in this file will be tested."
     )
+    parser.add_argument(
+        "--search",
+        default="grid",
+        choices=["grid", "halving", "hyperband", "bayes"],
+        type=str,
+        help="The search strategy: the full grid, successive halving, "
+             "Hyperband or Bayesian optimization over the ranges of the "
+             "grid. With halving and hyperband, `num_matches` is the maximum "
+             "number of matches of a point."
+    )
+    parser.add_argument(
+        "--eta",
+        default=3,
+        type=int,
+        help="Keep the best 1 / eta points after each successive halving "
+             "round."
+    )
+    parser.add_argument(
+        "--min_matches",
+        default=1,
+        type=int,
+        help="The number of matches against each opponent of the first "
+             "successive halving round."
+    )
+    parser.add_argument(
+        "--n_calls",
+        default=50,
+        type=int,
+        help="The number of points evaluated by Bayesian optimization."
+    )
+
+    parser.add_argument(
+        "--results_file",
+        default=None,
+        type=str,
+        help="A JSON Lines file to which every evaluation is appended. "
+             "Evaluations already in the file are not repeated, so an "
+             "interrupted search can be resumed (see results_store.py to "
+             "merge the files of several machines)."
+    )
 
     args = parser.parse_args()
     params = {"num_matches": args.num_matches,
               "n_jobs": args.num_jobs,
-              "grid_file": args.grid_file}
+              "grid_file": args.grid_file,
+              "results_file": args.results_file}
     if args.score_fn == "versus":
         custom_match(num_matchs=args.num_matches)
+    elif args.search != "grid":
+        adaptive_search(args.score_fn, args.search, eta=args.eta,
+                        min_matches=args.min_matches, n_calls=args.n_calls,
+                        **params)
     elif args.score_fn == "fn1":
         grid_search_custom_fn1_abcd(**params)
     elif args.score_fn == "fn2":
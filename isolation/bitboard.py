@@ -0,0 +1,285 @@
+"""
+This file contains the `BitBoard` class, an alternative engine for the game
+Isolation with the same public API as `isolation.Board`.
+
+The blocked cells are stored as a single integer bitmask and the legal moves
+of a player are computed with one AND against a precomputed knight-move mask
+of its square, so move generation does not have to test each of the eight
+knight directions one by one.
+"""
+import random
+
+from .isolation import Board
+from .tables import knight_tables, zobrist_table
+
+
+class BitBoard(Board):
+    """Implement a model for the game Isolation assuming each player moves like
+    a knight in chess, storing the board state as integer bitmasks.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        self._tables = knight_tables(width, height)
+        # Bit `i` is set if square `i` is blocked (including the squares
+        # occupied by the players). The locations are square indices or
+        # `Board.NOT_MOVED`.
+        self._blocked = 0
+        self._p1_loc = Board.NOT_MOVED
+        self._p2_loc = Board.NOT_MOVED
+
+        self._zobrist = zobrist_table(width, height)
+        self._zobrist_key = 0
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = type(self).__new__(type(self))
+        new_board.__dict__.update(self.__dict__)
+        return new_board
+
+    def encode(self):
+        """Return a compact encoding of the current game state that does not
+        reference the player objects (see `Board.encode()`).
+        """
+        return (self.width, self.height, self.move_count, self._blocked,
+                self._p1_loc, self._p2_loc)
+
+    def _set_state(self, move_count, blocked, p1_loc, p2_loc):
+        """Overwrite the game state of a new board (see `Board.decode()`)."""
+        self._blocked = blocked
+        self._p1_loc = p1_loc
+        self._p2_loc = p2_loc
+        self.move_count = move_count
+        if move_count % 2:
+            self._active_player, self._inactive_player = self._player_2, self._player_1
+        self._zobrist_key = self._compute_zobrist_key()
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._blocked >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        coords = self._tables.coords
+        blank = self._tables.full_mask & ~self._blocked
+        return [coords[idx] for idx in self._tables.iter_bits(blank)]
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        idx = self._location_index(player)
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._tables.coords[idx]
+
+    def get_legal_moves(self, player=None, shuffle=True):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        shuffle : bool (optional)
+            If False, the moves are returned in a fixed order instead of a
+            random one (e.g., when the caller sorts them anyway).
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        idx = self._location_index(player)
+        if idx == Board.NOT_MOVED:
+            return self.get_blank_spaces()
+
+        moves = list(self._tables.moves(self._tables.masks[idx] & ~self._blocked))
+        if shuffle:
+            random.shuffle(moves)
+        return moves
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        (int, int or None)
+            An undo record that can be passed to `undo_move()` to restore the
+            state before this move.
+        """
+        idx = move[0] + move[1] * self.height
+        if self._active_player == self._player_2:
+            slot, last_loc = 1, self._p2_loc
+            self._p2_loc = idx
+        else:
+            slot, last_loc = 0, self._p1_loc
+            self._p1_loc = idx
+        self._blocked |= 1 << idx
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+        self._zobrist_key ^= self._zobrist_delta(slot, idx, last_loc)
+        return idx, last_loc
+
+    def undo_move(self, undo):
+        """Take back the last move applied with `apply_move()` in place.
+
+        Parameters
+        ----------
+        undo : (int, int or None)
+            The undo record returned by the matching call to `apply_move()`.
+            Moves must be undone in the reverse order they were applied.
+        """
+        idx, last_loc = undo
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        if self._active_player == self._player_2:
+            slot = 1
+            self._p2_loc = last_loc
+        else:
+            slot = 0
+            self._p1_loc = last_loc
+        self._blocked &= ~(1 << idx)
+        self.move_count -= 1
+        self._zobrist_key ^= self._zobrist_delta(slot, idx, last_loc)
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        return player == self._inactive_player and not self._has_moves()
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        return player == self._active_player and not self._has_moves()
+
+    def utility(self, player):
+        """Returns the utility of the current game state from the perspective
+        of the specified player.
+
+                    /  +infinity,   "player" wins
+        utility =  |   -infinity,   "player" loses
+                    \\          0,    otherwise
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the utility for the active player on the board.
+
+        Returns
+        ----------
+        float
+            The utility value of the current game state for the specified
+            player. The game has a utility of +inf if the player has won,
+            a value of -inf if the player has lost, and a value of 0
+            otherwise.
+        """
+        if not self._has_moves():
+
+            if player == self._inactive_player:
+                return float("inf")
+
+            if player == self._active_player:
+                return float("-inf")
+
+        return 0.
+
+    def to_string(self, symbols=['1', '2']):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        col_margin = len(str(self.height - 1)) + 1
+        prefix = "{:<" + "{}".format(col_margin) + "}"
+        offset = " " * (col_margin + 3)
+        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        for i in range(self.height):
+            out += prefix.format(i) + ' | '
+            for j in range(self.width):
+                idx = i + j * self.height
+                if not self._blocked >> idx & 1:
+                    out += ' '
+                elif self._p1_loc == idx:
+                    out += symbols[0]
+                elif self._p2_loc == idx:
+                    out += symbols[1]
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+
+        return out
+
+    def _location_index(self, player):
+        """Return the square index of `player`, or `Board.NOT_MOVED`."""
+        if player == self._player_1:
+            return self._p1_loc
+        elif player == self._player_2:
+            return self._p2_loc
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def _has_moves(self):
+        """Test whether the active player has at least one legal move."""
+        if self._active_player == self._player_2:
+            idx = self._p2_loc
+        else:
+            idx = self._p1_loc
+        if idx == Board.NOT_MOVED:
+            return self._blocked != self._tables.full_mask
+        return self._tables.masks[idx] & ~self._blocked != 0
@@ -11,6 +11,8 @@ import random
 import timeit
 from copy import copy
 
+from .tables import symmetry_tables, zobrist_table
+
 TIME_LIMIT_MILLIS = 150
 
 
@@ -52,8 +54,51 @@ class Board(object):
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Zobrist key of the current state, updated incrementally by
+        # `apply_move()` and `undo_move()`
+        self._zobrist = zobrist_table(width, height)
+        self._zobrist_key = 0
+
     def hash(self):
-        return str(self._board_state).__hash__()
+        return self._zobrist_key
+
+    @property
+    def zobrist_key(self):
+        """A 64-bit Zobrist key of the current game state covering the blocked
+        cells, the locations of both players and the player to move.
+        """
+        return self._zobrist_key
+
+    def canonical_key(self):
+        """Return the canonical key of the position and the symmetry that
+        maps the board to its canonical orientation.
+
+        The key is the smallest `zobrist_key` of the position over all
+        reflections and rotations of the board (see
+        `isolation.tables.SymmetryTables`), so symmetric positions share
+        it. Use `to_canonical()` and `from_canonical()` to map moves between
+        the board and the canonical orientation.
+
+        Returns
+        -------
+        (int, int)
+            The canonical key and the index of the symmetry.
+        """
+        _, _, move_count, blocked, p1_loc, p2_loc = self.encode()
+        return symmetry_tables(self.width, self.height).canonical_key(
+            blocked, p1_loc, p2_loc, move_count % 2)
+
+    def to_canonical(self, move, symmetry):
+        """Map a move on this board to the canonical orientation given by
+        `symmetry` (see `canonical_key()`)."""
+        return symmetry_tables(self.width, self.height).transform_move(
+            move, symmetry)
+
+    def from_canonical(self, move, symmetry):
+        """Map a move in the canonical orientation given by `symmetry` (see
+        `canonical_key()`) back to this board."""
+        tables = symmetry_tables(self.width, self.height)
+        return tables.transform_move(move, tables.inverses[symmetry])
 
     @property
     def active_player(self):
@@ -97,8 +142,51 @@ class Board(object):
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._zobrist_key = self._zobrist_key
         return new_board
 
+    def encode(self):
+        """Return a compact encoding of the current game state that does not
+        reference the player objects (e.g., to send it to another process).
+
+        Returns
+        -------
+        (int, int, int, int, int or None, int or None)
+            The tuple (width, height, move_count, blocked, p1_loc, p2_loc),
+            where bit `i` of `blocked` is set if the cell with index `i` is
+            blocked and the locations are cell indices or `Board.NOT_MOVED`.
+            Cell indices are `row + column * height`.
+        """
+        blocked = 0
+        for idx in range(self.width * self.height):
+            if self._board_state[idx]:
+                blocked |= 1 << idx
+        return (self.width, self.height, self.move_count, blocked,
+                self._board_state[-1], self._board_state[-2])
+
+    @classmethod
+    def decode(cls, player_1, player_2, encoding):
+        """Return a new board in the state given by `encoding` (see
+        `encode()`) with the specified players.
+        """
+        width, height, move_count, blocked, p1_loc, p2_loc = encoding
+        board = cls(player_1, player_2, width=width, height=height)
+        board._set_state(move_count, blocked, p1_loc, p2_loc)
+        return board
+
+    def _set_state(self, move_count, blocked, p1_loc, p2_loc):
+        """Overwrite the game state of a new board (see `decode()`)."""
+        for idx in range(self.width * self.height):
+            if blocked >> idx & 1:
+                self._board_state[idx] = 1
+        self._board_state[-1] = p1_loc
+        self._board_state[-2] = p2_loc
+        self._board_state[-3] = move_count % 2
+        self.move_count = move_count
+        if move_count % 2:
+            self._active_player, self._inactive_player = self._player_2, self._player_1
+        self._zobrist_key = self._compute_zobrist_key()
+
     def forecast_move(self, move):
         """Return a deep copy of the current game with an input move applied to
         advance the game one ply.
@@ -171,7 +259,7 @@ class Board(object):
         h = idx % self.height
         return (h, w)
 
-    def get_legal_moves(self, player=None):
+    def get_legal_moves(self, player=None, shuffle=True):
         """Return the list of all legal moves for the specified player.
 
         Parameters
@@ -180,6 +268,10 @@ class Board(object):
             An object registered as a player in the current game. If None,
             return the legal moves for the active player on the board.
 
+        shuffle : bool (optional)
+            If False, the moves are returned in a fixed order instead of a
+            random one (e.g., when the caller sorts them anyway).
+
         Returns
         -------
         list<(int, int)>
@@ -188,7 +280,7 @@ class Board(object):
         """
         if player is None:
             player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+        return self.__get_moves(self.get_player_location(player), shuffle)
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -198,14 +290,69 @@ class Board(object):
         move : (int, int)
             A coordinate pair (row, column) indicating the next position for
             the active player on the board.
+
+        Returns
+        -------
+        (int, int or None)
+            An undo record that can be passed to `undo_move()` to restore the
+            state before this move.
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        last_loc = self._board_state[-last_move_idx]
+        undo = (idx, last_loc)
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
+        self._zobrist_key ^= self._zobrist_delta(last_move_idx - 1, idx, last_loc)
+        return undo
+
+    def undo_move(self, undo):
+        """Take back the last move applied with `apply_move()` in place.
+
+        Parameters
+        ----------
+        undo : (int, int or None)
+            The undo record returned by the matching call to `apply_move()`.
+            Moves must be undone in the reverse order they were applied.
+        """
+        idx, last_loc = undo
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        last_move_idx = int(self.active_player == self._player_2) + 1
+        self._board_state[-last_move_idx] = last_loc
+        self._board_state[idx] = Board.BLANK
+        self._board_state[-3] ^= 1
+        self.move_count -= 1
+        self._zobrist_key ^= self._zobrist_delta(last_move_idx - 1, idx, last_loc)
+
+    def _zobrist_delta(self, slot, idx, last_loc):
+        """Return the Zobrist key change of moving player `slot` (0 for player
+        1, 1 for player 2) from `last_loc` to square `idx`. The same value
+        is XORed in by `apply_move()` and out again by `undo_move()`.
+        """
+        locations = self._zobrist.locations[slot]
+        delta = self._zobrist.blocked[idx] ^ locations[idx] ^ self._zobrist.side
+        if last_loc is not Board.NOT_MOVED:
+            delta ^= locations[last_loc]
+        return delta
+
+    def _compute_zobrist_key(self):
+        """Compute the Zobrist key of the current state from scratch."""
+        height = self.height
+        blank = set(r + c * height for r, c in self.get_blank_spaces())
+        key = 0
+        for idx in range(self.width * height):
+            if idx not in blank:
+                key ^= self._zobrist.blocked[idx]
+        for slot, player in enumerate((self._player_1, self._player_2)):
+            loc = self.get_player_location(player)
+            if loc is not Board.NOT_MOVED:
+                key ^= self._zobrist.locations[slot][loc[0] + loc[1] * height]
+        if self._active_player == self._player_2:
+            key ^= self._zobrist.side
+        return key
 
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
@@ -247,7 +394,7 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
+    def __get_moves(self, loc, shuffle=True):
         """Generate the list of possible moves for an L-shaped motion (like a
         knight in chess).
         """
@@ -259,7 +406,8 @@ class Board(object):
                       (1, -2), (1, 2), (2, -1), (2, 1)]
         valid_moves = [(r + dr, c + dc) for dr, dc in directions
                        if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
+        if shuffle:
+            random.shuffle(valid_moves)
         return valid_moves
 
     def print_board(self):
@@ -0,0 +1,219 @@
+"""
+Retrograde tablebases of small Isolation boards.
+
+Every move blocks a square, so the positions of a game can be grouped in
+layers by the number of blocked squares, and the moves of a position all
+lead to the next layer. `build_tablebase()` enumerates the layers of all
+positions reachable from the empty board (one position per canonical key,
+see `Board.canonical_key()`) and solves them backwards from the last layer:
+a position is won for the player to move if one of its moves leads to a
+position lost for the opponent.
+
+The result is written to a file that `Tablebase` memory-maps and probes
+with a binary search. Its `solve()` method has the interface of
+`isolation.endgame.EndgameSolver.solve()`, so a tablebase can be given to
+`AlphaBetaPlayer` as its `endgame_solver`:
+
+    python -m isolation.tablebase build tb4x4.bin --width 4 --height 4
+
+The number of positions grows quickly with the size of the board: 15563 on
+4x4, 466476 on 4x5 and 7421379 on 5x5 (a 74 MB file, which takes minutes
+and about 1.5 GB of memory to build), so the tablebases are meant for small
+boards. Late positions of larger boards are solved by the
+`isolation.endgame.EndgameSolver` once the players are separated.
+"""
+from __future__ import print_function
+
+import mmap
+import struct
+from argparse import ArgumentParser
+
+from .tables import knight_tables, symmetry_tables
+
+MAGIC = b"ISOTB001"
+_HEADER = struct.Struct("<8sBBI")
+# Canonical key, distance * 2 + (1 if the player to move wins), square index
+# of the best move in the canonical orientation (or `_NO_MOVE`)
+_ENTRY = struct.Struct("<QBB")
+_NO_MOVE = 255
+
+
+def _layers(width, height):
+    """Yield the dicts {canonical key: (blocked, p1_loc, p2_loc)} of the
+    positions reachable from the empty board, one per number of blocked
+    squares."""
+    tables = knight_tables(width, height)
+    symmetry = symmetry_tables(width, height)
+    layer = {symmetry.canonical_key(0, None, None, 0)[0]: (0, None, None)}
+    ply = 0
+    while layer:
+        yield layer
+        next_layer = {}
+        for blocked, p1_loc, p2_loc in layer.values():
+            loc = p2_loc if ply % 2 else p1_loc
+            if loc is None:
+                targets = tables.full_mask & ~blocked
+            else:
+                targets = tables.masks[loc] & ~blocked
+            for idx in tables.iter_bits(targets):
+                child = ((blocked | 1 << idx, p1_loc, idx) if ply % 2 else
+                         (blocked | 1 << idx, idx, p2_loc))
+                key, _ = symmetry.canonical_key(child[0], child[1], child[2],
+                                                (ply + 1) % 2)
+                next_layer.setdefault(key, child)
+        layer = next_layer
+        ply += 1
+
+
+def solve_positions(width, height):
+    """Return a dict {canonical key: (player to move wins, distance, best
+    move square)} of all positions reachable from the empty board.
+
+    The distance is the number of plies until the player to move is stuck
+    when the winner plays the fastest win and the loser the slowest loss.
+    The square of the best move is given in the canonical orientation of
+    the position, or None if the player to move has no moves.
+    """
+    tables = knight_tables(width, height)
+    symmetry = symmetry_tables(width, height)
+    layers = list(_layers(width, height))
+    results = {}
+    for ply in range(len(layers) - 1, -1, -1):
+        for key, (blocked, p1_loc, p2_loc) in layers[ply].items():
+            # Solve the position in its canonical orientation, so that the
+            # best move is stored in that orientation
+            t = symmetry.canonical_key(blocked, p1_loc, p2_loc, ply % 2)[1]
+            perm = symmetry.permutations[t]
+            blocked = symmetry.transform_mask(blocked, t)
+            p1_loc = None if p1_loc is None else perm[p1_loc]
+            p2_loc = None if p2_loc is None else perm[p2_loc]
+            loc = p2_loc if ply % 2 else p1_loc
+            if loc is None:
+                targets = tables.full_mask & ~blocked
+            else:
+                targets = tables.masks[loc] & ~blocked
+            best = (False, 0, None)
+            for idx in tables.iter_bits(targets):
+                child = ((blocked | 1 << idx, p1_loc, idx) if ply % 2 else
+                         (blocked | 1 << idx, idx, p2_loc))
+                child_key, _ = symmetry.canonical_key(
+                    child[0], child[1], child[2], (ply + 1) % 2)
+                child_wins, child_distance, _ = results[child_key]
+                win, distance = not child_wins, child_distance + 1
+                if best[2] is None or (
+                        (win, -distance if win else distance) >
+                        (best[0], -best[1] if best[0] else best[1])):
+                    best = (win, distance, idx)
+            results[key] = best
+        # The positions of the next layer are not needed any more
+        layers[ply] = None
+    return results
+
+
+def build_tablebase(path, width, height):
+    """Solve all positions of a board of the given size and write them to
+    the tablebase file `path`. Returns the number of positions."""
+    results = solve_positions(width, height)
+    with open(path, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, width, height, len(results)))
+        for key in sorted(results):
+            win, distance, square = results[key]
+            fp.write(_ENTRY.pack(key, distance * 2 + win,
+                                 _NO_MOVE if square is None else square))
+    return len(results)
+
+
+class Tablebase(object):
+    """A read-only tablebase file written by `build_tablebase()`.
+
+    Parameters
+    ----------
+    path : str
+        The tablebase file.
+
+    Attributes
+    ----------
+    width, height : int
+        The size of the board of the tablebase.
+    solved : int
+        The number of positions solved by `solve()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.solved = 0
+        with open(path, "rb") as fp:
+            self._data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, self._count = _HEADER.unpack_from(
+            self._data, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a tablebase".format(path))
+
+    def __reduce__(self):
+        # Memory maps can't be pickled, worker processes map the file again
+        return Tablebase, (self.path,)
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._data.close()
+
+    def probe(self, game):
+        """Return (the player to move wins, distance in plies, best move) of
+        the position of `game`, or None if it is not in the tablebase. The
+        best move is (-1, -1) if the player to move has no moves."""
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        key, symmetry = game.canonical_key()
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry_key, value, square = _ENTRY.unpack_from(
+                self._data, _HEADER.size + mid * _ENTRY.size)
+            if entry_key < key:
+                lo = mid + 1
+            elif entry_key > key:
+                hi = mid
+            else:
+                if square == _NO_MOVE:
+                    move = (-1, -1)
+                else:
+                    move = game.from_canonical(
+                        (square % self.height, square // self.height),
+                        symmetry)
+                return bool(value & 1), value >> 1, move
+        return None
+
+    def solve(self, game, player, check_clock=None):
+        """Return the exact score for `player` and the best move of the
+        active player of `game`, or None if the position is not in the
+        tablebase (see `isolation.endgame.EndgameSolver.solve()`; a probe is
+        fast enough to never need `check_clock`)."""
+        entry = self.probe(game)
+        if entry is None:
+            return None
+        self.solved += 1
+        win, _, move = entry
+        if win == (player == game.active_player):
+            return float("inf"), move
+        return float("-inf"), move
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Build Isolation tablebases.")
+    subparsers = parser.add_subparsers(dest="command")
+    build = subparsers.add_parser(
+        "build", help="Solve all positions of a small board.")
+    build.add_argument("path", type=str, help="The tablebase file to write.")
+    build.add_argument("--width", type=int, default=4,
+                       help="The board width (default: 4).")
+    build.add_argument("--height", type=int, default=4,
+                       help="The board height (default: 4).")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        print("Wrote {} positions to {}".format(
+            build_tablebase(args.path, args.width, args.height), args.path))
+    else:
+        parser.print_help()
@@ -0,0 +1,248 @@
+"""
+Precomputed lookup tables shared by the Isolation board engines.
+
+Squares are indexed exactly like `Board._board_state`, i.e. the square at
+(row, column) has index ``row + column * height``. Bit ``i`` of any square
+mask corresponds to square index ``i``.
+"""
+import random
+
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)]
+
+_KNIGHT_TABLES = {}
+_ZOBRIST_TABLES = {}
+_SYMMETRY_TABLES = {}
+
+class KnightTables(object):
+    """Knight-move tables for a board of the given size.
+
+    Attributes
+    ----------
+    coords : list<(int, int)>
+        The (row, column) pair of each square index.
+
+    neighbors : list<list<int>>
+        The square indices reachable with one knight move from each square.
+
+    masks : list<int>
+        The bitmask of `neighbors` for each square.
+
+    full_mask : int
+        A mask with one bit set for every square of the board.
+
+    move_lists : dict<int, tuple<(int, int)>>
+        A cache of the (row, column) pairs of the squares set in a mask of
+        open knight-move targets (see `moves()`).
+
+    square_lists : dict<int, tuple<int>>
+        The same cache for the square indices (see `squares()`).
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.coords = [(idx % height, idx // height) for idx in range(self.size)]
+        self.neighbors = []
+        for r, c in self.coords:
+            self.neighbors.append([(r + dr) + (c + dc) * height
+                                   for dr, dc in DIRECTIONS
+                                   if 0 <= r + dr < height and
+                                   0 <= c + dc < width])
+        self.masks = [sum(1 << j for j in nbrs) for nbrs in self.neighbors]
+        self.full_mask = (1 << self.size) - 1
+        self.move_lists = {}
+        self.square_lists = {}
+
+    def moves(self, mask):
+        """Return the (row, column) pairs of the squares set in `mask`.
+
+        The masks passed here are knight-move masks restricted to the open
+        squares, of which there are at most 256 per square, so the result
+        is cached instead of iterating the bits on every call.
+        """
+        moves = self.move_lists.get(mask)
+        if moves is None:
+            moves = self.move_lists[mask] = tuple(
+                self.coords[idx] for idx in self.iter_bits(mask))
+        return moves
+
+    def squares(self, mask):
+        """Return the square indices set in the knight-move mask `mask`
+        (cached like `moves()`)."""
+        squares = self.square_lists.get(mask)
+        if squares is None:
+            squares = self.square_lists[mask] = tuple(self.iter_bits(mask))
+        return squares
+
+    def iter_bits(self, mask):
+        """Yield the square indices of all bits set in `mask`."""
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+
+def knight_tables(width, height):
+    """Return the (cached) `KnightTables` for a board of the given size."""
+    key = (width, height)
+    tables = _KNIGHT_TABLES.get(key)
+    if tables is None:
+        tables = _KNIGHT_TABLES[key] = KnightTables(width, height)
+    return tables
+
+
+class ZobristTable(object):
+    """Random 64-bit keys used to maintain an incremental Zobrist hash of a
+    board of the given size.
+
+    The key of a position is the XOR of `blocked[i]` for every blocked square
+    `i` (including the squares occupied by the players), `locations[0][i]`
+    and `locations[1][i]` for the squares of player 1 and player 2, and
+    `side` when player 2 holds the initiative. The keys are generated from a
+    fixed seed, so they are identical across processes and runs.
+    """
+
+    def __init__(self, width, height):
+        rng = random.Random("isolation-zobrist-{}x{}".format(width, height))
+        size = width * height
+        self.blocked = [rng.getrandbits(64) for _ in range(size)]
+        self.locations = ([rng.getrandbits(64) for _ in range(size)],
+                          [rng.getrandbits(64) for _ in range(size)])
+        self.side = rng.getrandbits(64)
+
+
+def zobrist_table(width, height):
+    """Return the (cached) `ZobristTable` for a board of the given size."""
+    key = (width, height)
+    table = _ZOBRIST_TABLES.get(key)
+    if table is None:
+        table = _ZOBRIST_TABLES[key] = ZobristTable(width, height)
+    return table
+
+
+class SymmetryTables(object):
+    """The symmetries of a board of the given size and lookup tables to
+    compute the canonical Zobrist key of a position.
+
+    Reflections and rotations of the board map knight moves to knight
+    moves, so symmetric positions have the same game tree up to the
+    transformation of the moves. A rectangular board has 4 symmetries
+    (identity, row flip, column flip and half turn) and a square board 8
+    (also the transpositions and quarter turns). Transformation 0 is
+    always the identity.
+
+    Attributes
+    ----------
+    permutations : list<list<int>>
+        `permutations[t][i]` is the square index that square `i` is mapped
+        to by transformation `t`.
+
+    inverses : list<int>
+        The index of the inverse of each transformation.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        h, w = height - 1, width - 1
+        maps = [lambda r, c: (r, c),
+                lambda r, c: (h - r, c),
+                lambda r, c: (r, w - c),
+                lambda r, c: (h - r, w - c)]
+        if width == height:
+            maps += [lambda r, c: (c, r),
+                     lambda r, c: (w - c, r),
+                     lambda r, c: (c, h - r),
+                     lambda r, c: (w - c, h - r)]
+        self.permutations = []
+        for transform in maps:
+            self.permutations.append([
+                r + c * height
+                for r, c in (transform(idx % height, idx // height)
+                             for idx in range(self.size))])
+        self.inverses = []
+        for perm in self.permutations:
+            for t, other in enumerate(self.permutations):
+                if all(other[perm[idx]] == idx for idx in range(self.size)):
+                    self.inverses.append(t)
+                    break
+
+        # Tables of the transformed masks and Zobrist keys of the blocked
+        # squares of each byte of a mask
+        zobrist = zobrist_table(width, height)
+        self._num_bytes = (self.size + 7) // 8
+        self._mask_bytes = []
+        self._key_bytes = []
+        for perm in self.permutations:
+            mask_bytes, key_bytes = [], []
+            for byte in range(self._num_bytes):
+                squares = [idx for idx in range(8 * byte, 8 * byte + 8)
+                           if idx < self.size]
+                masks, keys = [0] * 256, [0] * 256
+                for value in range(1, 256):
+                    low = (value & -value).bit_length() - 1
+                    rest = value & (value - 1)
+                    if low < len(squares):
+                        masks[value] = masks[rest] | 1 << perm[squares[low]]
+                        keys[value] = keys[rest] ^ zobrist.blocked[
+                            perm[squares[low]]]
+                    else:
+                        masks[value], keys[value] = masks[rest], keys[rest]
+                mask_bytes.append(masks)
+                key_bytes.append(keys)
+            self._mask_bytes.append(mask_bytes)
+            self._key_bytes.append(key_bytes)
+        self._locations = [
+            [[locations[perm[idx]] for idx in range(self.size)]
+             for locations in zobrist.locations]
+            for perm in self.permutations]
+        self._side = zobrist.side
+
+    def transform_mask(self, mask, transform):
+        """Return the mask of the squares of `mask` mapped by `transform`."""
+        result = 0
+        for table in self._mask_bytes[transform]:
+            result |= table[mask & 0xff]
+            mask >>= 8
+        return result
+
+    def transform_move(self, move, transform):
+        """Return the (row, column) pair `move` mapped by `transform`."""
+        idx = self.permutations[transform][move[0] + move[1] * self.height]
+        return idx % self.height, idx // self.height
+
+    def keys(self, blocked, p1_loc, p2_loc, player_2_to_move):
+        """Return the Zobrist keys (see `ZobristTable`) of a position
+        (given like `Board.encode()`) mapped by each transformation."""
+        keys = []
+        for key_bytes, locations in zip(self._key_bytes, self._locations):
+            key = self._side if player_2_to_move else 0
+            mask = blocked
+            for table in key_bytes:
+                key ^= table[mask & 0xff]
+                mask >>= 8
+            if p1_loc is not None:
+                key ^= locations[0][p1_loc]
+            if p2_loc is not None:
+                key ^= locations[1][p2_loc]
+            keys.append(key)
+        return keys
+
+    def canonical_key(self, blocked, p1_loc, p2_loc, player_2_to_move):
+        """Return the smallest Zobrist key of a position over all
+        transformations, and the (first) transformation that gives it."""
+        keys = self.keys(blocked, p1_loc, p2_loc, player_2_to_move)
+        key = min(keys)
+        return key, keys.index(key)
+
+
+def symmetry_tables(width, height):
+    """Return the (cached) `SymmetryTables` for a board of the given size."""
+    key = (width, height)
+    tables = _SYMMETRY_TABLES.get(key)
+    if tables is None:
+        tables = _SYMMETRY_TABLES[key] = SymmetryTables(width, height)
+    return tables
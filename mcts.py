@@ -0,0 +1,366 @@
+#!coding=utf-8
+"""
+A Monte Carlo tree search agent.
+
+`MCTSPlayer` grows a search tree with UCT: each playout descends the tree by
+the upper confidence bound of the children, adds one new node and finishes
+the game with random moves (a rollout) to score it. The move played is the
+most visited child of the root. The subtree of the position reached after
+the opponent's reply is kept for the next move, so the playouts of the
+previous search are not lost.
+
+The playouts don't use `Board` at all: the state of a playout is the
+bitmask of the blocked squares and the square indices of the two players,
+and the moves are generated from the knight-move masks of
+`isolation.tables`, like in `isolation.BitBoard`. A random game from the
+empty 7x7 board takes about 35 us, ten times less than with
+`BitBoard.forecast_move()`.
+
+The tree itself is stored in flat lists of integers (see `SearchTree`)
+rather than one object per node: a tree of a million nodes would otherwise
+make the garbage collector pause the search for longer than the timeout.
+"""
+from math import log, sqrt
+from random import random, shuffle
+
+from game_agent import SearchTimeout, _ClockedPlayer, _time_millis
+from isolation.tables import knight_tables
+
+
+def _targets(tables, blocked, loc):
+    """Return the mask of the open squares a player at `loc` can move to."""
+    if loc is None:
+        return tables.full_mask & ~blocked
+    return tables.masks[loc] & ~blocked
+
+
+def rollout(tables, blocked, loc, other):
+    """Play random moves until one player is stuck and return the number of
+    plies played, so the player to move loses if it is even.
+
+    Parameters
+    ----------
+    tables : `isolation.tables.KnightTables`
+        The tables of the board.
+
+    blocked : int
+        The mask of the blocked squares.
+
+    loc, other : int or None
+        The squares of the player to move and of its opponent (None if the
+        player has not moved yet).
+    """
+    masks = tables.masks
+    square_lists = tables.square_lists
+    plies = 0
+    # The first moves of the game can go to any open square
+    while loc is None or other is None:
+        if loc is None:
+            if blocked == tables.full_mask:
+                return plies
+            move = int(random() * tables.size)
+            while blocked >> move & 1:
+                move = int(random() * tables.size)
+        else:
+            moves = tables.squares(masks[loc] & ~blocked)
+            if not moves:
+                return plies
+            move = moves[int(random() * len(moves))]
+        loc, other = other, move
+        blocked |= 1 << move
+        plies += 1
+    while True:
+        targets = masks[loc] & ~blocked
+        moves = square_lists.get(targets)
+        if moves is None:
+            moves = tables.squares(targets)
+        if not moves:
+            return plies
+        loc, other = other, moves[int(random() * len(moves))]
+        blocked |= 1 << other
+        plies += 1
+
+
+def root_state(encoding):
+    """Return the position of the `Board.encode()` tuple `encoding` as a
+    (blocked mask, square of the player to move, square of its opponent)
+    tuple (see `SearchTree`)."""
+    _, _, move_count, blocked, p1_loc, p2_loc = encoding
+    if move_count % 2:
+        return blocked, p2_loc, p1_loc
+    return blocked, p1_loc, p2_loc
+
+
+class SearchTree(object):
+    """A UCT search tree stored in flat lists indexed by node.
+
+    All children of a node are added at once, in random order, the first
+    time a playout passes through the node, and are then tried one by one
+    before the selection by upper confidence bound starts.
+
+    Parameters
+    ----------
+    tables : `isolation.tables.KnightTables`
+        The tables of the board.
+
+    state : (int, int or None, int or None)
+        The position of the root: the mask of the blocked squares and the
+        squares of the player to move and of its opponent.
+
+    Attributes
+    ----------
+    root : int
+        The root node.
+
+    moves, visits, wins : list<int>
+        The square moved to, the number of playouts and the number of
+        playouts won by the player that moved, of each node.
+
+    first_child, num_children, num_tried : list<int>
+        The first of the consecutive children of each node (-1 until they
+        are added), their number and the number of them tried so far.
+    """
+
+    def __init__(self, tables, state):
+        self.tables = tables
+        self.state = state
+        self.root = 0
+        self.moves = [-1]
+        self.visits = [0]
+        self.wins = [0]
+        self.first_child = [-1]
+        self.num_children = [0]
+        self.num_tried = [0]
+
+    def __len__(self):
+        return len(self.moves)
+
+    def _expand(self, node, blocked, loc):
+        """Add the children of `node`, where the player to move is at `loc`,
+        and return the first one (or -1 if the tree has no room for them,
+        see `parallel_search.SharedSearchTree`)."""
+        moves = list(self.tables.iter_bits(
+            _targets(self.tables, blocked, loc)))
+        shuffle(moves)
+        first = len(self.moves)
+        self.first_child[node] = first
+        self.num_children[node] = len(moves)
+        self.moves.extend(moves)
+        self.visits.extend([0] * len(moves))
+        self.wins.extend([0] * len(moves))
+        self.first_child.extend([-1] * len(moves))
+        self.num_children.extend([0] * len(moves))
+        self.num_tried.extend([0] * len(moves))
+        return first
+
+    def children(self, node):
+        """Return the range of the children of `node`."""
+        first = self.first_child[node]
+        if first < 0:
+            return range(0)
+        return range(first, first + self.num_children[node])
+
+    def playout(self, exploration):
+        """Select a leaf of the tree with UCT, score it with a rollout and
+        update the statistics of the nodes on its path.
+
+        The visits of the nodes are counted on the way down and the wins
+        after the rollout, so a playout in progress counts as a loss (a
+        "virtual loss") and other processes searching the same tree at the
+        same time are steered to other paths.
+
+        Parameters
+        ----------
+        exploration : float
+            The exploration constant of the upper confidence bound (see
+            `MCTSPlayer`).
+        """
+        moves, visits, wins = self.moves, self.visits, self.wins
+        first_child, num_children = self.first_child, self.num_children
+        num_tried = self.num_tried
+        node = self.root
+        path = [node]
+        visits[node] += 1
+        blocked, loc, other = self.state
+        while True:
+            first = first_child[node]
+            if first < 0:
+                first = self._expand(node, blocked, loc)
+                if first < 0:
+                    break
+            count = num_children[node]
+            if not count:
+                # The player to move is stuck
+                break
+            tried = num_tried[node]
+            if tried < count:
+                num_tried[node] = tried + 1
+                node = first + tried
+            else:
+                scale = exploration * sqrt(log(visits[node]))
+                best_value = -1.
+                for child in range(first, first + count):
+                    n = visits[child]
+                    if not n:
+                        # Tried by another process, which has not counted
+                        # its visit yet
+                        node = child
+                        break
+                    value = wins[child] / n + scale / sqrt(n)
+                    if value > best_value:
+                        best_value = value
+                        node = child
+            visits[node] += 1
+            square = moves[node]
+            blocked |= 1 << square
+            loc, other = other, square
+            path.append(node)
+            if tried < count:
+                break
+        # The player that moved into `node` wins if the player to move there
+        # is stuck after an even number of plies
+        won = rollout(self.tables, blocked, loc, other) % 2 == 0
+        for node in reversed(path):
+            wins[node] += won
+            won = not won
+
+    def root_visits(self):
+        """Return a dict {square: visits} of the children of the root."""
+        return {self.moves[child]: self.visits[child]
+                for child in self.children(self.root)}
+
+    def best_move(self):
+        """Return the square of the most visited child of the root, or None
+        if the root has no children."""
+        visits = self.root_visits()
+        if not visits:
+            return None
+        return max(visits, key=visits.get)
+
+    def advance(self, square):
+        """Make the child of the move to `square` the root, and return False
+        if the root has no such child."""
+        for child in self.children(self.root):
+            if self.moves[child] == square:
+                blocked, _, other = self.state
+                self.root = child
+                self.state = (blocked | 1 << square, other, square)
+                return True
+        return False
+
+
+class MCTSPlayer(_ClockedPlayer):
+    """Game-playing agent that chooses a move with Monte Carlo tree search
+    (UCT) until the search time limit expires.
+
+    Parameters
+    ----------
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted.
+
+    exploration : float (optional)
+        The exploration constant of the upper confidence bound: a child is
+        selected by its win rate plus ``exploration * sqrt(ln(N) / n)``
+        for a parent with N visits and a child with n visits.
+
+    reuse_tree : bool (optional)
+        If True, the subtree of the position after the opponent's reply is
+        kept as the root of the next search.
+
+    max_nodes : int (optional)
+        A tree with more nodes is not reused (the nodes outside of the
+        subtree of the new root are not freed until the tree is dropped).
+
+    stats : `search_stats.MCTSStats` (optional)
+        If given, the number of playouts and the time of every search are
+        recorded in this collector.
+
+    Attributes
+    ----------
+    tree : `SearchTree` or None
+        The search tree of the last move.
+    """
+    # A playout costs as much as dozens of alpha-beta nodes, and its cost
+    # varies with the length of the rollouts, so the clock is read often
+    MAX_CHECK_INTERVAL = 16
+
+    def __init__(self, timeout=10., exploration=1., reuse_tree=True,
+                 max_nodes=2 ** 21, stats=None):
+        super(MCTSPlayer, self).__init__(score_fn=None, timeout=timeout)
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.max_nodes = max_nodes
+        self.stats = stats
+        self.tree = None
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        move: (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.time_left = time_left
+        start = _time_millis()
+        tree = self._set_root(knight_tables(game.width, game.height),
+                              root_state(game.encode()))
+        reused = tree.visits[tree.root]
+        blocked, loc, _ = tree.state
+        if not _targets(tree.tables, blocked, loc):
+            return (-1, -1)
+        playouts = self._search(tree)
+        if self.stats is not None:
+            self.stats.add_move(playouts, _time_millis() - start, reused)
+
+        square = tree.best_move()
+        # Keep the subtree of the move for the next search
+        tree.advance(square)
+        return tree.tables.coords[square]
+
+    def _search(self, tree):
+        """Run playouts on `tree` until the search times out and return
+        their number."""
+        playouts = 0
+        # The playouts at the end of the last search may have been much
+        # faster than the first ones of this search
+        self._check_interval = 1
+        self._start_clock()
+        try:
+            while True:
+                tree.playout(self.exploration)
+                playouts += 1
+                self._countdown -= 1
+                if self._countdown <= 0:
+                    self._check_clock()
+        except SearchTimeout:
+            pass
+        finally:
+            self._stop_clock()
+        return playouts
+
+    def _set_root(self, tables, state):
+        """Return the search tree of the root position `state`, which is the
+        tree of the last search if it contains the position."""
+        tree = self.tree
+        if (self.reuse_tree and tree is not None and
+                len(tree) <= self.max_nodes and tree.tables is tables and
+                state[2] is not None and tree.advance(state[2]) and
+                tree.state == state):
+            return tree
+        # The opponent's move is not in the tree (or this is a new game)
+        self.tree = SearchTree(tables, state)
+        return self.tree
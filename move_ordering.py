@@ -0,0 +1,111 @@
+#!coding=utf-8
+"""
+Move ordering for the alpha-beta search agents.
+
+Alpha-beta prunes the most when the best move of a node is searched first.
+`MoveOrdering` sorts the legal moves of a node by the following rules:
+
+    1. the move of the principal variation of the previous iteration,
+    2. the best move stored in the transposition table (if any),
+    3. the killer moves of the current ply,
+    4. all other moves by their history score.
+"""
+
+
+class MoveOrdering(object):
+    """Principal variation, killer move and history heuristic move ordering.
+
+    Parameters
+    ----------
+    num_killers : int (optional)
+        The number of killer moves remembered per ply.
+
+    Attributes
+    ----------
+    pv : list<(int, int)>
+        The principal variation of the last completed iteration.
+    """
+
+    def __init__(self, num_killers=2):
+        self.num_killers = num_killers
+        self.pv = []
+        self._pv_moves = {}
+        self._pv_table = []
+        self._killers = []
+        self._history = {}
+
+    def new_search(self):
+        """Prepare for the search of a new root position. The killer moves
+        are dropped and the history scores are aged.
+        """
+        self.pv = []
+        self._pv_moves = {}
+        self._killers = []
+        self._history = {key: value // 2
+                         for key, value in self._history.items() if value > 1}
+
+    def enter(self, ply):
+        """Reset the principal variation of a node at `ply` being entered."""
+        while len(self._pv_table) <= ply + 1:
+            self._pv_table.append([])
+        self._pv_table[ply] = []
+        self._pv_table[ply + 1] = []
+
+    def update_pv(self, ply, move):
+        """Record that `move` is the new best move of the node at `ply`. Its
+        principal variation is `move` followed by that of the child node.
+        """
+        self._pv_table[ply] = [move] + self._pv_table[ply + 1]
+
+    def hash_hit(self, ply, move):
+        """Record that the node at `ply` was resolved by a transposition
+        table entry with the best move `move`, so its principal variation
+        starts with that move instead of being empty.
+        """
+        self._pv_table[ply] = [move]
+
+    def end_iteration(self, game):
+        """Store the principal variation found by the search of the root
+        position `game` so that the next iteration searches it first.
+        """
+        self.pv = list(self._pv_table[0]) if self._pv_table else []
+        self._pv_moves = {}
+        board = game.copy()
+        for move in self.pv:
+            self._pv_moves[board.hash()] = move
+            board.apply_move(move)
+
+    def cutoff(self, move, ply, depth):
+        """Record that `move` caused a beta cutoff at `ply` with `depth`
+        plies left to search.
+        """
+        while len(self._killers) <= ply:
+            self._killers.append([])
+        killers = self._killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.num_killers:]
+        # The history is kept per side: even plies are moves of the player
+        # searching the root position, odd plies those of its opponent.
+        key = (ply % 2, move)
+        self._history[key] = self._history.get(key, 0) + depth * depth
+
+    def order(self, game, moves, ply, hash_move=None):
+        """Return `moves`, the legal moves of `game` at `ply`, sorted so that
+        the most promising move comes first.
+        """
+        pv_move = self._pv_moves.get(game.hash())
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        history = self._history
+        side = ply % 2
+
+        def priority(move):
+            if move == pv_move:
+                return -3, 0
+            if move == hash_move:
+                return -2, 0
+            if move in killers:
+                return -1, killers.index(move)
+            return 0, -history.get((side, move), 0)
+
+        return sorted(moves, key=priority)
@@ -0,0 +1,248 @@
+#!coding=utf-8
+"""
+A precomputed opening book for the alpha-beta search agents.
+
+The first moves of every game are searched from the same few positions, and
+in the first two plies a player that has not moved yet can move to any
+blank square, so `AlphaBetaPlayer` spends its whole time budget on them
+without getting deep. The book builder searches every position of the first
+plies once, with a long time limit and in parallel on all cores, and writes
+the best moves to a file:
+
+    python opening_book.py build book.bin --plies 3 --time 2000
+
+An `OpeningBook` memory-maps the file and looks positions up by their
+canonical key (see `isolation.Board.canonical_key()`), so one entry serves
+all symmetric positions. An agent created with `opening_book` plays the book
+move without searching whenever the position is in the book.
+
+The file starts with a header (magic, width, height, number of entries),
+followed by the entries sorted by key. Each entry holds the canonical key,
+the square index of the best move in the canonical orientation and the
+depth it was searched to.
+"""
+from __future__ import print_function
+
+import mmap
+import multiprocessing as mp
+import random
+import struct
+from argparse import ArgumentParser
+
+from game_agent import AlphaBetaPlayer, _time_millis, custom_score
+from isolation import Board
+from move_ordering import MoveOrdering
+from transposition import TranspositionTable
+
+MAGIC = b"ISOBOOK1"
+_HEADER = struct.Struct("<8sBBI")
+_ENTRY = struct.Struct("<QBB")
+
+
+class OpeningBook(object):
+    """A read-only opening book file.
+
+    Parameters
+    ----------
+    path : str
+        The book file written by `write_book()`.
+
+    Attributes
+    ----------
+    width, height : int
+        The size of the board the book was built for.
+    hits : int
+        The number of successful calls to `lookup()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        with open(path, "rb") as fp:
+            self._data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, self._count = _HEADER.unpack_from(
+            self._data, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not an opening book".format(path))
+
+    def __reduce__(self):
+        # Memory maps can't be pickled, worker processes map the file again
+        return OpeningBook, (self.path,)
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._data.close()
+
+    def _entry(self, i):
+        return _ENTRY.unpack_from(self._data, _HEADER.size + i * _ENTRY.size)
+
+    def probe(self, key):
+        """Return the (square index, depth) entry of the canonical `key`, or
+        None if it is not in the book."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry_key, square, depth = self._entry(mid)
+            if entry_key < key:
+                lo = mid + 1
+            elif entry_key > key:
+                hi = mid
+            else:
+                return square, depth
+        return None
+
+    def lookup(self, game):
+        """Return the book move of the active player of `game`, or None if
+        the position is not in the book."""
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        key, symmetry = game.canonical_key()
+        entry = self.probe(key)
+        if entry is None:
+            return None
+        square = entry[0]
+        move = game.from_canonical((square % self.height,
+                                    square // self.height), symmetry)
+        # Guard against a collision of the 64-bit keys (`move_is_legal()`
+        # only checks that the square is open)
+        if move not in game.get_legal_moves(shuffle=False):
+            return None
+        self.hits += 1
+        return move
+
+
+def write_book(path, width, height, entries):
+    """Write a book file of the (canonical key, square index, depth)
+    `entries`."""
+    entries = sorted(entries)
+    with open(path, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, width, height, len(entries)))
+        for entry in entries:
+            fp.write(_ENTRY.pack(*entry))
+
+
+def opening_positions(width=7, height=7, plies=2):
+    """Return the encodings (see `Board.encode()`) of one position of each
+    canonical key reachable in at most `plies` plies from the empty board."""
+    positions = {}
+    frontier = [Board(1, 2, width=width, height=height)]
+    for ply in range(plies + 1):
+        next_frontier = []
+        for game in frontier:
+            key, _ = game.canonical_key()
+            if key in positions:
+                continue
+            positions[key] = game.encode()
+            if ply < plies:
+                next_frontier.extend(game.forecast_move(move)
+                                     for move in game.get_legal_moves())
+        frontier = next_frontier
+    return list(positions.values())
+
+
+# The search settings of a book worker process, set by `_init_book_worker()`
+_book_settings = None
+
+
+def _init_book_worker(score_fn, time_limit):
+    global _book_settings
+    _book_settings = (score_fn, time_limit)
+    # Forked workers inherit the random state of the parent process
+    random.seed()
+
+
+def _search_position(encoding):
+    """Search the position `encoding` for the time limit of the worker and
+    return its book entry (canonical key, square index, depth), or None if
+    the player to move has no legal moves."""
+    score_fn, time_limit = _book_settings
+    player = AlphaBetaPlayer(score_fn=score_fn, timeout=0.,
+                             tt=TranspositionTable(),
+                             ordering=MoveOrdering())
+    opponent = object()
+    if encoding[2] % 2:
+        game = Board.decode(opponent, player, encoding)
+    else:
+        game = Board.decode(player, opponent, encoding)
+    deadline = _time_millis() + time_limit
+    player.time_left = lambda: deadline - _time_millis()
+    player._start_clock()
+    try:
+        depth, _, move = player._iterative_deepening(game)
+    finally:
+        player._stop_clock()
+    if move == (-1, -1):
+        return None
+    key, symmetry = game.canonical_key()
+    row, column = game.to_canonical(move, symmetry)
+    return key, row + column * game.height, min(depth, 255)
+
+
+def build_book(path, width=7, height=7, plies=2, time_limit=1000.,
+               score_fn=custom_score, num_workers=None, verbose=True):
+    """Search all canonical positions of the first `plies` plies and write
+    their best moves to the book file `path`.
+
+    Parameters
+    ----------
+    time_limit : float (optional)
+        The search time of each position in milliseconds.
+
+    num_workers : int (optional)
+        The number of worker processes (default: the number of CPU cores).
+
+    Returns
+    -------
+    num_entries : int
+        The number of positions in the book.
+    """
+    positions = opening_positions(width, height, plies)
+    if num_workers is None:
+        num_workers = mp.cpu_count()
+    if verbose:
+        print("Searching {} positions for {:g} ms each with {} workers"
+              .format(len(positions), time_limit, num_workers))
+    if num_workers == 1:
+        _init_book_worker(score_fn, time_limit)
+        entries = [_search_position(position) for position in positions]
+    else:
+        pool = mp.Pool(num_workers, initializer=_init_book_worker,
+                       initargs=(score_fn, time_limit))
+        try:
+            entries = list(pool.imap_unordered(_search_position, positions))
+        finally:
+            pool.terminate()
+            pool.join()
+    entries = [entry for entry in entries if entry is not None]
+    write_book(path, width, height, entries)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Build an opening book.")
+    subparsers = parser.add_subparsers(dest="command")
+    build = subparsers.add_parser(
+        "build", help="Search the opening positions and write a book file.")
+    build.add_argument("path", type=str, help="The book file to write.")
+    build.add_argument("--width", type=int, default=7,
+                       help="The board width (default: 7).")
+    build.add_argument("--height", type=int, default=7,
+                       help="The board height (default: 7).")
+    build.add_argument("--plies", type=int, default=2,
+                       help="The number of plies covered (default: 2).")
+    build.add_argument("--time", type=float, default=1000.,
+                       help="The search time per position in milliseconds "
+                            "(default: 1000).")
+    build.add_argument("--workers", type=int, default=None,
+                       help="The number of worker processes (default: the "
+                            "number of CPU cores).")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        print("Wrote {} positions to {}".format(
+            build_book(args.path, args.width, args.height, args.plies,
+                       args.time, num_workers=args.workers), args.path))
+    else:
+        parser.print_help()
@@ -0,0 +1,820 @@
+#!coding=utf-8
+"""
+Parallel versions of the alpha-beta search agent.
+
+`LazySMPPlayer` runs the same iterative deepening search in several worker
+processes that share one `SharedTranspositionTable`. The workers start at
+staggered depths and search the moves in different orders, so the entries
+they store in the shared table let the other searches skip the subtrees
+they have already solved.
+
+`RootSplitPool` is a simpler alternative used by `AlphaBetaPlayer` and
+`MinimaxPlayer` when they are created with `root_workers`: the moves of the
+root position are searched in a pool of worker processes, one task per move.
+
+`ParallelMCTSPlayer` runs the playouts of `mcts.MCTSPlayer` in several
+processes, either on independent trees whose root visit counts are added up
+at the end of the search (root parallelization), or all on one
+`SharedSearchTree` (tree parallelization with virtual losses).
+"""
+import multiprocessing as mp
+import struct
+from math import isinf
+from time import sleep
+
+from game_agent import (PLAYER_2_SALT, AlphaBetaPlayer, SearchTimeout,
+                        _time_millis, custom_score)
+from isolation.tables import knight_tables
+from mcts import MCTSPlayer, SearchTree, _targets, root_state
+from move_ordering import MoveOrdering
+from transposition import TranspositionTable, TTEntry
+
+_DOUBLE = struct.Struct("<d")
+_UINT64 = struct.Struct("<Q")
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """A transposition table in shared memory that can be used by several
+    processes at the same time without locks.
+
+    Each slot stores a check word (the key XOR the packed data and the score
+    bits) next to the data, so a slot that has been torn by a concurrent
+    write of another process fails the key check and is treated as a miss.
+
+    Parameters
+    ----------
+    max_bytes : int (optional)
+        The memory used by the table (24 bytes per slot).
+    """
+
+    ENTRY_BYTES = 24
+
+    def __init__(self, max_bytes=16 * 2 ** 20, _arrays=None):
+        self.num_buckets = max(1, max_bytes // (2 * self.ENTRY_BYTES))
+        self.probes = 0
+        self.hits = 0
+        if _arrays is None:
+            _arrays = (mp.RawArray("Q", 2 * self.num_buckets),
+                       mp.RawArray("Q", 2 * self.num_buckets),
+                       mp.RawArray("d", 2 * self.num_buckets))
+        self._checks, self._data, self._scores = _arrays
+
+    def __len__(self):
+        return sum(1 for check in self._checks if check)
+
+    def __reduce__(self):
+        return (SharedTranspositionTable,
+                (self.num_buckets * 2 * self.ENTRY_BYTES,
+                 (self._checks, self._data, self._scores)))
+
+    def clear(self):
+        """Remove all entries from the table."""
+        for i in range(2 * self.num_buckets):
+            self._checks[i] = 0
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """Return the stored `TTEntry` of `key`, or None if there is none."""
+        self.probes += 1
+        slot = 2 * (key % self.num_buckets)
+        for i in (slot, slot + 1):
+            check = self._checks[i]
+            data = self._data[i]
+            score = self._scores[i]
+            if check and check ^ data ^ _score_bits(score) == key:
+                self.hits += 1
+                return _unpack(key, data, score)
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        """Store the result of searching the position `key` (see
+        `TranspositionTable.store()`).
+        """
+        slot = 2 * (key % self.num_buckets)
+        stored = self._data[slot]
+        stored_key = self._checks[slot] ^ stored ^ _score_bits(self._scores[slot])
+        if (not self._checks[slot] or stored_key == key or
+                depth >= stored & 0xff):
+            i = slot
+        else:
+            i = slot + 1
+        data = _pack(depth, flag, move)
+        self._data[i] = data
+        self._scores[i] = score
+        self._checks[i] = key ^ data ^ _score_bits(score)
+
+
+def _score_bits(score):
+    return _UINT64.unpack(_DOUBLE.pack(score))[0]
+
+
+def _pack(depth, flag, move):
+    """Pack the depth, bound type and move of an entry into one integer (the
+    depth is capped to its 8 bits)."""
+    return min(depth, 255) | flag << 8 | (move[0] + 1) << 10 | (move[1] + 1) << 20
+
+
+def _unpack(key, data, score):
+    return TTEntry(key, data & 0xff, score, data >> 8 & 0x3,
+                   ((data >> 10 & 0x3ff) - 1, (data >> 20 & 0x3ff) - 1))
+
+
+class _Opponent(object):
+    """Placeholder for the opponent on the boards searched by the workers."""
+    pass
+
+
+# Layout of the per-worker result slots of `LazySMPPlayer`. The search id is
+# written twice, before and after the result, so that the main process can
+# detect a slot it read in the middle of an update.
+_RESULT_FIELDS = 5
+_RESULT_ID, _RESULT_DEPTH, _RESULT_ROW, _RESULT_COL, _RESULT_ID_END = range(5)
+
+
+def _write_result(results, worker_id, search_id, depth, move):
+    """Publish the result of a completed iteration in the slot of a worker."""
+    base = worker_id * _RESULT_FIELDS
+    results[base + _RESULT_ID_END] = 0
+    results[base + _RESULT_ID] = 0
+    results[base + _RESULT_DEPTH] = depth
+    results[base + _RESULT_ROW] = move[0]
+    results[base + _RESULT_COL] = move[1]
+    results[base + _RESULT_ID] = search_id
+    results[base + _RESULT_ID_END] = search_id
+
+
+def _read_result(results, worker_id, search_id):
+    """Return (depth, move) of the last iteration a worker completed in the
+    search `search_id`, or None if there is no consistent result."""
+    base = worker_id * _RESULT_FIELDS
+    if results[base + _RESULT_ID_END] != search_id:
+        return None
+    depth = results[base + _RESULT_DEPTH]
+    move = (results[base + _RESULT_ROW], results[base + _RESULT_COL])
+    if results[base + _RESULT_ID] != search_id:
+        return None
+    return depth, move
+
+
+def _lazy_smp_worker(worker_id, task_queue, results, generation,
+                     player_kwargs):
+    """Worker process of `LazySMPPlayer`.
+
+    Each task is a tuple (search id, board class, board encoding, deadline).
+    The worker runs iterative deepening on the board until the deadline (in
+    `timeit.default_timer()` milliseconds) or until the main process moves
+    on to another search id, and publishes the depth and best move of every
+    completed iteration in its slot of the shared `results` array.
+    """
+    player = AlphaBetaPlayer(**player_kwargs)
+    # Odd workers keep the random move order of `Board.get_legal_moves()`
+    # so that they search different subtrees first.
+    if worker_id % 2:
+        player.ordering = None
+    opponent = _Opponent()
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        search_id, board_cls, encoding, deadline = task
+        if encoding[2] % 2:
+            game = board_cls.decode(opponent, player, encoding)
+        else:
+            game = board_cls.decode(player, opponent, encoding)
+
+        def time_left():
+            if generation.value != search_id:
+                return float("-inf")
+            return deadline - _time_millis()
+
+        player.time_left = time_left
+        if player.ordering is not None:
+            player.ordering.new_search()
+        # Stagger the start depths of the workers
+        depth = worker_id % 2
+        max_depth = len(game.get_blank_spaces())
+        score = None
+        try:
+            while player.time_left() > 0 and depth < max_depth:
+                score, move = player._aspiration_search(game, depth + 1, score)
+                depth += 1
+                _write_result(results, worker_id, search_id, depth, move)
+                if isinf(score):
+                    # The game is solved, deeper searches can't change it
+                    break
+        except SearchTimeout:
+            pass
+
+
+class LazySMPPlayer(AlphaBetaPlayer):
+    """Game-playing agent that runs iterative deepening alpha-beta search in
+    several processes at once, sharing a transposition table between them.
+
+    The worker processes are started once when the agent is created. On each
+    move the agent searches in its own process as well, and returns the best
+    move of the deepest iteration completed by any of the searches when its
+    own search times out.
+
+    Parameters
+    ----------
+    num_workers : int (optional)
+        The number of worker processes. Defaults to the number of CPUs minus
+        one (for the search in the main process).
+
+    tt_bytes : int (optional)
+        The size of the shared transposition table.
+
+    All other parameters are passed to `AlphaBetaPlayer`; `tt` is always the
+    shared table.
+
+    Notes
+    -----
+    The worker processes live until `close()` is called, the agent is used
+    as a context manager (``with LazySMPPlayer() as player: ...``) and the
+    block exits, or the agent is garbage collected. They are daemon
+    processes, so they never outlive the Python interpreter either.
+    """
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 num_workers=None, tt_bytes=16 * 2 ** 20, **kwargs):
+        if kwargs.get("ordering") is None:
+            kwargs["ordering"] = MoveOrdering()
+        kwargs["tt"] = SharedTranspositionTable(tt_bytes)
+        super(LazySMPPlayer, self).__init__(
+            search_depth=search_depth, score_fn=score_fn, timeout=timeout,
+            **kwargs)
+        if num_workers is None:
+            num_workers = max(1, mp.cpu_count() - 1)
+
+        # The statistics only cover the search of the main process
+        player_kwargs = dict(kwargs, search_depth=search_depth,
+                             score_fn=score_fn, timeout=0., stats=None)
+        self._search_id = 0
+        self._generation = mp.RawValue("l", 0)
+        # Slot 0 is unused, the main process is search 0
+        self._results = mp.RawArray("l", (num_workers + 1) * _RESULT_FIELDS)
+        self._tasks = []
+        self._workers = []
+        for worker_id in range(1, num_workers + 1):
+            tasks = mp.Queue()
+            worker = mp.Process(
+                target=_lazy_smp_worker,
+                args=(worker_id, tasks, self._results, self._generation,
+                      player_kwargs))
+            worker.daemon = True
+            worker.start()
+            self._tasks.append(tasks)
+            self._workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes. The agent can't search afterwards."""
+        workers = getattr(self, "_workers", [])
+        if not workers:
+            return
+        self._generation.value = 0
+        for tasks in self._tasks:
+            tasks.put(None)
+        for worker in workers:
+            worker.join()
+        self._tasks = []
+        self._workers = []
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        move: (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.time_left = time_left
+        self._search_id += 1
+        self._generation.value = self._search_id
+        deadline = _time_millis() + time_left() - self.TIMER_THRESHOLD
+        task = (self._search_id, type(game), game.encode(), deadline)
+        for tasks in self._tasks:
+            tasks.put(task)
+
+        self._start_clock()
+        try:
+            depth, _, move = self._iterative_deepening(game)
+        finally:
+            self._stop_clock()
+
+        # Stop the workers and pick the deepest result of this search
+        self._generation.value = 0
+        for worker_id in range(1, len(self._workers) + 1):
+            result = _read_result(self._results, worker_id, self._search_id)
+            if result is not None and result[0] > depth:
+                depth, move = result
+        return move
+
+
+# The agent of a `RootSplitPool` worker process, created once by
+# `_init_root_worker()` when the process starts.
+_root_player = None
+
+
+def _init_root_worker(player_cls, player_kwargs):
+    global _root_player
+    _root_player = player_cls(**player_kwargs)
+
+
+def _search_root_move(task):
+    """Search one root move in a `RootSplitPool` worker.
+
+    The task is a tuple (board class, board encoding, move, depth, window,
+    deadline). The child position after `move` is searched to `depth - 1`
+    with the alpha-beta `window`, or with minimax if the window is None.
+    Returns (move, score), with a score of None if the search timed out.
+    """
+    board_cls, encoding, move, depth, window, deadline = task
+    player = _root_player
+    if encoding[2] % 2:
+        game = board_cls.decode(_Opponent(), player, encoding)
+        player._tt_salt = PLAYER_2_SALT
+    else:
+        game = board_cls.decode(player, _Opponent(), encoding)
+        player._tt_salt = 0
+    player.time_left = lambda: deadline - _time_millis()
+    game.apply_move(move)
+    player._start_clock()
+    try:
+        if window is None:
+            return move, player.min_value(game, depth - 1)
+        score, _ = player.min_value(game, depth - 1, window[0], window[1], 1)
+        return move, score
+    except SearchTimeout:
+        return move, None
+    finally:
+        player._stop_clock()
+
+
+class RootSplitPool(object):
+    """A pool of worker processes that search the moves of a root position in
+    parallel.
+
+    The workers are started once, when the pool is created, and each of them
+    builds its own agent from `player_cls` and `player_kwargs`. The boards
+    are sent to them as `Board.encode()` tuples, so the player objects of the
+    game are never pickled.
+
+    Parameters
+    ----------
+    player_cls : class
+        `AlphaBetaPlayer` or `MinimaxPlayer`.
+
+    player_kwargs : dict
+        The arguments of the agents of the workers. They must be picklable,
+        and any transposition table or move ordering is copied to each worker.
+
+    num_workers : int (optional)
+        The number of worker processes. Defaults to the number of CPUs.
+
+    Notes
+    -----
+    The workers live until `close()` is called, the pool is used as a
+    context manager and the block exits, or the pool is garbage collected.
+    """
+
+    def __init__(self, player_cls, player_kwargs, num_workers=None):
+        if num_workers is None:
+            num_workers = mp.cpu_count()
+        self.num_workers = num_workers
+        self._pool = mp.Pool(num_workers, initializer=_init_root_worker,
+                             initargs=(player_cls, player_kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes."""
+        pool = getattr(self, "_pool", None)
+        if pool is None:
+            return
+        pool.terminate()
+        pool.join()
+        self._pool = None
+
+    def search(self, game, moves, depth, window, time_left, threshold):
+        """Search each of `moves` from the root position `game` in the
+        workers and yield (move, score) pairs in the order the searches
+        finish.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The root position. The agent of the workers plays the active
+            player.
+
+        moves : list<(int, int)>
+            The root moves to search.
+
+        depth : int
+            The search depth, counting the root move.
+
+        window : (float, float) or None
+            The alpha-beta window of the child positions, or None for
+            minimax.
+
+        time_left : callable
+            The timer of the search in the main process.
+
+        threshold : float
+            The time (in milliseconds) before the timer expires at which
+            the search is aborted.
+
+        Raises
+        ------
+        SearchTimeout
+            When the timer runs out before all the moves are searched.
+        """
+        deadline = _time_millis() + time_left() - threshold
+        encoding = game.encode()
+        tasks = [(type(game), encoding, move, depth, window, deadline)
+                 for move in moves]
+        results = self._pool.imap_unordered(_search_root_move, tasks)
+        for _ in tasks:
+            remaining = deadline - _time_millis()
+            if remaining <= 0:
+                raise SearchTimeout()
+            try:
+                move, score = results.next(remaining / 1000.)
+            except mp.TimeoutError:
+                raise SearchTimeout()
+            if score is None:
+                raise SearchTimeout()
+            yield move, score
+
+
+# The `first_child` of a node of a `SharedSearchTree` while one process adds
+# its children
+_EXPANDING = -2
+
+
+class SharedSearchTree(SearchTree):
+    """A `mcts.SearchTree` in shared memory that several processes search at
+    the same time.
+
+    The nodes are stored in fixed-size arrays. Only the allocation of the
+    children of a node takes a lock: the statistics of the nodes are
+    updated without one, so a few concurrent updates are lost, which UCT
+    tolerates. The root and its position are not shared, every process sets
+    them before searching.
+
+    Parameters
+    ----------
+    capacity : int (optional)
+        The maximum number of nodes (48 bytes each). A leaf whose children
+        don't fit any more is scored by rollouts without being expanded.
+    """
+
+    def __init__(self, capacity=2 ** 20, _arrays=None):
+        self.capacity = capacity
+        if _arrays is None:
+            _arrays = (tuple(mp.RawArray("l", capacity) for _ in range(6)) +
+                       (mp.RawValue("l", 1), mp.Lock()))
+        (self.moves, self.visits, self.wins, self.first_child,
+         self.num_children, self.num_tried, self._size, self._lock) = _arrays
+        self._arrays = _arrays
+        self.tables = None
+        self.state = None
+        self.root = 0
+
+    def __reduce__(self):
+        return SharedSearchTree, (self.capacity, self._arrays)
+
+    def __len__(self):
+        return self._size.value
+
+    def reset(self, tables, state):
+        """Drop all nodes and make `state` the root position. No other
+        process may search the tree at the same time."""
+        self.tables = tables
+        self.state = state
+        self.root = 0
+        self._size.value = 1
+        self.visits[0] = self.wins[0] = self.num_tried[0] = 0
+        self.first_child[0] = -1
+
+    def _expand(self, node, blocked, loc):
+        moves = list(self.tables.iter_bits(
+            _targets(self.tables, blocked, loc)))
+        with self._lock:
+            if self.first_child[node] != -1:
+                # Expanded by another process (or being expanded, then the
+                # node is scored as a leaf)
+                return self.first_child[node]
+            first = self._size.value
+            if first + len(moves) > self.capacity:
+                return -1
+            self._size.value = first + len(moves)
+            self.first_child[node] = _EXPANDING
+        for child, square in enumerate(moves, first):
+            self.moves[child] = square
+            self.visits[child] = self.wins[child] = 0
+            self.first_child[child] = -1
+            self.num_children[child] = self.num_tried[child] = 0
+        self.num_children[node] = len(moves)
+        # Publish the children last, other processes may be reading them
+        self.first_child[node] = first
+        return first
+
+
+# The largest board supported by the root visit slots of
+# `ParallelMCTSPlayer`. Each slot holds the search id, the number of
+# playouts, the visits of every square and the search id again, so that the
+# main process can detect a slot it read in the middle of an update (see
+# `_write_result()`).
+_MAX_SQUARES = 256
+_VISITS_FIELDS = _MAX_SQUARES + 3
+
+
+def _write_visits(results, worker_id, search_id, playouts, visits):
+    """Publish the playouts and root visits of a worker.
+
+    Nothing is published while the root has no children, since the visits
+    of the previous search would then be left in the slot under the new
+    search id. Otherwise all the moves of the root are written.
+    """
+    if not visits:
+        return
+    base = worker_id * _VISITS_FIELDS
+    results[base + _VISITS_FIELDS - 1] = 0
+    results[base] = 0
+    results[base + 1] = playouts
+    for square, count in visits.items():
+        results[base + 2 + square] = count
+    results[base] = search_id
+    results[base + _VISITS_FIELDS - 1] = search_id
+
+
+def _read_visits(results, worker_id, search_id, squares):
+    """Return (playouts, {square: visits}) of the root moves `squares`
+    published by a worker in the search `search_id`, or None if there is
+    no consistent result."""
+    base = worker_id * _VISITS_FIELDS
+    if results[base + _VISITS_FIELDS - 1] != search_id:
+        return None
+    playouts = results[base + 1]
+    visits = {square: results[base + 2 + square] for square in squares}
+    if results[base] != search_id:
+        return None
+    return playouts, visits
+
+
+def _mcts_worker(worker_id, task_queue, results, generation, idle,
+                 player_kwargs, shared_tree):
+    """Worker process of `ParallelMCTSPlayer`.
+
+    Each task is a tuple (search id, board width, board height, root node,
+    root position, square of the last move played, deadline). The worker
+    runs playouts until the deadline (in `timeit.default_timer()`
+    milliseconds) or until the main process moves on to another search id.
+    On its own tree (without `shared_tree`) it publishes its root visits in
+    its slot of `results` every 64 playouts and at the end. It writes the
+    search id to its entry of `idle` when it stops.
+    """
+    player = MCTSPlayer(**player_kwargs)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        search_id, width, height, root, state, played, deadline = task
+        tables = knight_tables(width, height)
+        if shared_tree is not None:
+            tree = shared_tree
+            tree.tables, tree.root, tree.state = tables, root, state
+        else:
+            if player.tree is not None and played is not None:
+                # The move chosen by the main process at the last search
+                player.tree.advance(played)
+            tree = player._set_root(tables, state)
+        player.time_left = lambda: deadline - _time_millis()
+        playouts = 0
+        player._check_interval = 1
+        player._start_clock()
+        try:
+            while generation.value == search_id:
+                tree.playout(player.exploration)
+                playouts += 1
+                player._countdown -= 1
+                if player._countdown <= 0:
+                    player._check_clock()
+                if shared_tree is None and not playouts % 64:
+                    _write_visits(results, worker_id, search_id, playouts,
+                                  tree.root_visits())
+        except SearchTimeout:
+            pass
+        finally:
+            player._stop_clock()
+        if shared_tree is None:
+            _write_visits(results, worker_id, search_id, playouts,
+                          tree.root_visits())
+        idle[worker_id] = search_id
+
+
+class ParallelMCTSPlayer(MCTSPlayer):
+    """Game-playing agent that runs the Monte Carlo tree search of
+    `mcts.MCTSPlayer` in several processes at once.
+
+    The worker processes are started once when the agent is created, and
+    the agent runs playouts in its own process as well. By default every
+    process grows its own tree (root parallelization) and the move played
+    is the one with the most visits summed over all trees. With
+    `shared_tree` all processes search one `SharedSearchTree` instead
+    (tree parallelization), where the virtual losses of the playouts in
+    progress make the processes explore different paths.
+
+    Parameters
+    ----------
+    num_workers : int (optional)
+        The number of worker processes. Defaults to the number of CPUs minus
+        one (for the search in the main process).
+
+    shared_tree : bool (optional)
+        If True, search one tree in shared memory instead of one tree per
+        process.
+
+    max_nodes : int (optional)
+        The number of nodes of the shared tree. A shared tree more than half
+        full is not reused for the next move.
+
+    All other parameters are passed to `MCTSPlayer`. The playouts counted
+    in `stats` are the playouts of all processes.
+
+    Notes
+    -----
+    The worker processes live until `close()` is called, the agent is used
+    as a context manager and the block exits, or the agent is garbage
+    collected, like those of `LazySMPPlayer`.
+    """
+
+    def __init__(self, timeout=10., num_workers=None, shared_tree=False,
+                 max_nodes=2 ** 20, **kwargs):
+        super(ParallelMCTSPlayer, self).__init__(
+            timeout=timeout, max_nodes=max_nodes, **kwargs)
+        if num_workers is None:
+            num_workers = max(1, mp.cpu_count() - 1)
+        self.shared_tree = shared_tree
+        if shared_tree:
+            self.tree = SharedSearchTree(max_nodes)
+
+        player_kwargs = dict(kwargs, timeout=0., max_nodes=max_nodes,
+                             stats=None)
+        self._search_id = 0
+        self._played = None
+        self._generation = mp.RawValue("l", 0)
+        self._idle = mp.RawArray("l", num_workers + 1)
+        # Slot 0 is unused, the main process searches its own tree
+        self._results = mp.RawArray("l", (num_workers + 1) * _VISITS_FIELDS)
+        self._tasks = []
+        self._workers = []
+        for worker_id in range(1, num_workers + 1):
+            tasks = mp.Queue()
+            worker = mp.Process(
+                target=_mcts_worker,
+                args=(worker_id, tasks, self._results, self._generation,
+                      self._idle, player_kwargs,
+                      self.tree if shared_tree else None))
+            worker.daemon = True
+            worker.start()
+            self._tasks.append(tasks)
+            self._workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes. The agent can't search afterwards."""
+        workers = getattr(self, "_workers", [])
+        if not workers:
+            return
+        self._generation.value = 0
+        for tasks in self._tasks:
+            tasks.put(None)
+        for worker in workers:
+            worker.join()
+        self._tasks = []
+        self._workers = []
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        move: (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.time_left = time_left
+        start = _time_millis()
+        tables = knight_tables(game.width, game.height)
+        if tables.size > _MAX_SQUARES:
+            raise ValueError("Boards of more than {} squares are not "
+                             "supported".format(_MAX_SQUARES))
+        tree = self._set_root(tables, root_state(game.encode()))
+        reused = root_visits = tree.visits[tree.root]
+        blocked, loc, _ = tree.state
+        if not _targets(tables, blocked, loc):
+            return (-1, -1)
+
+        self._search_id += 1
+        self._generation.value = self._search_id
+        # The workers stop a little earlier, so that their last visits are
+        # published when this process reads them
+        deadline = _time_millis() + time_left() - 1.5 * self.TIMER_THRESHOLD
+        task = (self._search_id, game.width, game.height, tree.root,
+                tree.state, self._played, deadline)
+        for tasks in self._tasks:
+            tasks.put(task)
+        playouts = self._search(tree)
+        # Stop the workers
+        self._generation.value = 0
+
+        visits = tree.root_visits()
+        if self.shared_tree:
+            playouts = tree.visits[tree.root] - root_visits
+        else:
+            for worker_id in range(1, len(self._workers) + 1):
+                result = _read_visits(self._results, worker_id,
+                                      self._search_id, visits)
+                if result is not None:
+                    playouts += result[0]
+                    for square, count in result[1].items():
+                        visits[square] += count
+        if self.stats is not None:
+            self.stats.add_move(playouts, _time_millis() - start, reused)
+
+        self._played = max(visits, key=visits.get)
+        # Keep the subtree of the move for the next search
+        tree.advance(self._played)
+        return tables.coords[self._played]
+
+    def _set_root(self, tables, state):
+        if not self.shared_tree:
+            return super(ParallelMCTSPlayer, self)._set_root(tables, state)
+        # The workers must have stopped searching the tree before it is
+        # changed. They stop after their current playout, so only a dead
+        # (or starved) worker can make this wait long, and then it is cut
+        # short to leave time for the search.
+        wait_until = (_time_millis() + self.time_left() -
+                      2 * self.TIMER_THRESHOLD)
+        for worker_id, worker in enumerate(self._workers, 1):
+            while (self._idle[worker_id] != self._search_id and
+                   _time_millis() < wait_until and worker.is_alive()):
+                sleep(0)
+        tree = self.tree
+        if not (self.reuse_tree and len(tree) <= self.max_nodes // 2 and
+                tree.tables is tables and state[2] is not None and
+                tree.advance(state[2]) and tree.state == state):
+            tree.reset(tables, state)
+        return tree
@@ -0,0 +1,217 @@
+#!coding=utf-8
+"""
+Move generation correctness tests and benchmarks for the Isolation boards.
+
+`perft()` counts the positions reachable in exactly `depth` plies from a
+position. The counts of a set of fixed positions on several board sizes are
+stored in `POSITIONS`, so any change to the move generation, the make/unmake
+code or the board copies that changes the game tree is caught by
+`verify()`. `benchmark()` reports the calls per second of the methods used
+by the search on the positions of the perft trees.
+
+    python perft.py                # verify and benchmark both engines
+    python perft.py --board bitboard --max-depth 3
+"""
+from __future__ import print_function
+
+import timeit
+from argparse import ArgumentParser
+from collections import namedtuple
+
+from isolation import Board, BitBoard
+
+Position = namedtuple("Position", ["name", "width", "height", "moves",
+                                   "counts"])
+
+# `counts[d - 1]` is the number of positions `d` plies after `moves`
+POSITIONS = [
+    Position("7x7 empty", 7, 7, [],
+             [49, 2352, 11280, 52672, 232416]),
+    Position("7x7 opening", 7, 7, [(4, 2), (1, 4)],
+             [8, 48, 195, 795, 2857]),
+    Position("7x7 middle game", 7, 7,
+             [(6, 4), (5, 2), (5, 6), (4, 4), (3, 5), (6, 3), (1, 6), (5, 1),
+              (2, 4), (3, 2)],
+             [6, 30, 96, 334, 1093]),
+    Position("7x7 end game", 7, 7,
+             [(1, 0), (6, 5), (2, 2), (4, 6), (3, 4), (5, 4), (1, 3), (6, 6),
+              (0, 5), (4, 5), (2, 4), (3, 3), (1, 2), (1, 4), (3, 1), (0, 2),
+              (5, 2), (2, 3), (4, 4), (1, 1)],
+             [5, 14, 35, 70, 119]),
+    Position("5x5", 5, 5, [(3, 3), (4, 2), (4, 1), (2, 3)],
+             [2, 10, 50, 100, 198]),
+    Position("6x4", 6, 4, [(2, 4), (1, 1), (3, 2), (0, 3), (1, 3), (1, 5)],
+             [5, 9, 15, 36, 86]),
+    Position("4x6", 4, 6, [(5, 0), (4, 3), (3, 1)],
+             [2, 8, 27, 64, 155]),
+]
+
+BENCHMARKS = ["get_legal_moves", "forecast_move", "apply_move", "utility",
+              "hash"]
+
+
+def setup(position, board_cls=Board):
+    """Return a board of type `board_cls` in the state of `position`."""
+    game = board_cls("Player1", "Player2", width=position.width,
+                     height=position.height)
+    for move in position.moves:
+        game.apply_move(move)
+    return game
+
+
+def perft(game, depth, make_unmake=True):
+    """Return the number of positions exactly `depth` plies after `game`.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The root position. In make/unmake mode it is modified during the
+        count and restored afterwards.
+
+    depth : int
+        The number of plies.
+
+    make_unmake : bool (optional)
+        If True, the moves are applied and undone on `game` itself with
+        `Board.apply_move()`/`Board.undo_move()`, otherwise the children are
+        created with `Board.forecast_move()`.
+    """
+    if depth == 0:
+        return 1
+    moves = game.get_legal_moves(shuffle=False)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        if make_unmake:
+            undo = game.apply_move(move)
+            nodes += perft(game, depth - 1, make_unmake)
+            game.undo_move(undo)
+        else:
+            nodes += perft(game.forecast_move(move), depth - 1, make_unmake)
+    return nodes
+
+
+def verify(board_cls=Board, max_depth=4, make_unmake=True):
+    """Compare the perft counts of `board_cls` to those of `POSITIONS` up to
+    `max_depth` and return a list of (position name, depth, count, expected)
+    tuples of the counts that don't match.
+    """
+    failures = []
+    for position in POSITIONS:
+        game = setup(position, board_cls)
+        key = game.hash()
+        for depth, expected in enumerate(position.counts[:max_depth], 1):
+            count = perft(game, depth, make_unmake)
+            if count != expected:
+                failures.append((position.name, depth, count, expected))
+        if game.hash() != key:
+            failures.append((position.name, "hash", game.hash(), key))
+    return failures
+
+
+def _tree_positions(board_cls, depth):
+    """Return copies of all positions up to `depth` plies after each of the
+    fixed positions."""
+    positions = []
+
+    def collect(game, depth):
+        positions.append(game)
+        if depth:
+            for move in game.get_legal_moves(shuffle=False):
+                collect(game.forecast_move(move), depth - 1)
+
+    for position in POSITIONS:
+        collect(setup(position, board_cls), depth)
+    return positions
+
+
+def benchmark(board_cls=Board, depth=2, repeat=3):
+    """Return a dict of the calls per second of each method in `BENCHMARKS`
+    on the positions up to `depth` plies after the fixed positions (the best
+    of `repeat` runs). `apply_move` is timed together with `undo_move`.
+    """
+    games = [game for game in _tree_positions(board_cls, depth)
+             if game.get_legal_moves()]
+    first_moves = [game.get_legal_moves(shuffle=False)[0] for game in games]
+    pairs = list(zip(games, first_moves))
+
+    def get_legal_moves():
+        for game in games:
+            game.get_legal_moves()
+
+    def forecast_move():
+        for game, move in pairs:
+            game.forecast_move(move)
+
+    def apply_move():
+        for game, move in pairs:
+            game.undo_move(game.apply_move(move))
+
+    def utility():
+        for game in games:
+            game.utility("Player1")
+
+    def hash():
+        for game in games:
+            game.hash()
+
+    functions = {"get_legal_moves": get_legal_moves,
+                 "forecast_move": forecast_move,
+                 "apply_move": apply_move,
+                 "utility": utility,
+                 "hash": hash}
+    rates = {}
+    for name in BENCHMARKS:
+        seconds = min(timeit.repeat(functions[name], number=1, repeat=repeat))
+        rates[name] = len(games) / seconds
+    return rates
+
+
+def main(board_classes, max_depth=4, run_benchmark=True):
+    ok = True
+    for board_cls in board_classes:
+        print("{}:".format(board_cls.__name__))
+        for make_unmake in (True, False):
+            start = timeit.default_timer()
+            failures = verify(board_cls, max_depth, make_unmake)
+            nodes = sum(sum(p.counts[:max_depth]) for p in POSITIONS)
+            seconds = timeit.default_timer() - start
+            print("  perft {:<14} {:>9} nodes {:>10.0f} nodes/s  {}".format(
+                "make/unmake" if make_unmake else "forecast_move", nodes,
+                nodes / seconds, "FAILED" if failures else "ok"))
+            for name, depth, count, expected in failures:
+                ok = False
+                print("    {} depth {}: {} (expected {})".format(
+                    name, depth, count, expected))
+        if run_benchmark:
+            for name, rate in sorted(benchmark(board_cls).items(),
+                                     key=lambda item: BENCHMARKS.index(item[0])):
+                print("  {:<20} {:>10.0f} calls/s".format(name, rate))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--board",
+        choices=["board", "bitboard", "both"],
+        default="both",
+        help="The board engine to test (default: both)."
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=4,
+        help="The maximum perft depth to verify (default: 4)."
+    )
+    parser.add_argument(
+        "--no-benchmark",
+        action="store_true",
+        help="Only verify the perft counts."
+    )
+    args = parser.parse_args()
+    classes = {"board": [Board], "bitboard": [BitBoard],
+               "both": [Board, BitBoard]}[args.board]
+    if not main(classes, args.max_depth, not args.no_benchmark):
+        raise SystemExit(1)
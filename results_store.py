@@ -0,0 +1,184 @@
+#!coding=utf-8
+"""
+An append-only store of parameter evaluations for `grid_search.py`.
+
+Every evaluation is appended to a JSON Lines file as soon as it completes, so
+an interrupted search can be restarted and skip the points it has already
+evaluated, and the stores of searches run on several machines can be merged:
+
+    python results_store.py merge all.jsonl node1.jsonl node2.jsonl
+"""
+from __future__ import print_function, absolute_import
+
+import json
+import random
+from argparse import ArgumentParser
+from os.path import isfile
+
+
+def _plain(value):
+    """Convert NumPy scalars to the Python numbers used in the keys."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _key(record):
+    if "seed" in record:
+        return ("seed", record["label"])
+    return (record["score_fn"],
+            tuple(sorted(record["params"].items())),
+            tuple(record["opponents"]),
+            record["num_matches"],
+            record.get("stage", ""))
+
+
+class ResultsStore(object):
+    """
+    The evaluations of score function parameters stored in a JSON Lines file.
+
+    An evaluation is identified by the name of the score function, the
+    parameters, the names of the opponents, the number of matches against
+    each opponent and an optional stage label (e.g., the round of a
+    successive halving search, whose rounds play additional matches of the
+    same points).
+
+    The store also keeps the random seeds of the searches that sample their
+    points (see `seed()`), so that a restarted search samples the same points
+    again and finds their evaluations.
+
+    Parameters
+    ----------
+    path : str
+        The file to read and append to. It is created if it doesn't exist.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._records = {}
+        self._seeds = {}
+        if isfile(path):
+            for record in read_records(path):
+                if "seed" in record:
+                    self._seeds.setdefault(record["label"], record["seed"])
+                else:
+                    self._records[_key(record)] = record
+            with open(path, "rb+") as fp:
+                fp.seek(0, 2)
+                if fp.tell():
+                    fp.seek(-1, 2)
+                    if fp.read(1) != b"\n":
+                        # Terminate a truncated last line, so that the
+                        # next record starts on a line of its own
+                        fp.write(b"\n")
+
+    def __len__(self):
+        return len(self._records)
+
+    def _record(self, score_fn, params, opponents, num_matches, stage):
+        return {"score_fn": score_fn,
+                "params": {name: _plain(value)
+                           for name, value in params.items()},
+                "opponents": list(opponents),
+                "num_matches": num_matches,
+                "stage": stage}
+
+    def get(self, score_fn, params, opponents, num_matches, stage=""):
+        """
+        Return the number of wins of an evaluation, or None if it is not in
+        the store.
+
+        Parameters
+        ----------
+        score_fn : str
+            The name of the score function.
+        params : dict
+            The parameters of the score function.
+        opponents : List[str]
+            The names of the opponent agents.
+        num_matches : int
+            The number of matches against each opponent.
+        stage : str
+            The stage label of the evaluation.
+
+        """
+        record = self._records.get(_key(self._record(
+            score_fn, params, opponents, num_matches, stage)))
+        return None if record is None else record["wins"]
+
+    def add(self, score_fn, params, opponents, num_matches, wins, stage=""):
+        """
+        Append an evaluation with `wins` wins to the store (see `get()`).
+        """
+        record = self._record(score_fn, params, opponents, num_matches, stage)
+        record["wins"] = _plain(wins)
+        self._records[_key(record)] = record
+        self._append(record)
+
+    def seed(self, label):
+        """
+        Return the random seed of the search `label`, which is drawn and
+        appended to the store the first time it is requested.
+        """
+        if label not in self._seeds:
+            self._seeds[label] = random.getrandbits(32)
+            self._append({"label": label, "seed": self._seeds[label]})
+        return self._seeds[label]
+
+    def _append(self, record):
+        with open(self.path, "a") as fp:
+            fp.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def read_records(path):
+    """
+    Return the records of a store file. A truncated last line, left by a
+    search that was killed while writing it, is skipped.
+    """
+    records = []
+    with open(path) as fp:
+        for line in fp:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def merge_stores(output, inputs):
+    """
+    Write the union of the records of the `inputs` store files to `output`.
+    Records of the same evaluation found in several files are written once,
+    and so is the seed of each search (the one of the first file).
+
+    Returns
+    -------
+    num_records : int
+        The number of records written.
+
+    """
+    records = {}
+    for path in inputs:
+        for record in read_records(path):
+            records.setdefault(_key(record), record)
+    with open(output, "w") as fp:
+        for record in records.values():
+            fp.write(json.dumps(record, sort_keys=True) + "\n")
+    return len(records)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="Manage grid search result stores.")
+    subparsers = parser.add_subparsers(dest="command")
+    merge = subparsers.add_parser(
+        "merge", help="Merge several store files into one.")
+    merge.add_argument("output", type=str, help="The merged store file.")
+    merge.add_argument("inputs", nargs="+", type=str,
+                       help="The store files to merge.")
+
+    args = parser.parse_args()
+    if args.command == "merge":
+        print("Merged {} records into {}".format(
+            merge_stores(args.output, args.inputs), args.output))
+    else:
+        parser.print_help()
@@ -0,0 +1,231 @@
+#!coding=utf-8
+"""
+Statistics of the searches of the alpha-beta agents.
+
+An `AlphaBetaPlayer` created with a `SearchStats` collector records one
+`MoveStats` per call to `get_move()`: the depth of the deepest completed
+iteration, the nodes, leaf evaluations, beta cutoffs and transposition table
+probes of the search, and the time at which each iteration was completed.
+The collectors of several agents (or of the same agent in several worker
+processes) can be merged, e.g. to summarize a whole tournament:
+
+    stats = SearchStats()
+    player = AlphaBetaPlayer(score_fn=improved_score, stats=stats)
+    ...
+    print(stats.format())
+
+`MCTSStats` is the collector of `mcts.MCTSPlayer`, which records the number
+of playouts (each ending with a rollout) and the time of every search.
+"""
+from __future__ import division
+
+
+class MoveStats(object):
+    """The statistics of the search of one move.
+
+    Attributes
+    ----------
+    depth : int
+        The depth of the deepest completed iteration (0 if none).
+    nodes : int
+        The number of nodes searched (including the leaves).
+    leaves : int
+        The number of positions evaluated with the score function.
+    cutoffs : int
+        The number of nodes whose search was cut off by the window.
+    tt_probes, tt_hits : int
+        The number of transposition table probes and of probes that found
+        an entry (0 without a table).
+    depth_times : list<float>
+        The milliseconds from the start of the search to the completion of
+        each iteration (`depth_times[d - 1]` for depth `d`).
+    depth_nodes : list<int>
+        The number of nodes searched by each completed iteration.
+    time_left : float
+        The milliseconds left on the clock when the move was returned.
+    """
+
+    __slots__ = ("depth", "nodes", "leaves", "cutoffs", "tt_probes",
+                 "tt_hits", "depth_times", "depth_nodes", "time_left",
+                 "_completed_nodes")
+
+    def __init__(self):
+        self.depth = 0
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.depth_times = []
+        self.depth_nodes = []
+        self.time_left = 0.
+        # The running total of `depth_nodes`
+        self._completed_nodes = 0
+
+    def complete_iteration(self, elapsed):
+        """Record that the iteration of depth `self.depth + 1` was completed
+        `elapsed` milliseconds after the start of the search."""
+        self.depth += 1
+        self.depth_times.append(elapsed)
+        self.depth_nodes.append(self.nodes - self._completed_nodes)
+        self._completed_nodes = self.nodes
+
+    @property
+    def branching_factor(self):
+        """The effective branching factor, the ratio of the nodes of the
+        last two completed iterations (None with fewer than two)."""
+        if len(self.depth_nodes) < 2 or not self.depth_nodes[-2]:
+            return None
+        return self.depth_nodes[-1] / self.depth_nodes[-2]
+
+
+def _mean(values):
+    values = list(values)
+    return sum(values) / len(values) if values else 0.
+
+
+class SearchStats(object):
+    """A collector of `MoveStats`, one per searched move.
+
+    Attributes
+    ----------
+    moves : list<`MoveStats`>
+        The statistics of the moves, in the order they were searched.
+    """
+
+    def __init__(self):
+        self.moves = []
+
+    def __len__(self):
+        return len(self.moves)
+
+    def start_move(self):
+        """Return a new `MoveStats` for the search of the next move."""
+        move_stats = MoveStats()
+        self.moves.append(move_stats)
+        return move_stats
+
+    def merge(self, other):
+        """Add the moves of the `SearchStats` `other` to this collector."""
+        self.moves.extend(other.moves)
+        return self
+
+    def clear(self):
+        """Drop the statistics of all moves."""
+        self.moves = []
+
+    def summary(self):
+        """Return a dict of statistics aggregated over all moves.
+
+        The keys are `moves`, `mean_depth`, `median_depth` (robust to the
+        very deep iterations of positions where every line ends before the
+        search horizon), `max_depth`, `nodes`, `leaves`,
+        `cutoffs`, `tt_hit_rate` (None without probes), `branching_factor`
+        (the mean effective branching factor), `mean_time_left` (ms) and
+        `depth_times`, a list of the mean milliseconds to complete each
+        depth over the moves that completed it.
+        """
+        moves = self.moves
+        tt_probes = sum(m.tt_probes for m in moves)
+        depths = sorted(m.depth for m in moves)
+        max_depth = depths[-1] if depths else 0
+        return {
+            "moves": len(moves),
+            "mean_depth": _mean(depths),
+            "median_depth": depths[len(depths) // 2] if depths else 0,
+            "max_depth": max_depth,
+            "nodes": sum(m.nodes for m in moves),
+            "leaves": sum(m.leaves for m in moves),
+            "cutoffs": sum(m.cutoffs for m in moves),
+            "tt_hit_rate": (sum(m.tt_hits for m in moves) / tt_probes
+                            if tt_probes else None),
+            "branching_factor": _mean(m.branching_factor for m in moves
+                                      if m.branching_factor is not None),
+            "mean_time_left": _mean(m.time_left for m in moves),
+            "depth_times": [_mean(m.depth_times[d] for m in moves
+                                  if m.depth > d)
+                            for d in range(max_depth)],
+        }
+
+    def format(self, name="", max_depths=12):
+        """Return the summary as a printable string, with the times to at
+        most `max_depths` depths."""
+        s = self.summary()
+        n = max(1, s["moves"])
+        lines = [
+            "{}{} moves, depth {} median / {:.2f} mean / {} max".format(
+                name + ": " if name else "", s["moves"], s["median_depth"],
+                s["mean_depth"], s["max_depth"]),
+            "  nodes/move {:.0f}, leaves/move {:.0f}, cutoffs/move {:.0f}, "
+            "branching factor {:.2f}".format(
+                s["nodes"] / n, s["leaves"] / n, s["cutoffs"] / n,
+                s["branching_factor"]),
+            "  time left {:.1f} ms{}".format(
+                s["mean_time_left"],
+                "" if s["tt_hit_rate"] is None else
+                ", TT hit rate {:.1%}".format(s["tt_hit_rate"])),
+            "  ms to depth: " + " ".join(
+                "{}:{:.1f}".format(d + 1, t)
+                for d, t in enumerate(s["depth_times"][:max_depths])) +
+            (" ..." if len(s["depth_times"]) > max_depths else ""),
+        ]
+        return "\n".join(lines)
+
+
+class MCTSStats(object):
+    """A collector of the statistics of the searches of `mcts.MCTSPlayer`.
+
+    Attributes
+    ----------
+    moves : list<(int, float, int)>
+        The number of playouts, the milliseconds spent and the number of
+        visits of the root reused from the previous search, one tuple per
+        searched move.
+    """
+
+    def __init__(self):
+        self.moves = []
+
+    def __len__(self):
+        return len(self.moves)
+
+    def add_move(self, playouts, millis, reused):
+        """Record the search of a move."""
+        self.moves.append((playouts, millis, reused))
+
+    def merge(self, other):
+        """Add the moves of the `MCTSStats` `other` to this collector."""
+        self.moves.extend(other.moves)
+        return self
+
+    def clear(self):
+        """Drop the statistics of all moves."""
+        self.moves = []
+
+    def summary(self):
+        """Return a dict of statistics aggregated over all moves.
+
+        The keys are `moves`, `playouts`, `playouts_per_move`,
+        `playouts_per_second` and `reused` (the share of the visits of the
+        roots that were reused from the previous search).
+        """
+        playouts = sum(m[0] for m in self.moves)
+        millis = sum(m[1] for m in self.moves)
+        reused = sum(m[2] for m in self.moves)
+        return {
+            "moves": len(self.moves),
+            "playouts": playouts,
+            "playouts_per_move": playouts / len(self.moves) if self.moves
+                                 else 0.,
+            "playouts_per_second": 1000 * playouts / millis if millis else 0.,
+            "reused": reused / (reused + playouts) if playouts else 0.,
+        }
+
+    def format(self, name=""):
+        """Return the summary as a printable string."""
+        s = self.summary()
+        return ("{}{} moves, {:.0f} playouts/move, {:.0f} playouts/s, "
+                "{:.1%} of the root visits reused".format(
+                    name + ": " if name else "", s["moves"],
+                    s["playouts_per_move"], s["playouts_per_second"],
+                    s["reused"]))
@@ -0,0 +1,104 @@
+#!coding=utf-8
+"""
+Time management for the iterative deepening of the alpha-beta agents.
+
+Without a time manager `AlphaBetaPlayer` starts a new iteration as long as
+there is any time left, and the work of the iteration interrupted by the
+timeout is thrown away. `TimeManager` decides after every iteration whether
+the next one is worth starting:
+
+    * the cost of the next iteration is predicted from the growth of the
+      iteration times (the effective branching factor), and an iteration
+      that can't finish in the time left is not started,
+    * in critical positions, where the best move changed in the last
+      iteration, an iteration is still started if its first root move can
+      be searched, because the agent then keeps the best move of the
+      partial iteration (see `AlphaBetaPlayer`),
+    * the search stops once the score is a proven win or loss, since
+      deeper iterations can't change it.
+"""
+from math import isinf
+
+
+class TimeManager(object):
+    """Decide when iterative deepening stops.
+
+    Parameters
+    ----------
+    max_branching : float (optional)
+        The largest growth factor of the iteration time assumed when the
+        next iteration is predicted.
+
+    first_move_fraction : float (optional)
+        The predicted share of the first root move in the time of an
+        iteration. The previous best move is searched first and sets the
+        bound for the other moves, so it takes a large share of the time.
+
+    Attributes
+    ----------
+    skipped : int
+        The number of iterations not started because they were predicted
+        to time out.
+    extended : int
+        The number of iterations started in critical positions although
+        they were predicted to time out.
+    """
+
+    def __init__(self, max_branching=10., first_move_fraction=0.5):
+        self.max_branching = max_branching
+        self.first_move_fraction = first_move_fraction
+        self.skipped = 0
+        self.extended = 0
+        self._available = 0.
+        self._times = []
+        self._moves = []
+
+    def new_search(self, available):
+        """Prepare for the search of a new move with `available` ms."""
+        self._available = available
+        self._times = []
+        self._moves = []
+
+    def predict(self):
+        """Return the predicted duration (ms) of the next iteration, or
+        None before two iterations have been completed."""
+        if len(self._times) < 2:
+            return None
+        last = self._times[-1] - self._times[-2]
+        previous = self._times[-2] - (self._times[-3]
+                                      if len(self._times) > 2 else 0.)
+        growth = last / previous if previous > 0 else self.max_branching
+        return last * max(1., min(growth, self.max_branching))
+
+    def critical(self):
+        """Test whether the best move changed in the last iteration."""
+        return len(self._moves) > 1 and self._moves[-1] != self._moves[-2]
+
+    def next_iteration(self, move, score, remaining):
+        """Record a completed iteration and return True if the next one
+        should be started.
+
+        Parameters
+        ----------
+        move : (int, int)
+            The best move of the completed iteration.
+
+        score : float
+            Its score.
+
+        remaining : float
+            The milliseconds left until the search must be stopped.
+        """
+        if isinf(score):
+            return False
+        self._times.append(self._available - remaining)
+        self._moves.append(move)
+        predicted = self.predict()
+        if predicted is None or predicted <= remaining:
+            return True
+        if (self.critical() and
+                predicted * self.first_move_fraction <= remaining):
+            self.extended += 1
+            return True
+        self.skipped += 1
+        return False
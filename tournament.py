@@ -12,16 +12,21 @@ once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
 import itertools
+import multiprocessing as mp
 import random
 import warnings
 
+from argparse import ArgumentParser
 from collections import namedtuple
+from math import log
 
-from isolation import Board
+from isolation import Board, BitBoard
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
 from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
                         custom_score_2, custom_score_3)
+from mcts import MCTSPlayer
+from search_stats import MCTSStats, SearchStats
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
@@ -36,20 +41,30 @@ game_agent.py.
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# The outcome of `play_sprt()`: `accepted` is True if H1 was accepted, False
+# if H0 was accepted and None if the test stopped at the maximum number of
+# pairs without a decision.
+SPRTResult = namedtuple("SPRTResult",
+                        ["accepted", "llr", "pairs", "wins", "losses"])
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches,
+               board_cls=Board):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    The games are played on boards of type `board_cls` (e.g.,
+    `isolation.BitBoard` for the faster engine).
     """
     timeout_count = 0
     forfeit_count = 0
     for _ in range(num_matches):
 
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
+        games = sum([[board_cls(cpu_agent.player, agent.player),
+                      board_cls(agent.player, cpu_agent.player)]
                     for agent in test_agents], [])
 
         # initialize all games with a random move and response
@@ -77,40 +92,28 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
-    total_wins = {agent.player: 0 for agent in test_agents}
-    total_timeouts = 0.
-    total_forfeits = 0.
-    total_matches = 2 * num_matches * len(cpu_agents)
+def _print_header(test_agents):
+    print(("\n{:^9}{:^13}" + "{:^13}" * len(test_agents)).format(
+        "Match #", "Opponent", *[agent.name for agent in test_agents]))
+    print(("{:^9}{:^13}" + " {:^5}| {:^5}" * len(test_agents))
+          .format("", "", *(["Won", "Lost"] * len(test_agents))))
 
-    print("\n{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}".format(
-        "Match #", "Opponent", test_agents[0].name, test_agents[1].name,
-        test_agents[2].name, test_agents[3].name))
-    print("{:^9}{:^13} {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5}"
-          .format("", "", *(["Won", "Lost"] * 4)))
 
-    for idx, agent in enumerate(cpu_agents):
-        wins = {test_agents[0].player: 0,
-                test_agents[1].player: 0,
-                test_agents[2].player: 0,
-                test_agents[3].player: 0,
-                agent.player: 0}
+def _print_opponent(idx, agent):
+    print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
-        total_timeouts += counts[0]
-        total_forfeits += counts[1]
-        total_wins = update(total_wins, wins)
-        _total = 2 * num_matches
-        round_totals = sum([[wins[agent.player], _total - wins[agent.player]]
-                            for agent in test_agents], [])
-        print(" {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5}"
-              .format(*round_totals))
-
-    print("-" * 74)
-    print("{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}\n".format(
+def _print_round_totals(test_agents, wins, num_matches):
+    _total = 2 * num_matches
+    round_totals = sum([[wins[agent.player], _total - wins[agent.player]]
+                        for agent in test_agents], [])
+    print((" {:^5}| {:^5}" * len(test_agents)).format(*round_totals))
+
+
+def _print_summary(test_agents, total_wins, total_matches, total_timeouts,
+                   total_forfeits):
+    print("-" * (22 + 13 * len(test_agents)))
+    print(("{:^9}{:^13}" + "{:^13}" * len(test_agents) + "\n").format(
         "", "Win Rate:",
         *["{:.1f}%".format(100 * total_wins[a.player] / total_matches)
           for a in test_agents]
@@ -126,16 +129,277 @@ def play_matches(cpu_agents, test_agents, num_matches):
                "legal moves available to play.\n").format(total_forfeits))
 
 
-def main():
+def play_matches(cpu_agents, test_agents, num_matches, board_cls=Board):
+    """Play matches between the test agent and each cpu_agent individually. """
+    total_wins = {agent.player: 0 for agent in test_agents}
+    total_timeouts = 0.
+    total_forfeits = 0.
+    total_matches = 2 * num_matches * len(cpu_agents)
+
+    _print_header(test_agents)
+
+    for idx, agent in enumerate(cpu_agents):
+        wins = {test_agent.player: 0 for test_agent in test_agents}
+        wins[agent.player] = 0
+
+        _print_opponent(idx, agent)
+        counts = play_round(agent, test_agents, wins, num_matches,
+                            board_cls=board_cls)
+        total_timeouts += counts[0]
+        total_forfeits += counts[1]
+        total_wins = update(total_wins, wins)
+        _print_round_totals(test_agents, wins, num_matches)
+
+    _print_summary(test_agents, total_wins, total_matches, total_timeouts,
+                   total_forfeits)
+
+
+# The agents of a tournament worker process, set by `_init_worker()`
+_worker_agents = None
+
+
+def _init_worker(cpu_agents, test_agents, board_cls):
+    global _worker_agents
+    _worker_agents = (cpu_agents, test_agents, board_cls)
+    # Forked workers inherit the random state of the parent process
+    random.seed()
+
+
+def _take_stats(player):
+    """Return the `SearchStats` (or `MCTSStats`) collected by `player` (None
+    if it doesn't collect any) and give it an empty collector."""
+    stats = getattr(player, "stats", None)
+    if stats is not None:
+        player.stats = type(stats)()
+    return stats
+
+
+def _play_pair(task):
+    """Play a fair pair of games in a tournament worker.
+
+    The task is a tuple (cpu agent index, test agent index, opening). The
+    test agent plays once as the second and once as the first player, both
+    times from the two opening moves. Returns the indices, a list of
+    (test agent won, termination) tuples, one per game, and the
+    `SearchStats` of the two agents for these games (or None).
+    """
+    cpu_idx, test_idx, opening = task
+    cpu_agents, test_agents, board_cls = _worker_agents
+    cpu_player = cpu_agents[cpu_idx].player
+    test_player = test_agents[test_idx].player
+    _take_stats(cpu_player)
+    _take_stats(test_player)
+    results = play_fair_pair(cpu_player, test_player, opening, board_cls)
+    return (cpu_idx, test_idx, results,
+            (_take_stats(cpu_player), _take_stats(test_player)))
+
+
+def random_opening(board_cls=Board):
+    """Return two random opening moves, one for each player."""
+    game = board_cls(None, None)
+    opening = []
+    for _ in range(2):
+        opening.append(random.choice(game.get_legal_moves()))
+        game.apply_move(opening[-1])
+    return opening
+
+
+def play_fair_pair(cpu_player, test_player, opening, board_cls=Board):
+    """Play the test player against the cpu player from `opening`, once as
+    the second and once as the first player.
+
+    Returns a list of (test player won, termination) tuples, one per game.
+    """
+    results = []
+    for game in (board_cls(cpu_player, test_player),
+                 board_cls(test_player, cpu_player)):
+        for move in opening:
+            game.apply_move(move)
+        winner, _, termination = game.play(time_limit=TIME_LIMIT)
+        results.append((winner is test_player, termination))
+    return results
+
+
+def play_matches_parallel(cpu_agents, test_agents, num_matches,
+                          board_cls=Board, games_per_core=1.):
+    """Play the same matches as `play_matches()` in a pool of worker
+    processes and print the same table.
+
+    Each fair pair of games between a test agent and a cpu agent is one
+    task of the pool. The row of a cpu agent is printed as soon as all of
+    its games (and those of the rows above it) are finished. The search
+    statistics collected by the agents in the workers are merged into the
+    `stats` of the agents of this process.
+
+    Parameters
+    ----------
+    games_per_core : float (optional)
+        The number of games played at the same time per CPU core. Keep it
+        at 1 or below so that the agents get the CPU time they expect from
+        the time limit of each move.
+    """
+    num_workers = max(1, int(mp.cpu_count() * games_per_core))
+    total_wins = {agent.player: 0 for agent in test_agents}
+    total_timeouts = 0.
+    total_forfeits = 0.
+    total_matches = 2 * num_matches * len(cpu_agents)
+
+    # All test agents play the same openings against a cpu agent
+    tasks = []
+    for cpu_idx in range(len(cpu_agents)):
+        for _ in range(num_matches):
+            opening = random_opening(board_cls)
+            tasks.extend((cpu_idx, test_idx, opening)
+                         for test_idx in range(len(test_agents)))
+
+    _print_header(test_agents)
+
+    wins = [[0] * len(test_agents) for _ in cpu_agents]
+    pending = [num_matches * len(test_agents)] * len(cpu_agents)
+    next_row = 0
+    pool = mp.Pool(num_workers, initializer=_init_worker,
+                   initargs=(cpu_agents, test_agents, board_cls))
+    try:
+        for cpu_idx, test_idx, results, stats in pool.imap_unordered(
+                _play_pair, tasks):
+            for agent, agent_stats in zip(
+                    (cpu_agents[cpu_idx], test_agents[test_idx]), stats):
+                if agent_stats is not None:
+                    agent.player.stats.merge(agent_stats)
+            for won, termination in results:
+                wins[cpu_idx][test_idx] += won
+                if termination == "timeout":
+                    total_timeouts += 1
+                elif not won and termination == "forfeit":
+                    total_forfeits += 1
+            pending[cpu_idx] -= 1
+            while next_row < len(cpu_agents) and not pending[next_row]:
+                row_wins = {agent.player: wins[next_row][i]
+                            for i, agent in enumerate(test_agents)}
+                update(total_wins, row_wins)
+                _print_opponent(next_row, cpu_agents[next_row])
+                _print_round_totals(test_agents, row_wins, num_matches)
+                next_row += 1
+    finally:
+        pool.terminate()
+        pool.join()
+
+    _print_summary(test_agents, total_wins, total_matches, total_timeouts,
+                   total_forfeits)
+
+
+def print_search_stats(agents):
+    """Print the summary of the search statistics of the agents that
+    collect them."""
+    for agent in agents:
+        stats = getattr(agent.player, "stats", None)
+        if stats is not None:
+            print(stats.format(agent.name))
+
+
+def _expected_score(elo):
+    """Return the expected score of a player `elo` points stronger."""
+    return 1. / (1. + 10 ** (-elo / 400.))
+
+
+def sprt_llr(pair_counts, elo0, elo1):
+    """Return the log-likelihood ratio of the hypothesis H1 (the test agent
+    is `elo1` Elo stronger) against H0 (it is `elo0` Elo stronger).
+
+    The fair pairs of games are the samples, so that the correlation of the
+    two games played from the same opening is accounted for. The ratio uses
+    the normal approximation of the generalized SPRT.
+
+    Parameters
+    ----------
+    pair_counts : list<int>
+        The number of pairs in which the test agent won 0, 1 and 2 games.
+    """
+    # One pseudo-pair of each outcome keeps the variance positive, so that a
+    # short run of equal pairs does not decide the test on its own
+    counts = [count + 1 for count in pair_counts]
+    scores = (0., .5, 1.)
+    n = sum(counts)
+    mean = sum(c * x for c, x in zip(counts, scores)) / n
+    var = sum(c * (x - mean) ** 2 for c, x in zip(counts, scores)) / n
+    s0, s1 = _expected_score(elo0), _expected_score(elo1)
+    return n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+
+
+def play_sprt(test_agent, base_agent, elo0=0., elo1=20., alpha=0.05,
+              beta=0.05, max_pairs=1000, board_cls=Board):
+    """Play fair pairs of games between two agents until a sequential
+    probability ratio test decides between H0 (the test agent is `elo0` Elo
+    stronger than the base agent) and H1 (it is `elo1` Elo stronger).
+
+    Parameters
+    ----------
+    alpha, beta : float (optional)
+        The probabilities of accepting H1 when H0 is true and of accepting
+        H0 when H1 is true.
+
+    max_pairs : int (optional)
+        The test stops without a decision after this many pairs.
+
+    Returns
+    -------
+    `SPRTResult`
+    """
+    lower = log(beta / (1 - alpha))
+    upper = log((1 - beta) / alpha)
+    pair_counts = [0, 0, 0]
+    accepted = None
+    llr = 0.
+    pair = wins = 0
+
+    print("\nSPRT {} vs {}: H0 elo = {:g}, H1 elo = {:g}, "
+          "alpha = {:g}, beta = {:g}".format(test_agent.name, base_agent.name,
+                                              elo0, elo1, alpha, beta))
+    print("LLR bounds: [{:.2f}, {:.2f}]\n".format(lower, upper))
+    for pair in range(1, max_pairs + 1):
+        results = play_fair_pair(base_agent.player, test_agent.player,
+                                 random_opening(board_cls), board_cls)
+        pair_counts[sum(won for won, _ in results)] += 1
+        wins = pair_counts[1] + 2 * pair_counts[2]
+        llr = sprt_llr(pair_counts, elo0, elo1)
+        print("Pair {:>4}: {:>4} won, {:>4} lost, LLR {:6.2f}".format(
+            pair, wins, 2 * pair - wins, llr), flush=True)
+        if llr >= upper:
+            accepted = True
+            break
+        if llr <= lower:
+            accepted = False
+            break
+
+    if accepted is None:
+        print("\nNo decision after {} pairs.".format(pair))
+    else:
+        print("\n{} accepted after {} pairs.".format(
+            "H1" if accepted else "H0", pair))
+    return SPRTResult(accepted, llr, pair, wins, 2 * pair - wins)
+
+
+def main(board_cls=Board, parallel=False, games_per_core=1., stats=False,
+         mcts=False):
+
+    def new_stats():
+        return SearchStats() if stats else None
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
     test_agents = [
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score), "AB_Custom"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_2), "AB_Custom_2"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_3), "AB_Custom_3")
+        Agent(AlphaBetaPlayer(score_fn=improved_score, stats=new_stats()),
+              "AB_Improved"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score, stats=new_stats()),
+              "AB_Custom"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score_2, stats=new_stats()),
+              "AB_Custom_2"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score_3, stats=new_stats()),
+              "AB_Custom_3")
     ]
+    if mcts:
+        # Always report the playouts/s of the MCTS agent
+        test_agents.append(Agent(MCTSPlayer(stats=MCTSStats()), "MCTS"))
 
     # Define a collection of agents to compete against the test agents
     cpu_agents = [
@@ -152,8 +416,87 @@ def main():
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    if parallel:
+        play_matches_parallel(cpu_agents, test_agents, NUM_MATCHES,
+                              board_cls=board_cls,
+                              games_per_core=games_per_core)
+    else:
+        play_matches(cpu_agents, test_agents, NUM_MATCHES,
+                     board_cls=board_cls)
+    if stats or mcts:
+        print("{:^74}".format("Search statistics"))
+        print_search_stats(test_agents)
 
 
 if __name__ == "__main__":
-    main()
+    parser = ArgumentParser(description=DESCRIPTION)
+    parser.add_argument(
+        "--bitboard",
+        action="store_true",
+        help="Play the games on `isolation.BitBoard` instead of `Board`."
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Play the games in a pool of worker processes."
+    )
+    parser.add_argument(
+        "--games-per-core",
+        type=float,
+        default=1.,
+        help="The number of games played at the same time per CPU core "
+             "with --parallel (default: 1)."
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Collect and print the search statistics of the test agents."
+    )
+    parser.add_argument(
+        "--mcts",
+        action="store_true",
+        help="Add `mcts.MCTSPlayer` to the test agents and print its "
+             "playouts per second."
+    )
+    parser.add_argument(
+        "--sprt",
+        action="store_true",
+        help="Instead of the tournament, run an SPRT of AB_Custom against "
+             "AB_Improved."
+    )
+    parser.add_argument(
+        "--elo0", type=float, default=0.,
+        help="The Elo difference of the SPRT null hypothesis (default: 0)."
+    )
+    parser.add_argument(
+        "--elo1", type=float, default=20.,
+        help="The Elo difference of the SPRT alternative hypothesis "
+             "(default: 20)."
+    )
+    parser.add_argument(
+        "--sprt-alpha", type=float, default=0.05,
+        help="The SPRT false positive rate (default: 0.05)."
+    )
+    parser.add_argument(
+        "--sprt-beta", type=float, default=0.05,
+        help="The SPRT false negative rate (default: 0.05)."
+    )
+    parser.add_argument(
+        "--max-pairs", type=int, default=1000,
+        help="The maximum number of game pairs of the SPRT (default: 1000)."
+    )
+    args = parser.parse_args()
+    if args.max_pairs < 1:
+        parser.error("--max-pairs must be at least 1")
+    board_cls = BitBoard if args.bitboard else Board
+    if args.sprt:
+        play_sprt(Agent(AlphaBetaPlayer(score_fn=custom_score), "AB_Custom"),
+                  Agent(AlphaBetaPlayer(score_fn=improved_score),
+                        "AB_Improved"),
+                  elo0=args.elo0, elo1=args.elo1, alpha=args.sprt_alpha,
+                  beta=args.sprt_beta, max_pairs=args.max_pairs,
+                  board_cls=board_cls)
+    else:
+        main(board_cls=board_cls, parallel=args.parallel,
+             games_per_core=args.games_per_core, stats=args.stats,
+             mcts=args.mcts)
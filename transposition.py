@@ -0,0 +1,132 @@
+#!coding=utf-8
+"""
+A fixed-size transposition table for the alpha-beta search agents.
+"""
+from array import array
+from collections import namedtuple
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+TTEntry = namedtuple("TTEntry", ["key", "depth", "score", "flag", "move"])
+
+
+def _pack(depth, flag, move):
+    """Pack the depth, bound type and move of an entry into one integer, with
+    the lowest bit set to tell it from an empty slot."""
+    return (1 | flag << 1 | (move[0] + 1) << 3 | (move[1] + 1) << 13 |
+            depth << 23)
+
+
+def _unpack(key, data, score):
+    return TTEntry(key, data >> 23, score, data >> 1 & 0x3,
+                   ((data >> 3 & 0x3ff) - 1, (data >> 13 & 0x3ff) - 1))
+
+
+class TranspositionTable(object):
+    """A transposition table with a bounded number of entries.
+
+    The table is organized in buckets of two slots. The first slot keeps the
+    entry searched to the greatest depth and is only replaced by an entry of
+    at least the same depth (or by the same position), while the second slot
+    is always replaced. Keys are 64-bit Zobrist keys (see
+    `isolation.Board.zobrist_key`).
+
+    The slots are stored in flat arrays of numbers rather than as `TTEntry`
+    objects: the garbage collector does not track arrays, while tens of
+    thousands of tuples kept alive across moves would make its full
+    collections pause the search for longer than the timeout.
+
+    Parameters
+    ----------
+    max_bytes : int (optional)
+        An approximate cap on the memory used by the stored entries.
+
+    Attributes
+    ----------
+    probes : int
+        The number of calls to `probe()`.
+    hits : int
+        The number of probes that found an entry for the key.
+    """
+
+    # The key, packed data and score of a slot
+    ENTRY_BYTES = 24
+
+    def __init__(self, max_bytes=16 * 2 ** 20):
+        self.num_buckets = max(1, max_bytes // (2 * self.ENTRY_BYTES))
+        self.clear()
+
+    def __len__(self):
+        return sum(1 for data in self._data if data)
+
+    def clear(self):
+        """Remove all entries from the table."""
+        # Slots 2 * bucket and 2 * bucket + 1, the data is 0 in empty slots
+        zeros = bytes(2 * self.num_buckets * 8)
+        self._keys = array("Q", zeros)
+        self._data = array("Q", zeros)
+        self._scores = array("d", zeros)
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """Return the stored `TTEntry` of `key`, or None if there is none."""
+        self.probes += 1
+        slot = 2 * (key % self.num_buckets)
+        keys, data = self._keys, self._data
+        if keys[slot] != key or not data[slot]:
+            slot += 1
+            if keys[slot] != key or not data[slot]:
+                return None
+        self.hits += 1
+        return _unpack(key, data[slot], self._scores[slot])
+
+    def store(self, key, depth, score, flag, move):
+        """Store the result of searching the position `key`.
+
+        Parameters
+        ----------
+        key : int
+            The Zobrist key of the position.
+        depth : int
+            The remaining search depth of the result.
+        score : float
+            The score of the position.
+        flag : int
+            `EXACT`, `LOWER` (the score is a lower bound) or `UPPER` (the
+            score is an upper bound).
+        move : (int, int)
+            The best move found in the position.
+        """
+        slot = 2 * (key % self.num_buckets)
+        stored = self._data[slot]
+        if not (not stored or self._keys[slot] == key or
+                depth >= stored >> 23):
+            slot += 1
+        self._keys[slot] = key
+        self._data[slot] = _pack(depth, flag, move)
+        self._scores[slot] = score
+
+    @staticmethod
+    def bound(score, alpha, beta):
+        """Return the bound type of a fail-soft `score` searched with the
+        window (`alpha`, `beta`)."""
+        if score <= alpha:
+            return UPPER
+        if score >= beta:
+            return LOWER
+        return EXACT
+
+    @staticmethod
+    def usable(entry, depth, alpha, beta):
+        """Test whether `entry` can replace a search to `depth` with the
+        window (`alpha`, `beta`)."""
+        if entry.depth < depth:
+            return False
+        if entry.flag == EXACT:
+            return True
+        if entry.flag == LOWER:
+            return entry.score >= beta
+        return entry.score <= alpha